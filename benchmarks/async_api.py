@@ -0,0 +1,74 @@
+"""The library API against the local stand-in server with --latency seconds per response: --areas today
+forecasts fetched
+
+  one by one     a parser's run() per area, like a program calling weatherterm without the API
+  first call     await get_forecasts(...) with a new FetchClient, the connections are opened by the call
+  second call    the same call again with the same FetchClient, its connections are already open
+
+The event loop must stay free while the queries run: a task sleeping 10ms in a loop measures how late it wakes up
+(the worst lag is printed). The parses are pure Python, the loop waits for its turn of the GIL between them, a loop
+running the queries itself would lag for the whole call.
+
+    python -m benchmarks.async_api --areas 40 --latency 0.1
+"""
+
+import asyncio
+import time
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import FetchClient
+from weatherterm.core import ForecastType
+from weatherterm.core import get_forecasts
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+async def _timed_call(areas, client):
+    lags = []
+
+    async def watch_loop():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    watcher = asyncio.create_task(watch_loop())
+    start = time.perf_counter()
+    results = await get_forecasts(areas, ForecastType.TODAY, parser=client.parser_class('WeatherComParser'),
+                                  client=client)
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    return elapsed, sum(result.ok for result in results), max(lags, default=0.0)
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='async_api', description='Concurrent queries of the library API')
+    argparser.add_argument('--areas', type=int, default=40)
+    argparser.add_argument('--latency', type=float, default=0.1)
+    argparser.add_argument('--workers', type=int, default=8)
+    args = argparser.parse_args(argv)
+
+    areas = [f'AREA{number:04}' for number in range(args.areas)]
+    with FakeWeatherServer(latency=args.latency) as server:
+        parser_class = type('LocalParser', (WeatherComParser,), {'base_url': server.base_url})
+        print(f'{args.areas} areas, {args.latency * 1000:.0f}ms per response, {args.workers} workers')
+        print(f'{"run":<14}{"ok":>5}{"seconds":>10}{"loop lag ms":>13}')
+
+        client = FetchClient(workers=args.workers, parsers={'WeatherComParser': parser_class})
+        parser = client.parser('WeatherComParser')
+        start = time.perf_counter()
+        ok = 0
+        for area in areas:
+            ok += bool(parser.run(Namespace(area_code=area, forecast_option=ForecastType.TODAY, unit=None)))
+        print(f'{"one by one":<14}{ok:>5}{time.perf_counter() - start:>10.2f}{"-":>13}')
+        client.close()
+
+        client = FetchClient(workers=args.workers, parsers={'WeatherComParser': parser_class})
+        for name in ('first call', 'second call'):
+            elapsed, ok, lag = asyncio.run(_timed_call(areas, client))
+            print(f'{name:<14}{ok:>5}{elapsed:>10.2f}{lag * 1000:>13.1f}')
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Tunes the size of the browser pool against the local stand-in server. A fixed number of fetch threads (like
+the workers of a batch) loads pages through BrowserBackend with pools of different sizes, the plain HTTP backend
+is the baseline:
+
+  pool size  pages/s, p50 and p95 page time and browser starts per pool size, assets loaded
+  blocking   the same with the asset requests of every page blocked, as BrowserBackend does by default
+  crashes    a fraction of the page loads crash their browser: success rate and browsers replaced
+
+selenium and a browser are rarely installed where the benchmarks run, so by default the pool drives a stand-in
+browser: it takes --start seconds to start, fetches the page from the stand-in server, requests --assets
+images, fonts and stylesheets of the page from the same server unless they are blocked and spends --render seconds
+running scripts. --real uses headless Chrome (or PhantomJS) instead.
+
+    python -m benchmarks.browser_pool --pages 200 --workers 8
+"""
+
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import BrowserBackend
+from weatherterm.core import FetchError
+from weatherterm.core import FetchScheduler
+from weatherterm.core import Metrics
+from weatherterm.core import create_backend
+
+
+class StandInBrowser:
+    """Has the part of the selenium driver interface BrowserBackend uses"""
+
+    def __init__(self, start, render, assets, block_assets, crash_rate):
+        time.sleep(start)
+        self._render = render
+        self._assets = 0 if block_assets else assets
+        self._crash_rate = crash_rate
+        self.title = ''
+        self.page_source = ''
+
+    def get(self, url):
+        if self._crash_rate and random.random() < self._crash_rate:
+            raise RuntimeError('the stand-in browser crashed')
+        try:
+            with urllib.request.urlopen(url) as response:
+                self.page_source = response.read().decode('utf-8')
+                self.title = ''
+        except urllib.error.HTTPError as e:
+            self.page_source = ''
+            self.title = f'{e.code} Not Found' if e.code == 404 else str(e.code)
+        base = url.split('/weather/')[0]
+        for i in range(self._assets):
+            # the stand-in server answers them with a 404, the round trip is what a blocked asset saves
+            try:
+                urllib.request.urlopen(f'{base}/assets/{i}.png').close()
+            except urllib.error.HTTPError:
+                pass
+        time.sleep(self._render)
+
+    def quit(self):
+        pass
+
+
+def _run(backend, url, pages, workers):
+    def fetch(_):
+        start = time.perf_counter()
+        try:
+            backend.fetch(url)
+            return True, time.perf_counter() - start
+        except FetchError:
+            return False, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, range(pages)))
+    elapsed = time.perf_counter() - start
+    times = sorted(seconds * 1000 for _, seconds in results)
+    return {
+        'pages_per_s': len(results) / elapsed,
+        'p50_ms': statistics.median(times),
+        'p95_ms': times[int(len(times) * 0.95) - 1],
+        'ok': sum(ok for ok, _ in results) / len(results),
+    }
+
+
+def _browser_backend(args, pool_size, block_assets, metrics, crash_rate=0.0):
+    if args.real:
+        return BrowserBackend(pool_size=pool_size, max_pages=args.max_pages, block_assets=block_assets,
+                              metrics=metrics)
+
+    def factory():
+        return StandInBrowser(args.start, args.render, args.assets, block_assets, crash_rate)
+
+    return BrowserBackend(pool_size=pool_size, max_pages=args.max_pages, driver_factory=factory, metrics=metrics)
+
+
+def _measure(backend, url, args):
+    # the pool is started by the first fetch, the start up is not part of the measurement
+    try:
+        backend.fetch(url)
+    except FetchError:
+        pass
+    return _run(backend, url, args.pages, args.workers)
+
+
+def _counter(metrics, name):
+    return sum(item['value'] for item in metrics.to_dict()['counters'] if item['counter'] == name)
+
+
+def _row(name, result, starts=''):
+    return (f'{name:<18}{result["pages_per_s"]:>9.1f}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+            f'{result["ok"] * 100:>8.1f}{starts:>8}')
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='browser_pool', description='Tune the size of the browser pool')
+    argparser.add_argument('--pages', type=int, default=200)
+    argparser.add_argument('--workers', type=int, default=8, help='Fetch threads, like the workers of a batch')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    argparser.add_argument('--max-pages', type=int, default=50, help='Pages per browser before it is replaced')
+    argparser.add_argument('--latency', type=float, default=0.02, help='Seconds the server takes per request')
+    argparser.add_argument('--start', type=float, default=0.5, help='Seconds a stand-in browser takes to start')
+    argparser.add_argument('--render', type=float, default=0.03,
+                           help='Seconds a stand-in browser spends running the scripts of a page')
+    argparser.add_argument('--assets', type=int, default=6, help='Assets requested by a stand-in browser per page')
+    argparser.add_argument('--crash-rate', type=float, default=0.05)
+    argparser.add_argument('--real', action='store_true', help='Drive real headless browsers through selenium')
+    args = argparser.parse_args(argv)
+
+    header = f'{"":<18}{"pages/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"ok %":>8}{"starts":>8}'
+    with FakeWeatherServer(latency=args.latency) as server:
+        url = server.base_url.format(forecast='today', area='USNY0996')
+
+        http = create_backend(maxsize=args.workers)
+        print(f'{args.workers} fetch threads, {args.pages} pages')
+        print(header)
+        print(_row('http', _run(http, url, args.pages, args.workers)))
+        http.close()
+
+        for block_assets in (False, True):
+            print(f'\nbrowser, assets {"blocked" if block_assets else "loaded"}')
+            for size in args.sizes:
+                metrics = Metrics()
+                backend = _browser_backend(args, size, block_assets, metrics)
+                result = _measure(backend, url, args)
+                print(_row(f'pool size {size}', result, _counter(metrics, 'browser_starts')))
+                backend.close()
+
+        if not args.real:
+            print(f'\ncrashes ({args.crash_rate * 100:.0f}% of the page loads crash the browser), '
+                  f'pool size {args.workers}')
+            for retries in (0, 2):
+                metrics = Metrics()
+                backend = FetchScheduler(_browser_backend(args, args.workers, True, metrics, args.crash_rate),
+                                         retries=retries, backoff=0.01)
+                result = _measure(backend, url, args)
+                print(_row(f'retries={retries}', result, _counter(metrics, 'browser_starts')))
+                backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Checks that the compiled extraction plans of WeatherComParser scrape exactly what the previous find() loop
+did (one container.find per criteria key and item, then a Mapper for the renamed keys) on the recorded pages,
+and compares the time both take. Exits with status 1 when the results differ.
+
+    python -m benchmarks.extraction_plans --repeat 200
+"""
+
+import sys
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_server import load_fixtures
+from weatherterm.core import ExtractionPlan
+from weatherterm.core import ForecastType
+from weatherterm.core import Mapper
+from weatherterm.core import parse_container
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+# where the items of every forecast type live in the page: (tag, CSS class, path from that element to the items)
+_containers = {
+    ForecastType.TODAY: ('section', 'today_nowcard-container', lambda element: element),
+    ForecastType.FIVEDAYS: ('table', 'twc-table', lambda element: element.tbody),
+    ForecastType.TENDAYS: ('table', 'twc-table', lambda element: element.tbody),
+    ForecastType.WEEKEND: ('article', 'ls-mod', lambda element: element.div.div),
+}
+
+
+# the criteria (CSS class -> tag) and the remapped keys of _today_forecast, _parse_list_forecast and
+# _weekend_forecast as they were before the plans, written out here so the plans are checked against the old code
+# and not against themselves
+_list_criteria = {
+    'date-time': 'span',
+    'day-detail': 'span',
+    'description': 'td',
+    'temp': 'td',
+    'wind': 'td',
+    'humidity': 'td',
+}
+_criteria = {
+    ForecastType.TODAY: {
+        'today_nowcard-temp': 'div',
+        'today_nowcard-phrase': 'div',
+        'today_nowcard-hilo': 'div',
+    },
+    ForecastType.FIVEDAYS: _list_criteria,
+    ForecastType.TENDAYS: _list_criteria,
+    ForecastType.WEEKEND: {
+        'weather-cell': 'header',
+        'temp': 'p',
+        'weather-phrase': 'h3',
+        'wind-conditions': 'p',
+        'humidity': 'p',
+    },
+}
+
+
+def _mapper(forecast_type):
+    mapper = Mapper()
+    if forecast_type == ForecastType.WEEKEND:
+        mapper.remap_key('wind-conditions', 'wind')
+        mapper.remap_key('weather-phrase', 'description')
+    return mapper
+
+
+def _find_loop(container, forecast_type):
+    """The extraction as it was written before the plans: a find per criteria key and item plus a Mapper"""
+    criteria = _criteria[forecast_type]
+    results = []
+    for item in container.children:
+        if item.name is None:
+            continue
+        scraped_data = {}
+        for key, value in criteria.items():
+            result = item.find(value, class_=key)
+            if result is not None:
+                scraped_data[key] = result.get_text()
+        if scraped_data:
+            results.append(scraped_data)
+
+    return _mapper(forecast_type).remap(results)
+
+
+def _time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='extraction_plans', description='Compare extraction plans with find() loops')
+    argparser.add_argument('--repeat', type=int, default=100)
+    args = argparser.parse_args(argv)
+
+    pages = load_fixtures()
+    plans = ExtractionPlan.compile_schemas(WeatherComParser)
+    failed = False
+
+    print(f'{"type":<10}{"find loop ms":>14}{"plan ms":>10}{"same":>6}')
+    for forecast_type, plan in plans.items():
+        name, css_class, items = _containers[forecast_type]
+        container = items(parse_container(pages[forecast_type.value].decode('utf-8'), name, css_class))
+
+        same = _find_loop(container, forecast_type) == plan.extract_all(container)
+        failed = failed or not same
+
+        loop_ms = _time(lambda: _find_loop(container, forecast_type), args.repeat)
+        plan_ms = _time(lambda: plan.extract_all(container), args.repeat)
+        print(f'{forecast_type.value:<10}{loop_ms:>14.3f}{plan_ms:>10.3f}{"yes" if same else "NO":>6}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
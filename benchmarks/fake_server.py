@@ -0,0 +1,167 @@
+"""A local stand-in for weather.com. It answers the same URLs that WeatherComParser builds from its
+base_url (/weather/{forecast}/1/{area}) with the recorded pages in benchmarks/fixtures, so the
+benchmarks never touch the live site.
+
+Latency and errors can be injected: every response waits latency seconds (plus up to jitter seconds), a
+stall_rate fraction of the requests waits stall seconds more (the slow tail) and a error_rate fraction of the
+requests is answered with error_status. With a seed the same requests of a run stall and fail every time: the
+k-th request gets the k-th draws of a random.Random(seed). The area code NOTFOUND always gives a 404.
+It can also run on its own, eg. to point weatherterm serve at it:
+
+    python -m benchmarks.fake_server --port 8080 --latency 0.05 --error-rate 0.01
+"""
+
+import gzip
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_url_regex = re.compile(r'^/weather/(?P<forecast>[^/]+)/1/(?P<area>[^/?]+)')
+
+
+def load_fixtures(dirname=FIXTURES_DIR):
+    """Returns a dictionary of forecast url segment (today, 5day, 10day, weekend) to page bytes"""
+    pages = {}
+    for file in os.listdir(dirname):
+        if file.endswith('.html'):
+            with open(os.path.join(dirname, file), 'rb') as f:
+                pages[file.replace('.html', '')] = f.read()
+    return pages
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1, BaseHTTPRequestHandler defaults to HTTP/1.0
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, without TCP_NODELAY Nagle's algorithm adds ~40ms to every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        match = _url_regex.match(self.path)
+        page = match and self.server.pages.get(match.group('forecast'))
+        # the draws of a request are taken together, so the threads of the server do not mix up the sequence of
+        # a seeded run
+        with self.server.lock:
+            self.server.requests += 1
+            jitter, stall, error = (self.server.random.random() for _ in range(3))
+
+        delay = self.server.latency + jitter * self.server.jitter
+        if stall < self.server.stall_rate:
+            delay += self.server.stall
+        if delay:
+            time.sleep(delay)
+
+        if error < self.server.error_rate:
+            self._send(self.server.error_status, b'<html><head><title>Server Error</title></head></html>')
+            return
+
+        if page is None or match.group('area') == 'NOTFOUND':
+            self._send(404, b'<html><head><title>404 Not Found</title></head></html>')
+            return
+
+        # the ETag lets clients revalidate their cached copy, an unchanged page is answered with 304
+        etag = self.server.etags[match.group('forecast')]
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', {'ETag': etag})
+            return
+
+        headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            page = self.server.compressed[match.group('forecast')]
+            headers['Content-Encoding'] = 'gzip'
+
+        self._send(200, page, headers)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the default handler logs every request to stderr, that would drown the benchmark output
+        pass
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+    """Serves the recorded pages on 127.0.0.1 in a background thread. Use it as a context manager:
+
+        with FakeWeatherServer(latency=0.02) as server:
+            parser_class = type('LocalParser', (WeatherComParser,), {'base_url': server.base_url})
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, pages=None, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, stall_rate=0.0,
+                 stall=0.0, seed=None):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # number of requests served, lets benchmarks count how many fetches really reached the server
+        self.requests = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pages = pages if pages is not None else load_fixtures()
+        self.compressed = {name: gzip.compress(page) for name, page in self.pages.items()}
+        self.etags = {name: '"%s"' % hashlib.sha1(page).hexdigest() for name, page in self.pages.items()}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The same URL template as WeatherComParser.base_url but pointing at this server"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/weather/{{forecast}}/1/{{area}}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='fake_server', description='Local stand-in for weather.com')
+    argparser.add_argument('--port', type=int, default=8080)
+    argparser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    argparser.add_argument('--jitter', type=float, default=0.0, help='Up to this many more seconds, at random')
+    argparser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    argparser.add_argument('--error-status', type=int, default=503)
+    argparser.add_argument('--stall-rate', type=float, default=0.0, help='Fraction of requests that stall')
+    argparser.add_argument('--stall', type=float, default=0.0, help='Seconds a stalled request waits')
+    argparser.add_argument('--seed', type=int, help='Seed of the stalls and the errors, the same every run')
+    args = argparser.parse_args(argv)
+
+    server = FakeWeatherServer(args.port, latency=args.latency, jitter=args.jitter,
+                               error_rate=args.error_rate, error_status=args.error_status,
+                               stall_rate=args.stall_rate, stall=args.stall, seed=args.seed)
+    print(f'serving {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Compares the fetch backends against the local stand-in server.
+cold is the time to create a backend and fetch the first page (browser start up, first connection),
+warm is the time of every following fetch on the same backend.
+
+    python -m benchmarks.fetch_backends --repeat 50
+"""
+
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import BackendType
+from weatherterm.core import create_backend
+
+FORECASTS = ['today', '5day', '10day', 'weekend']
+
+
+def _measure(backend_type, base_url, repeat):
+    start = time.perf_counter()
+    backend = create_backend(backend_type)
+    backend.fetch(base_url.format(forecast='today', area='USNY0996'))
+    cold = time.perf_counter() - start
+
+    warm = []
+    for i in range(repeat):
+        url = base_url.format(forecast=FORECASTS[i % len(FORECASTS)], area='USNY0996')
+        start = time.perf_counter()
+        backend.fetch(url)
+        warm.append(time.perf_counter() - start)
+
+    backend.close()
+    return cold, warm
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='fetch_backends', description='Benchmark the weatherterm fetch backends')
+    argparser.add_argument('--repeat', type=int, default=40, help='Number of warm fetches per backend')
+    argparser.add_argument('--backend', action='append', choices=[name.lower() for name in BackendType.__members__],
+                           help='Backend to benchmark, can be repeated. Defaults to all of them')
+    args = argparser.parse_args(argv)
+    backend_names = args.backend or [name.lower() for name in BackendType.__members__]
+
+    print(f'{"backend":<10}{"cold ms":>10}{"warm mean ms":>15}{"warm p50 ms":>14}{"warm p95 ms":>14}')
+    with FakeWeatherServer() as server:
+        for name in backend_names:
+            try:
+                cold, warm = _measure(BackendType[name.upper()], server.base_url, args.repeat)
+            except Exception as e:  # the browser backend needs selenium and phantomjs to be installed
+                print(f'{name:<10} skipped: {e}', file=sys.stderr)
+                continue
+
+            p95 = sorted(warm)[int(len(warm) * 0.95) - 1]
+            print(f'{name:<10}{cold * 1000:>10.2f}{statistics.mean(warm) * 1000:>15.2f}'
+                  f'{statistics.median(warm) * 1000:>14.2f}{p95 * 1000:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
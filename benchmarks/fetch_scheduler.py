@@ -0,0 +1,137 @@
+"""Checks the FetchScheduler against the local stand-in server with injected latency, stalls and errors:
+
+  retries   5xx answers on a fraction of the requests: success rate without and with retries
+  hedging   a small fraction of the requests stalls: p50/p99 fetch time without and with hedged requests
+  rate      a burst of concurrent fetches with a per host rate limit: the achieved request rate
+  deadline  every request stalls: how long a fetch takes to give up with --timeout
+
+Every section checks its outcome: retries recover the 503s (at most 1% of the fetches fail, without retries about
+20% do), hedging at least halves the p99, the achieved rate stays within the limit (the burst aside) and every
+stalled fetch gives up within 0.25s of its timeout. The exit status is 1 when a check fails.
+
+    python -m benchmarks.fetch_scheduler --fetches 300
+"""
+
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import FetchError
+from weatherterm.core import FetchScheduler
+from weatherterm.core import Metrics
+from weatherterm.core import create_backend
+
+
+def _fetch_all(backend, url, fetches, workers):
+    def fetch(_):
+        start = time.perf_counter()
+        try:
+            backend.fetch(url)
+            return True, time.perf_counter() - start
+        except FetchError:
+            return False, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch, range(fetches)))
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _stats(results):
+    """The fraction of the fetches that succeeded, the p50 and the p99 of their times in milliseconds"""
+    times = [elapsed * 1000 for _, elapsed in results]
+    return sum(ok for ok, _ in results) / len(results), statistics.median(times), _percentile(times, 0.99)
+
+
+def _summary(results):
+    ok, p50, p99 = _stats(results)
+    return f'{ok * 100:5.1f}% ok, p50 {p50:7.1f} ms, p99 {p99:7.1f} ms'
+
+
+def _check(failures, passed, message):
+    if not passed:
+        print(f'FAIL: {message}', file=sys.stderr)
+        failures.append(message)
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='fetch_scheduler', description='Check retries, hedging, rate limits and deadlines')
+    argparser.add_argument('--fetches', type=int, default=300)
+    argparser.add_argument('--workers', type=int, default=8)
+    argparser.add_argument('--seed', type=int, default=1,
+                           help='Seed of the injected errors and stalls, the checks see the same ones every run')
+    args = argparser.parse_args(argv)
+
+    failures = []
+
+    print('retries (20% of the requests fail with 503)')
+    ok_rates = {}
+    with FakeWeatherServer(latency=0.005, error_rate=0.2, seed=args.seed) as server:
+        url = server.base_url.format(forecast='today', area='USNY0996')
+        for retries in (0, 3):
+            scheduler = FetchScheduler(create_backend(), retries=retries, backoff=0.05)
+            results = _fetch_all(scheduler, url, args.fetches, args.workers)
+            ok_rates[retries] = _stats(results)[0]
+            print(f'  retries={retries}  {_summary(results)}')
+            scheduler.close()
+    _check(failures, ok_rates[0] < 0.9, f'only {(1 - ok_rates[0]) * 100:.1f}% of the fetches failed without retries, '
+                                        f'the 503s were not injected')
+    _check(failures, ok_rates[3] >= 0.99, f'{(1 - ok_rates[3]) * 100:.1f}% of the fetches failed with 3 retries')
+
+    print('hedging (5% of the requests stall for 0.5s)')
+    p99s = {}
+    with FakeWeatherServer(latency=0.01, jitter=0.01, stall_rate=0.05, stall=0.5, seed=args.seed) as server:
+        url = server.base_url.format(forecast='today', area='USNY0996')
+        for hedge in (False, True):
+            metrics = Metrics()
+            scheduler = FetchScheduler(create_backend(), hedge=hedge, metrics=metrics)
+            # warm up: the hedge delay is the 95th percentile of the recent fetch times, at most 3 times their median
+            _fetch_all(scheduler, url, FetchScheduler.min_samples, 1)
+            results = _fetch_all(scheduler, url, args.fetches, args.workers)
+            p99s[hedge] = _stats(results)[2]
+            counters = metrics.to_dict()['counters']
+            hedges = sum(counter['value'] for counter in counters if counter['counter'] == 'hedges')
+            print(f'  hedge={str(hedge):<5}  {_summary(results)}, {hedges} hedged requests')
+            scheduler.close()
+    _check(failures, p99s[True] <= p99s[False] / 2,
+           f'hedging did not halve the p99 ({p99s[False]:.1f} ms without, {p99s[True]:.1f} ms with)')
+
+    print('rate (limit of 50 requests per second, burst of 5)')
+    rate, burst, fetches = 50, 5, 100
+    with FakeWeatherServer() as server:
+        url = server.base_url.format(forecast='today', area='USNY0996')
+        scheduler = FetchScheduler(create_backend(), rate=rate, burst=burst)
+        start = time.perf_counter()
+        _fetch_all(scheduler, url, fetches, args.workers)
+        elapsed = time.perf_counter() - start
+        # the burst goes out at once, the rest of the requests at the rate
+        measured = (fetches - burst) / elapsed
+        print(f'  {fetches} fetches in {elapsed:.2f}s = {fetches / elapsed:.1f} requests/s, '
+              f'{measured:.1f} requests/s after the burst')
+        scheduler.close()
+    # 2% for the clock and the scheduling of the threads
+    _check(failures, measured <= rate * 1.02, f'{measured:.1f} requests/s is over the limit of {rate} per second')
+
+    print('deadline (every request stalls for 5s, timeout of 0.5s)')
+    timeout = 0.5
+    with FakeWeatherServer(stall_rate=1.0, stall=5.0) as server:
+        url = server.base_url.format(forecast='today', area='USNY0996')
+        scheduler = FetchScheduler(create_backend(), timeout=timeout)
+        results = _fetch_all(scheduler, url, 4, 4)
+        print(f'  {_summary(results)}')
+        scheduler.close()
+    _check(failures, not any(ok for ok, _ in results), 'a stalled fetch succeeded')
+    slowest = max(elapsed for _, elapsed in results)
+    _check(failures, slowest <= timeout + 0.25, f'a fetch gave up after {slowest:.2f}s, its timeout is {timeout}s')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
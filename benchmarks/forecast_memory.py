@@ -0,0 +1,63 @@
+"""Compares the memory used by a list of Forecast objects with a columnar ForecastBatch holding the same rows,
+and the time to compute the mean high temperature over each.
+
+    python -m benchmarks.forecast_memory --rows 100000
+"""
+
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from weatherterm.core import Forecast
+from weatherterm.core import ForecastBatch
+from weatherterm.core import ForecastType
+
+_descriptions = ['Partly Cloudy', 'Sunny', 'Scattered Thunderstorms', 'Mostly Cloudy', 'Showers', 'Rain']
+_days = ['Sat', 'Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri']
+
+
+def _make_forecasts(rows):
+    """Rows like the ones the 10 day page gives, with the same mixed int/str temperatures"""
+    random.seed(1)
+    for i in range(rows):
+        high = random.randint(40, 95) + random.choice((0.0, 0.5))
+        yield Forecast(0, f'{random.randint(20, 95)}%', f'SW {random.randint(0, 25)} mph',
+                       high_temp=int(high) if high.is_integer() else f'{high:.1f}', low_temp=int(high) - 12,
+                       description=random.choice(_descriptions),
+                       forecast_date=f'{_days[i % 7]} OCT {1 + i % 28}', forecast_type=ForecastType.TENDAYS)
+
+
+def _measure(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='forecast_memory', description='Per object vs columnar forecast storage')
+    argparser.add_argument('--rows', type=int, default=100000)
+    args = argparser.parse_args(argv)
+
+    forecasts, list_size = _measure(lambda: list(_make_forecasts(args.rows)))
+    batch, batch_size = _measure(lambda: ForecastBatch.from_forecasts(_make_forecasts(args.rows), area='USNY0996'))
+
+    start = time.perf_counter()
+    list_mean = sum(float(forecast.high_temp) for forecast in forecasts) / len(forecasts)
+    list_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_mean = batch.mean('high_temp')
+    batch_time = time.perf_counter() - start
+
+    print(f'{"storage":<14}{"rows":>9}{"MB":>9}{"bytes/row":>11}{"mean high ms":>14}')
+    for name, size, elapsed in [('list[Forecast]', list_size, list_time), ('ForecastBatch', batch_size, batch_time)]:
+        print(f'{name:<14}{args.rows:>9}{size / 1024 / 1024:>9.1f}{size / args.rows:>11.0f}{elapsed * 1000:>14.2f}')
+
+    assert abs(list_mean - batch_mean) < 1e-6, 'both storages must give the same mean'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Terminal output of a large batch: the 10 day forecasts of --areas areas, one area arriving every --arrival-ms
+milliseconds like the results of a batch run. The output goes to /dev/null through a stream that counts the
+write() system calls:
+
+  print          a print(flush=True) per forecast, a terminal is line buffered
+  text           the text writer, flushed after every area
+  grid row       the grid, flushed after every row
+  grid 0.1s      the grid, flushed at most every 0.1s
+  grid buffer    the grid, written when the 64 KiB buffer is full (the default when stdout is not a terminal)
+
+    python -m benchmarks.grid_output --areas 50 --arrival-ms 2
+"""
+
+import io
+import os
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+from weatherterm.core import Forecast
+from weatherterm.core import ForecastType
+from weatherterm.core import OutputFormat
+from weatherterm.core import create_writer
+
+
+class _CountingFile(io.FileIO):
+    """/dev/null counting the writes that reach it"""
+
+    def __init__(self):
+        super().__init__(os.devnull, 'w')
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def _forecasts(today):
+    return [Forecast(float('nan'), f'{50 + day}%', 'SW 10 mph', high_temp=70.0 + day, low_temp=50.0 + day,
+                     description='Partly Cloudy', forecast_date=(today + timedelta(days=day)).strftime('%a %b %d'),
+                     forecast_type=ForecastType.TENDAYS) for day in range(10)]
+
+
+def _run(name, areas, arrival, write_area):
+    raw = _CountingFile()
+    stream = io.TextIOWrapper(io.BufferedWriter(raw, 1 << 16), encoding='utf-8', newline='')
+    start = time.perf_counter()
+    cpu = time.process_time()
+    close = write_area(stream)
+    for area in areas:
+        close(area)
+        if arrival:
+            time.sleep(arrival)
+    close(None)
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+    stream.flush()
+    print(f'{name:<14}{raw.writes:>8}{cpu * 1000:>10.1f}{elapsed * 1000:>12.1f}')
+    raw.close()
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='grid_output', description='Write calls and render time of the grid output')
+    argparser.add_argument('--areas', type=int, default=50)
+    argparser.add_argument('--arrival-ms', type=float, default=2.0)
+    args = argparser.parse_args(argv)
+
+    forecasts = _forecasts(date.today())
+    areas = [f'AREA{number:04}' for number in range(args.areas)]
+    arrival = args.arrival_ms / 1000
+    print(f'{args.areas} areas x 10 days, an area every {args.arrival_ms}ms')
+    print(f'{"output":<14}{"writes":>8}{"cpu ms":>10}{"wall ms":>12}')
+
+    def printing(stream):
+        # the old output: print() per forecast, flushed per line on a terminal
+        def area_done(area):
+            if area is not None:
+                for forecast in forecasts:
+                    print(forecast, file=stream, flush=True)
+        return area_done
+
+    def writer(output_format, **options):
+        def factory(stream):
+            forecast_writer = create_writer(output_format, stream, **options)
+
+            def area_done(area):
+                if area is None:
+                    forecast_writer.close()
+                    return
+                forecast_writer.section(f'{area} (10day)')
+                forecast_writer.write(forecasts, area)
+                forecast_writer.flush()
+            return area_done
+        return factory
+
+    grid_options = {'forecast_types': [ForecastType.TENDAYS], 'areas': areas}
+    _run('print', areas, arrival, printing)
+    _run('text', areas, arrival, writer(OutputFormat.TEXT))
+    _run('grid row', areas, arrival, writer(OutputFormat.GRID, flush_interval=None, **grid_options))
+    _run('grid 0.1s', areas, arrival, writer(OutputFormat.GRID, flush_interval=0.1, **grid_options))
+    _run('grid buffer', areas, arrival, writer(OutputFormat.GRID, flush_interval=0, **grid_options))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark of the forecast history: rows written per second by HistoryStore.add and the time of the range,
+trend and compare queries of one area once the database holds millions of rows.
+The history is a year of hourly runs (today plus 10 day forecasts) for as many areas as needed to reach --rows.
+
+    python -m benchmarks.history_store --rows 1000000
+"""
+
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, datetime, timedelta
+
+from weatherterm.core import Forecast
+from weatherterm.core import ForecastType
+from weatherterm.core import HistoryStore
+
+
+def _forecasts(day, random_state):
+    today = Forecast(random_state.uniform(40, 90), f'{random_state.randint(20, 99)}%', 'SW 9 mph',
+                     random_state.uniform(60, 95), random_state.uniform(30, 60), 'Sunny', forecast_date=day)
+    ten_days = [Forecast(None, f'{random_state.randint(20, 99)}%', 'SW 4 mph', random_state.uniform(60, 95),
+                         random_state.uniform(30, 60), 'Cloudy',
+                         forecast_date=(day + timedelta(days=ahead)).strftime('%a %b %d').upper(),
+                         forecast_type=ForecastType.TENDAYS)
+                for ahead in range(10)]
+    return [today], ten_days
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='history_store', description='Benchmark the forecast history store')
+    argparser.add_argument('--rows', type=int, default=1000000)
+    argparser.add_argument('--db', help='Database to fill (default: a temporary file)')
+    args = argparser.parse_args(argv)
+
+    directory = tempfile.TemporaryDirectory()
+    path = args.db or os.path.join(directory.name, 'history.sqlite3')
+    random_state = random.Random(0)
+    first_day = date(2025, 10, 1)
+    runs_per_area = 365 * 24
+    areas = [f'AREA{number:04}' for number in range(max(1, args.rows // (runs_per_area * 11)))]
+
+    rows = 0
+    start = time.perf_counter()
+    with HistoryStore(path, batch_size=10000) as store:
+        for area in areas:
+            for run in range(runs_per_area):
+                fetched_at = datetime.combine(first_day, datetime.min.time()).timestamp() + run * 3600
+                today, ten_days = _forecasts(first_day + timedelta(days=run // 24), random_state)
+                store.add(today, area, 'WeatherComParser', fetched_at=fetched_at)
+                store.add(ten_days, area, 'WeatherComParser', fetched_at=fetched_at)
+                rows += 11
+    elapsed = time.perf_counter() - start
+    print(f'{rows} rows written in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s), '
+          f'{os.path.getsize(path) / 1024 / 1024:.0f} MB')
+
+    month = (date(2026, 3, 1), date(2026, 3, 31))
+    with HistoryStore(path) as store:
+        for name, query in [('range', lambda: store.range(areas[-1], *month)),
+                            ('range latest', lambda: store.range(areas[-1], *month, latest=True)),
+                            ('trend', lambda: store.trend(areas[-1], *month)),
+                            ('compare', lambda: store.compare(areas[-1], *month))]:
+            start = time.perf_counter()
+            result = query()
+            print(f'{name:<14}{(time.perf_counter() - start) * 1000:>9.1f} ms{len(result):>8} rows')
+
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Load test of the forecast daemon. A ForecastServer is started in this process in front of the local
+stand-in upstream, then --clients threads send queries for --areas distinct area codes for --duration
+seconds. Prints queries per second and latency percentiles.
+
+    python -m benchmarks.load_test --clients 16 --areas 50 --duration 10
+    python -m benchmarks.load_test --listen unix:/tmp/weatherterm.sock --ttl 0
+"""
+
+import statistics
+import threading
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import ForecastClient
+from weatherterm.core import ForecastServer
+from weatherterm.core import ForecastService
+from weatherterm.core import ForecastType
+from weatherterm.core import create_backend
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+def _client(address, areas, deadline, latencies, errors, offset):
+    client = ForecastClient(address, 'WeatherComParser')
+    i = offset
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            client.query(f'AREA{i % areas:04d}', ForecastType.TODAY)
+        except Exception:
+            errors.append(1)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    client.close()
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='load_test', description='Load test the weatherterm serve daemon')
+    argparser.add_argument('--clients', type=int, default=8)
+    argparser.add_argument('--areas', type=int, default=20, help='Number of distinct area codes queried')
+    argparser.add_argument('--duration', type=float, default=5.0)
+    argparser.add_argument('--ttl', type=int, default=60, help='Result TTL of the daemon, 0 parses every query')
+    argparser.add_argument('--listen', default='127.0.0.1:0')
+    args = argparser.parse_args(argv)
+
+    with FakeWeatherServer() as upstream:
+        parser_class = type('LocalWeatherComParser', (WeatherComParser,), {'base_url': upstream.base_url})
+        service = ForecastService({'WeatherComParser': parser_class},
+                                  backend=create_backend(maxsize=args.clients), ttl=args.ttl)
+        server = ForecastServer(service, args.listen).start()
+
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=_client, args=(server.address, args.areas, deadline, latencies, errors, n))
+                   for n in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.close()
+
+    latencies.sort()
+    print(f'queries:     {len(latencies)} ({len(errors)} errors)')
+    print(f'qps:         {len(latencies) / elapsed:.1f}')
+    print(f'p50 latency: {statistics.median(latencies) * 1000:.2f} ms')
+    print(f'p99 latency: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
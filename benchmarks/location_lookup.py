@@ -0,0 +1,107 @@
+"""Lookup latency and resident memory of the offline location index on a large synthetic gazetteer (random place
+names made of syllables, postal codes and coordinates). The index is built in a temporary directory, then every
+kind of lookup is run --queries times with names taken from the gazetteer.
+
+    python -m benchmarks.location_lookup --places 1000000
+"""
+
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS, ArgumentParser
+
+from weatherterm.core import LocationIndex
+
+# consonant-vowel and consonant-vowel-consonant syllables, about 2000 of them
+_syllables = [consonant + vowel + end for consonant in 'bcdfghjklmnprstvwz' for vowel in 'aeiou'
+              for end in ('', 'n', 'r', 'l', 's', 'th', 'rg', 'ck')]
+
+
+def _rss_mb():
+    # the resident set size right now (Linux), in pages in the second field of /proc/self/statm
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _gazetteer(path, places, random_state):
+    names = []
+    with open(path, 'w', encoding='utf-8') as f:
+        for number in range(places):
+            name = ''.join(random_state.choice(_syllables) for _ in range(random_state.randint(2, 3))).title()
+            names.append(name)
+            f.write(f'XX{number:08d}\t{name}\tR{number % 50:02d}\tXX\t{number:07d}\t'
+                    f'{random_state.uniform(-60, 70):.4f}\t{random_state.uniform(-180, 180):.4f}\n')
+    return names
+
+
+def _time(func, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def _lookups(index_directory, sample_path):
+    """Runs in its own process, so that the memory used to build the index does not count"""
+    with open(sample_path, encoding='utf-8') as f:
+        sample = f.read().splitlines()
+    random_state = random.Random(1)
+    typos = [name[:3] + name[4:] for name in sample]
+    coordinates = [(random_state.uniform(-60, 70), random_state.uniform(-180, 180)) for _ in sample]
+
+    rss_before = _rss_mb()
+    index = LocationIndex(index_directory)
+    print(f'{"lookup":<10}{"median ms":>11}{"max ms":>10}')
+    for kind, func, queries in [('exact', index.exact, sample),
+                                ('prefix', lambda query: index.prefix(query[:4]), sample),
+                                ('fuzzy', index.fuzzy, typos),
+                                ('nearest', lambda point: index.nearest(*point), coordinates),
+                                ('resolve', lambda query: index.search(query, 1), sample)]:
+        median, worst = _time(func, queries)
+        print(f'{kind:<10}{median:>11.3f}{worst:>10.2f}')
+    print(f'resident memory {rss_before:.0f} MB before opening the index, {_rss_mb():.0f} MB after the lookups '
+          f'(the mapped pages of the index files count as resident once touched)')
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='location_lookup', description='Benchmark the offline location index')
+    argparser.add_argument('--places', type=int, default=1000000)
+    argparser.add_argument('--queries', type=int, default=1000)
+    # used by the benchmark itself to run the lookups in a new process
+    argparser.add_argument('--index', help=SUPPRESS)
+    argparser.add_argument('--sample', help=SUPPRESS)
+    args = argparser.parse_args(argv)
+
+    if args.index:
+        _lookups(args.index, args.sample)
+        return
+
+    random_state = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        gazetteer = os.path.join(directory, 'gazetteer.tsv')
+        index_directory = os.path.join(directory, 'index')
+        names = _gazetteer(gazetteer, args.places, random_state)
+        start = time.perf_counter()
+        LocationIndex.build(gazetteer, index_directory)
+        size = sum(os.path.getsize(os.path.join(index_directory, name)) for name in os.listdir(index_directory))
+        print(f'{args.places} places indexed in {time.perf_counter() - start:.1f}s, {size / 1024 / 1024:.0f} MB')
+
+        sample_path = os.path.join(directory, 'sample.txt')
+        with open(sample_path, 'w', encoding='utf-8') as f:
+            f.writelines(f'{name}\n' for name in random_state.sample(names, min(args.queries, len(names))))
+        subprocess.run([sys.executable, '-m', 'benchmarks.location_lookup', '--index', index_directory,
+                        '--sample', sample_path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Memory ceiling of a long batch: --pages pages (every forecast type of --pages / 4 areas) are fetched from the
+local stand-in server with no latency and go through the whole run like on the command line (the batch runner,
+the ndjson writer to /dev/null and a history database). Fetching the recorded pages is much faster than parsing
+them, so without a bound the fetched pages pile up waiting for the parse workers.
+
+Every replay runs in a process of its own, which prints its resident memory (RSS) every 10% of the pages and its
+maximum. Both replays run the same pages: the --max-pages replay must stay under --ceiling MB and the replay without
+a bound must go over it (a ceiling both stay under shows nothing), the exit status is 1 when either does not. The
+replay without a bound keeps most of the pages in memory, about 250KB each.
+
+    python -m benchmarks.memory_ceiling --pages 10000 --max-pages 8 --ceiling 100
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS, ArgumentParser, Namespace
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import BatchRunner
+from weatherterm.core import ForecastType
+from weatherterm.core import HistoryStore
+from weatherterm.core import OutputFormat
+from weatherterm.core import PageBudget
+from weatherterm.core import ParsePool
+from weatherterm.core import create_backend
+from weatherterm.core import create_writer
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# a module level parser class so the parse workers can import it, its base_url is set in every process
+LocalParser = type('LocalParser', (WeatherComParser,), {'__module__': __name__})
+
+
+def _rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _page_size
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _replay(pages, max_pages, parse_workers, workers):
+    with FakeWeatherServer() as server, tempfile.TemporaryDirectory() as directory, \
+            open(os.devnull, 'w', buffering=1 << 16, encoding='utf-8', newline='') as devnull:
+        LocalParser.base_url = server.base_url
+        backend = create_backend(maxsize=workers)
+        options = {'bounded_memory': True} if max_pages else {}
+        parse_pool = ParsePool(LocalParser, workers=parse_workers) if parse_workers else None
+        runner = BatchRunner(lambda: LocalParser(backend=backend, **options), workers=workers, parse_pool=parse_pool,
+                             page_budget=PageBudget(max_pages) if max_pages else None)
+        writer = create_writer(OutputFormat.NDJSON, devnull)
+        history = HistoryStore(os.path.join(directory, 'history.sqlite3'))
+
+        areas = [f'AREA{number:05}' for number in range(max(1, pages // len(ForecastType)))]
+        args = Namespace(unit=None, forecast_option=ForecastType.TODAY)
+        samples = []
+        done = failed = 0
+        start = time.perf_counter()
+        try:
+            for result in runner.run(args, areas, list(ForecastType)):
+                done += 1
+                if not result.ok:
+                    failed += 1
+                writer.write(result.forecasts, result.area)
+                history.add(result.forecasts, result.area, 'LocalParser')
+                if done % max(1, len(areas) * len(ForecastType) // 10) == 0:
+                    samples.append(_rss())
+        finally:
+            writer.close()
+            history.close()
+            if parse_pool is not None:
+                parse_pool.close()
+            backend.close()
+
+    return {'pages': done, 'failed': failed, 'seconds': time.perf_counter() - start, 'samples': samples,
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def _run_child(pages, max_pages, args):
+    command = [sys.executable, '-m', 'benchmarks.memory_ceiling', '--child', '--pages', str(pages),
+               '--parse-workers', str(args.parse_workers), '--workers', str(args.workers)]
+    # 0 is no bound, the child would take the default of --max-pages otherwise
+    command += ['--max-pages', str(max_pages or 0)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def _print(name, result):
+    megabyte = 1024 * 1024
+    samples = ' '.join(f'{sample / megabyte:.0f}' for sample in result['samples'])
+    print(f'{name:<22}{result["pages"]:>7}{result["seconds"]:>9.1f}{result["max_rss"] / megabyte:>10.1f}  '
+          f'RSS every 10%: {samples}')
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='memory_ceiling', description='Memory ceiling of a long batch with --max-pages')
+    argparser.add_argument('--pages', type=int, default=10000)
+    argparser.add_argument('--max-pages', type=int, default=8)
+    argparser.add_argument('--ceiling', type=float, default=100.0, help='Most MB of RSS the bounded replay may use')
+    argparser.add_argument('--parse-workers', type=int, default=1, help='0 parses in the fetching threads')
+    argparser.add_argument('--workers', type=int, default=8)
+    argparser.add_argument('--child', action='store_true', help=SUPPRESS)
+    args = argparser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_replay(args.pages, args.max_pages, args.parse_workers, args.workers)))
+        return 0
+
+    print(f'{"replay":<22}{"pages":>7}{"seconds":>9}{"max MB":>10}')
+    unbounded = _run_child(args.pages, None, args)
+    _print('no bound', unbounded)
+    bounded = _run_child(args.pages, args.max_pages, args)
+    _print(f'--max-pages {args.max_pages}', bounded)
+
+    max_rss = bounded['max_rss'] / 1024 / 1024
+    unbounded_rss = unbounded['max_rss'] / 1024 / 1024
+    failed = False
+    if max_rss > args.ceiling:
+        print(f'FAILED: {max_rss:.1f} MB with --max-pages is over the ceiling of {args.ceiling:.0f} MB')
+        failed = True
+    if unbounded_rss <= args.ceiling:
+        print(f'FAILED: {unbounded_rss:.1f} MB without a bound is under the ceiling of {args.ceiling:.0f} MB too, '
+              f'run more pages or lower --ceiling')
+        failed = True
+    if failed:
+        return 1
+    print(f'ok: {max_rss:.1f} MB with --max-pages {args.max_pages} is under the ceiling of {args.ceiling:.0f} MB, '
+          f'{unbounded_rss:.1f} MB without a bound')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Throughput of the --format writers: the 10 day forecasts of the recorded page are written again and again
+(one area per 10 rows) to /dev/null, against a print() per forecast which the text output used to do.
+
+    python -m benchmarks.output_formats --rows 300000
+"""
+
+import os
+import time
+from argparse import ArgumentParser, Namespace
+
+from weatherterm.core import ForecastType
+from weatherterm.core import OutputFormat
+from weatherterm.core import create_writer
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+from benchmarks.fake_server import load_fixtures
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='output_formats', description='Benchmark the streaming output writers')
+    argparser.add_argument('--rows', type=int, default=300000)
+    args = argparser.parse_args(argv)
+
+    page = load_fixtures()['10day'].decode('utf-8')
+    parse_args = Namespace(forecast_option=ForecastType.TENDAYS, unit=None)
+    forecasts = WeatherComParser().parse(page, parse_args)
+    areas = [f'AREA{number:06}' for number in range(args.rows // len(forecasts))]
+    rows = len(areas) * len(forecasts)
+
+    print(f'{"format":>8}{"seconds":>10}{"rows/s":>12}')
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        start = time.perf_counter()
+        for area in areas:
+            for forecast in forecasts:
+                print(forecast, file=devnull, flush=True)
+        elapsed = time.perf_counter() - start
+        print(f'{"print":>8}{elapsed:>10.2f}{rows / elapsed:>12.0f}')
+
+    for output_format in OutputFormat:
+        with open(os.devnull, 'w', buffering=1 << 16, encoding='utf-8', newline='') as devnull:
+            start = time.perf_counter()
+            writer = create_writer(output_format, devnull)
+            for area in areas:
+                writer.write(forecasts, area)
+            writer.close()
+            elapsed = time.perf_counter() - start
+        print(f'{output_format.name.lower():>8}{elapsed:>10.2f}{rows / elapsed:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compares the HTML engines of WeatherComParser on the recorded pages of every forecast type: parse time
+(median of --repeat runs) and peak memory measured with tracemalloc. It also checks that every engine
+returns the same forecasts as the full html.parser tree.
+
+    python -m benchmarks.parse_engines --repeat 20
+"""
+
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.fake_server import load_fixtures
+from weatherterm.core import ForecastType
+from weatherterm.core import HtmlEngine
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+def _parse(parser, page, forecast_type):
+    return parser.parse(page, Namespace(forecast_option=forecast_type, unit=None, area_code='fixture'))
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='parse_engines', description='Benchmark the weatherterm HTML engines')
+    argparser.add_argument('--repeat', type=int, default=10)
+    args = argparser.parse_args(argv)
+
+    pages = {name: page.decode('utf-8') for name, page in load_fixtures().items()}
+    expected = {}
+    failed = False
+
+    print(f'{"type":<10}{"engine":<10}{"median ms":>11}{"peak KB":>10}')
+    for forecast_type in ForecastType:
+        page = pages[forecast_type.value]
+
+        for engine in HtmlEngine:
+            parser = WeatherComParser(engine=engine)
+            try:
+                results = _parse(parser, page, forecast_type)
+            except ImportError as e:
+                print(f'{forecast_type.value:<10}{engine.name.lower():<10} skipped: {e}', file=sys.stderr)
+                continue
+
+            results = [forecast.to_dict() for forecast in results]
+            if expected.setdefault(forecast_type, results) != results:
+                print(f'{forecast_type.value:<10}{engine.name.lower():<10} DIFFERENT RESULTS', file=sys.stderr)
+                failed = True
+
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _parse(parser, page, forecast_type)
+                times.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            _parse(parser, page, forecast_type)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            times.sort()
+            print(f'{forecast_type.value:<10}{engine.name.lower():<10}{times[len(times) // 2] * 1000:>11.2f}'
+                  f'{peak / 1024:>10.0f}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
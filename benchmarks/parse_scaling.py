@@ -0,0 +1,81 @@
+"""Scaling of process pool parsing over the recorded pages. A corpus of --pages pages (the recorded pages of every
+forecast type, repeated) is parsed in this process, like the batch threads do, and then by ParsePools of 1 to
+--max-workers worker processes:
+
+  start    time until the workers of a new pool answered, paid once per batch
+  pages/s  pages parsed per second once the workers are running
+  speedup  against parsing in this process
+
+Parsing is CPU bound, more workers than cores only add overhead.
+
+    python -m benchmarks.parse_scaling --pages 200 --max-workers 8 --chunk-size 4
+"""
+
+import os
+import time
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.fake_server import load_fixtures
+from weatherterm.core import ForecastType
+from weatherterm.core import ParsePool
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+def _corpus(pages):
+    fixtures = load_fixtures()
+    forecast_types = [forecast_type for forecast_type in ForecastType if forecast_type.value in fixtures]
+    corpus = []
+    for i in range(pages):
+        forecast_type = forecast_types[i % len(forecast_types)]
+        args = Namespace(area_code=f'AREA{i}', forecast_option=forecast_type, unit=None)
+        corpus.append((fixtures[forecast_type.value].decode('utf-8'), args))
+    return corpus
+
+
+def _in_process(corpus):
+    parser = WeatherComParser()
+    start = time.perf_counter()
+    forecasts = sum(len(parser.parse(content, args)) for content, args in corpus)
+    return time.perf_counter() - start, forecasts
+
+
+def _pooled(corpus, workers, chunk_size):
+    pool = ParsePool(WeatherComParser, workers=workers, chunk_size=chunk_size)
+    start = time.perf_counter()
+    # one small chunk per worker starts them all and loads the parser in each of them
+    for future in [pool.submit(corpus[:1]) for _ in range(workers)]:
+        future.result()
+    started = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecasts = sum(len(result) for result in pool.parse_many(corpus))
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return started, elapsed, forecasts
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='parse_scaling', description='Scaling of process pool parsing')
+    argparser.add_argument('--pages', type=int, default=200)
+    argparser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    argparser.add_argument('--chunk-size', type=int, nargs='+', default=[1, 4, 16])
+    args = argparser.parse_args(argv)
+
+    corpus = _corpus(args.pages)
+    print(f'{args.pages} pages, {os.cpu_count()} cores')
+    baseline, expected = _in_process(corpus)
+    print(f'{"":<22}{"start ms":>10}{"pages/s":>10}{"speedup":>9}')
+    print(f'{"in process":<22}{"":>10}{args.pages / baseline:>10.1f}{1.0:>9.2f}')
+
+    workers = 1
+    while workers <= args.max_workers:
+        for chunk_size in args.chunk_size:
+            started, elapsed, forecasts = _pooled(corpus, workers, chunk_size)
+            assert forecasts == expected, 'the workers returned other forecasts'
+            print(f'{f"{workers} workers, chunk {chunk_size}":<22}{started * 1000:>10.0f}'
+                  f'{args.pages / elapsed:>10.1f}{baseline / elapsed:>9.2f}')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
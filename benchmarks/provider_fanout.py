@@ -0,0 +1,99 @@
+"""Queries three stand-in providers (local servers with the recorded pages) one at a time and together with
+ProviderFanout:
+
+  fast    20ms, but 15% of the requests fail with 503
+  slow    120ms, never fails
+  flaky   10 to 300ms, 30% of the requests fail
+
+For every setup: the share of queries that got forecasts, p50/p95 query time and which provider answered.
+fastest should answer about as fast as the fast provider and as often as the slow one, merge takes as long as the
+slowest provider. The last check merges a provider without wind and humidity with one that has them.
+
+    python -m benchmarks.provider_fanout --queries 200
+"""
+
+import statistics
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import FanoutStrategy
+from weatherterm.core import FetchScheduler
+from weatherterm.core import Forecast
+from weatherterm.core import ForecastType
+from weatherterm.core import Metrics
+from weatherterm.core import ProviderFanout
+from weatherterm.core import create_backend
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+class _NoWindParser(WeatherComParser):
+    """A provider whose pages have no wind and no humidity"""
+
+    def parse(self, content, args):
+        return [Forecast.from_dict(dict(forecast.to_dict(), wind='--', humidity=''))
+                for forecast in super().parse(content, args)]
+
+
+def _factory(server, name, parser_class=WeatherComParser):
+    # no retries: the fan out is what hides the failures here
+    parser_class = type(name, (parser_class,), {'base_url': server.base_url})
+    backend = FetchScheduler(create_backend(), retries=0, timeout=5.0)
+    return lambda: parser_class(backend=backend)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _query(fanout, queries):
+    times = []
+    answered = {}
+    ok = 0
+    for query in range(queries):
+        args = Namespace(area_code=f'AREA{query}', forecast_option=ForecastType.TENDAYS, unit=None)
+        result = fanout.fan_out(args)
+        times.append(result.elapsed * 1000)
+        if result.ok:
+            ok += 1
+            answered[result.provider] = answered.get(result.provider, 0) + 1
+    winners = ', '.join(f'{name} {count}' for name, count in sorted(answered.items()))
+    return (f'{ok / queries * 100:6.1f}% ok, p50 {statistics.median(times):6.1f} ms, '
+            f'p95 {_percentile(times, 0.95):6.1f} ms  answered by: {winners}')
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='provider_fanout', description='Fastest wins and merge over several providers')
+    argparser.add_argument('--queries', type=int, default=200)
+    args = argparser.parse_args(argv)
+
+    with FakeWeatherServer(latency=0.02, error_rate=0.15) as fast, FakeWeatherServer(latency=0.12) as slow, \
+            FakeWeatherServer(latency=0.01, jitter=0.29, error_rate=0.3) as flaky:
+        providers = {'fast': _factory(fast, 'FastParser'), 'slow': _factory(slow, 'SlowParser'),
+                     'flaky': _factory(flaky, 'FlakyParser')}
+
+        for name, factory in providers.items():
+            print(f'{name + " alone":<16}{_query(ProviderFanout({name: factory}), args.queries)}')
+
+        metrics = Metrics()
+        fastest = ProviderFanout(providers, FanoutStrategy.FASTEST, metrics=metrics)
+        print(f'{"fastest":<16}{_query(fastest, args.queries)}')
+        # the time of every provider, also of the ones that lost, as recorded in the provider:<name> stages
+        stages = {}
+        for item in metrics.to_dict()['stages']:
+            stages.setdefault(item['stage'], []).append(item['seconds'] * 1000)
+        print('  ' + ', '.join(f'{stage} mean {statistics.mean(times):.1f} ms'
+                               for stage, times in sorted(stages.items())))
+
+        print(f'{"merge":<16}{_query(ProviderFanout(providers, FanoutStrategy.MERGE), args.queries)}')
+
+        partial = {'nowind': _factory(slow, 'NoWindParser', _NoWindParser), 'slow': providers['slow']}
+        merge = ProviderFanout(partial, FanoutStrategy.MERGE)
+        result = merge.fan_out(Namespace(area_code='USNY0996', forecast_option=ForecastType.TENDAYS, unit=None))
+        filled = sum(1 for forecast in result.forecasts if forecast.wind != '--' and forecast.humidity)
+        print(f'merge nowind+slow: {filled} of {len(result.forecasts)} rows with wind and humidity, '
+              f'answered by {result.provider}')
+
+
+if __name__ == '__main__':
+    main()
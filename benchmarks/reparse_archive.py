@@ -0,0 +1,84 @@
+"""Re-derives a month of history from a page archive. The archive holds the fetches of --areas areas, every
+forecast type, --per-day times a day for --days days, made from the recorded pages. A page changes every
+--change-every fetches (a comment is added to it), in between the same page is fetched again like on the live site.
+
+  first     weatherterm reparse on the archive, nothing was parsed before
+  again     the same right after, every page is up to date
+  new code  after a change of the parser (a new parser version), every page is parsed again
+
+    python -m benchmarks.reparse_archive --days 30 --areas 2 --workers 4
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_server import load_fixtures
+from weatherterm.commands import reparse
+from weatherterm.core import PageArchive
+from weatherterm.core import parser_version
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+
+def _build(directory, fixtures, days, areas, per_day, change_every):
+    version = parser_version(WeatherComParser)
+    start = time.time() - days * 86400
+    interval = 86400 / per_day
+    fetches = 0
+    with PageArchive(directory, batch_size=5000) as archive:
+        for area in range(areas):
+            for forecast_type, page in fixtures.items():
+                for fetch in range(days * per_day):
+                    # the content changes every change_every fetches, it is the same page in between
+                    content = f'{page}<!-- {area} {fetch // change_every} -->'
+                    archive.add(content, f'AREA{area:04}', forecast_type, 'WeatherComParser', version,
+                                fetched_at=start + fetch * interval)
+                    fetches += 1
+    return fetches
+
+
+def _reparse(directory, db, workers, *extra):
+    start = time.perf_counter()
+    reparse.main([directory, '--db', db, '--workers', str(workers), *extra])
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='reparse_archive', description='Re-derive a month of history from an archive')
+    argparser.add_argument('--days', type=int, default=30)
+    argparser.add_argument('--areas', type=int, default=2)
+    argparser.add_argument('--per-day', type=int, default=24, help='Fetches per day of every page')
+    argparser.add_argument('--change-every', type=int, default=12, help='Fetches before a page changes')
+    argparser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = argparser.parse_args(argv)
+
+    fixtures = {name: page.decode('utf-8') for name, page in load_fixtures().items()}
+    directory = tempfile.mkdtemp(prefix='weatherterm-archive-')
+    db = os.path.join(directory, 'history.sqlite3')
+    try:
+        start = time.perf_counter()
+        fetches = _build(os.path.join(directory, 'archive'), fixtures, args.days, args.areas, args.per_day,
+                         args.change_every)
+        size = sum(os.path.getsize(os.path.join(root, file))
+                   for root, _, files in os.walk(os.path.join(directory, 'archive')) for file in files)
+        print(f'archive: {fetches} fetches, {size / 1024 / 1024:.1f} MB, built in {time.perf_counter() - start:.1f}s')
+
+        archive = os.path.join(directory, 'archive')
+        first = _reparse(archive, db, args.workers)
+        again = _reparse(archive, db, args.workers)
+        # a new parser version: --force parses every page like a changed parser would
+        forced = _reparse(archive, db, args.workers, '--force')
+
+        connection = sqlite3.connect(db)
+        rows = connection.execute('SELECT COUNT(*) FROM forecasts').fetchone()[0]
+        connection.close()
+        print(f'first {first:.1f}s, again {again:.1f}s, new code {forced:.1f}s, {rows} history rows')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
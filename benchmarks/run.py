@@ -0,0 +1,150 @@
+"""The offline benchmark suite. Every stage of a forecast is measured on its own for each forecast type, against
+the recorded pages served by the local stand-in server:
+
+  fetch    Request.fetch_data (warm keep-alive connection, no cache)
+  parse    parser.extract, from page source to raw rows
+  prepare  parser.prepare, from raw rows to Forecast objects
+  render   str() of every forecast
+  e2e      parser.run plus render
+
+The results are written as JSON so runs of different commits can be compared:
+
+    python -m benchmarks.run --output before.json
+    git checkout other-branch
+    python -m benchmarks.run --compare before.json --fail-on-regression
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+
+from benchmarks.fake_server import FakeWeatherServer
+from weatherterm.core import ForecastType
+from weatherterm.core import Request
+from weatherterm.core import create_backend
+from weatherterm.parsers.weather_com_parser import WeatherComParser
+
+STAGES = ['fetch', 'parse', 'prepare', 'render', 'e2e']
+
+
+def _time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        'median_ms': statistics.median(times) * 1000,
+        'p95_ms': times[max(0, int(len(times) * 0.95) - 1)] * 1000,
+        'min_ms': times[0] * 1000,
+        'runs': repeat,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(repeat, latency=0.0, forecast_types=None):
+    results = {}
+
+    with FakeWeatherServer(latency=latency) as server:
+        parser_class = type('LocalWeatherComParser', (WeatherComParser,), {'base_url': server.base_url})
+        backend = create_backend()
+        request = Request(server.base_url, backend)
+        parser = parser_class(backend=backend)
+
+        for forecast_type in forecast_types or ForecastType:
+            args = Namespace(area_code='USNY0996', forecast_option=forecast_type, unit=None)
+            content = request.fetch_data(args.area_code, forecast_type.value)
+            rows = parser.extract(content, args)
+            forecasts = parser.prepare(rows, args)
+
+            stages = {
+                'fetch': lambda: request.fetch_data(args.area_code, forecast_type.value),
+                'parse': lambda: parser.extract(content, args),
+                # prepare adds keys to the rows, every run gets fresh copies
+                'prepare': lambda: parser.prepare([dict(row) for row in rows], args),
+                'render': lambda: '\n'.join(str(forecast) for forecast in forecasts),
+                'e2e': lambda: '\n'.join(str(forecast) for forecast in parser.run(args)),
+            }
+            for stage in STAGES:
+                results[f'{stage}.{forecast_type.value}'] = _time(stages[stage], repeat)
+
+        backend.close()
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of every benchmark against a previous run, returns the names of the regressions"""
+    regressions = []
+    print(f'{"benchmark":<18}{"before ms":>11}{"after ms":>11}{"change":>9}', file=sys.stderr)
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        change = result['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<18}{before["median_ms"]:>11.3f}{result["median_ms"]:>11.3f}{change:>+9.1%}{flag}',
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='benchmarks.run', description='Offline weatherterm benchmark suite')
+    argparser.add_argument('--repeat', type=int, default=20)
+    argparser.add_argument('--latency', type=float, default=0.0, help='Latency of the stand-in server in seconds')
+    argparser.add_argument('--type', action='append', choices=[t.value for t in ForecastType], dest='types',
+                           help='Only benchmark this forecast type, can be repeated')
+    argparser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    argparser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    argparser.add_argument('--threshold', type=float, default=0.10,
+                           help='Relative slow down counted as a regression (default: 0.10)')
+    argparser.add_argument('--fail-on-regression', action='store_true',
+                           help='Exit with status 1 when a benchmark regressed')
+    args = argparser.parse_args(argv)
+
+    forecast_types = [ForecastType(value) for value in args.types] if args.types else None
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'repeat': args.repeat,
+            'latency': args.latency,
+        },
+        'results': run_suite(args.repeat, args.latency, forecast_types),
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report['results'], json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Checks that `weatherterm --version` stays inside a start up budget. It runs the command under
+python -X importtime several times and fails (exit status 1) when:
+
+ - the median time spent importing weatherterm and everything it pulls in is over --budget-ms
+ - a heavy dependency (BeautifulSoup, selenium, urllib3, the HTTP server...) gets imported at all
+
+    python -m benchmarks.startup_budget --budget-ms 40
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+# modules that must only be imported once a forecast is fetched
+FORBIDDEN = ['bs4', 'selenium', 'urllib3', 'http.server', 'http.client', 'concurrent.futures',
+             'weatherterm.parsers.weather_com_parser']
+
+_line_regex = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_once():
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'weatherterm', '--version'],
+                             cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+
+    imported = {}
+    for line in process.stderr.splitlines():
+        match = _line_regex.match(line)
+        if match:
+            imported[match.group(4)] = int(match.group(2))  # cumulative microseconds
+
+    return wall, imported
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='startup_budget', description='Check the start up budget of weatherterm')
+    argparser.add_argument('--budget-ms', type=float, default=40.0,
+                           help='Maximum median import time of weatherterm in milliseconds (default: 40)')
+    argparser.add_argument('--repeat', type=int, default=7)
+    args = argparser.parse_args(argv)
+
+    walls, import_times, forbidden = [], [], set()
+    for _ in range(args.repeat):
+        wall, imported = _run_once()
+        walls.append(wall * 1000)
+        # weatherterm's own import time includes everything imported on its behalf
+        import_times.append(sum(us for name, us in imported.items() if name.split('.')[0] == 'weatherterm'
+                                and '.' not in name.partition('weatherterm.')[2]) / 1000)
+        forbidden.update(name for name in imported if name in FORBIDDEN)
+
+    import_ms = statistics.median(import_times)
+    print(f'wall time (median):   {statistics.median(walls):.1f} ms')
+    print(f'weatherterm imports:  {import_ms:.1f} ms (budget {args.budget_ms:.1f} ms)')
+
+    failed = False
+    if import_ms > args.budget_ms:
+        print('FAIL: start up import time is over budget', file=sys.stderr)
+        failed = True
+    if forbidden:
+        print(f'FAIL: heavy modules imported by --version: {", ".join(sorted(forbidden))}', file=sys.stderr)
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
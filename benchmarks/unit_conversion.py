@@ -0,0 +1,53 @@
+"""Microbenchmark of UnitConverter: the scalar convert() called once per value against convert_many() on the
+whole sequence, with the pure Python path and (when installed) the NumPy path.
+
+    python -m benchmarks.unit_conversion --sizes 10 10000 1000000
+"""
+
+import random
+import time
+from argparse import ArgumentParser
+
+from weatherterm.core import Unit
+from weatherterm.core import UnitConverter
+
+
+def _best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    argparser = ArgumentParser(prog='unit_conversion', description='Benchmark scalar vs batched unit conversion')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[10, 10000, 1000000])
+    argparser.add_argument('--repeat', type=int, default=5)
+    args = argparser.parse_args(argv)
+
+    converter = UnitConverter(Unit.FAHRENHEIT, Unit.CELSIUS)
+    try:
+        import numpy  # noqa: F401
+        paths = [('pure', False), ('numpy', True)]
+    except ImportError:
+        paths = [('pure', False)]
+
+    print(f'{"values":>9}{"scalar ms":>12}' + ''.join(f'{name + " ms":>12}{"speed up":>10}' for name, _ in paths))
+    for size in args.sizes:
+        random.seed(size)
+        # mostly valid readings with the odd '--' the pages use for missing values
+        temps = [str(random.randint(-20, 110)) if random.random() > 0.01 else '--' for _ in range(size)]
+        repeat = args.repeat if size < 1000000 else 1
+
+        scalar = _best_of(lambda: [converter.convert(temp) for temp in temps], repeat)
+        row = f'{size:>9}{scalar * 1000:>12.3f}'
+        for name, use_numpy in paths:
+            batched = _best_of(lambda: converter.convert_many(temps, use_numpy=use_numpy), repeat)
+            row += f'{batched * 1000:>12.3f}{scalar / batched:>9.1f}x'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""The library API of weatherterm (see weatherterm.core.forecast_api), eg.
+
+    results = await weatherterm.get_forecasts(['USNY0996'], 'today', 'celsius')
+
+The names are looked up in weatherterm.core the first time they are used: the command line imports this package
+too, and asyncio is only imported when the API is really used"""
+
+import importlib
+
+_api = {'get_forecasts', 'iter_forecasts', 'FetchClient', 'ResponseCache', 'BatchResult', 'Forecast',
+        'ForecastType', 'Unit', 'FanoutStrategy'}
+
+__all__ = sorted(_api)
+
+
+def __getattr__(name):
+    if name not in _api:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module('weatherterm.core'), name)
+    globals()[name] = value  # the next lookup does not go through __getattr__
+    return value
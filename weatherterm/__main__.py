@@ -1,5 +1,7 @@
 from argparse import ArgumentParser
+import os
 import sys
+import time
 
 # we can import like from weatherterm.core import blah instead of from .. import because
 # we put all the imported modules in the __ini__.py file
@@ -8,21 +10,90 @@ from weatherterm.core import parser_loader
 from weatherterm.core import ForecastType
 from weatherterm.core import Unit
 from weatherterm.core import SetUnitAction
+from weatherterm.core import BackendType
+from weatherterm.core import CacheStatsAction
+from weatherterm.core import HtmlEngine
+from weatherterm.core import OutputFormat
+from weatherterm.core import Metrics
+from weatherterm.core import NullMetrics
+from weatherterm.core import FanoutStrategy
+from weatherterm import commands
 
 
 def _validate_forecast_args(args):
     """This function will look through the attributes of the object of the ArgumentParser and
     if the forecast_option attribute is none, an error message is printed out and program exited"""
-    if args.forecast_option is None:
+    if args.forecast_option is None and not args.all_forecasts:
         err_msg = """ One of these arguments must be used: 
-        -td/--today, -5d/--fivedays, -10d/--tendays, -w/--weekend
+        -td/--today, -5d/--fivedays, -10d/--tendays, -w/--weekend, --all
         """
         print(f'{argparser.prog}: error: {err_msg}', file=sys.stderr)
         sys.exit()
 
 
-# loading the parsers using the parsers from the parsers directories
-parsers = parser_loader.load('./weatherterm/parsers')
+def _read_areas(args):
+    """Returns the list of area codes given with -a/--areacode and in the --areas-file file
+    ('-' reads them from stdin). The file has one area code per line, blank lines and lines starting with # are
+    skipped"""
+    areas = list(args.area_code or [])
+
+    if args.areas_file is not None:
+        lines = sys.stdin if args.areas_file == '-' else open(args.areas_file, encoding='utf-8')
+        with lines:
+            areas.extend(line.strip() for line in lines
+                         if line.strip() and not line.lstrip().startswith('#'))
+
+    if not areas:
+        argparser.error('at least one area code is needed, use -a/--areacode or --areas-file')
+
+    return _resolve_areas(args, areas)
+
+
+def _resolve_areas(args, areas):
+    """Place names, postal codes and coordinates are turned into area codes with the offline location index.
+    The index is only opened when one of the areas is not an area code already"""
+    from weatherterm.core import LocationIndex
+    from weatherterm.core import LocationError
+
+    if all(LocationIndex.is_area_code(area) for area in areas):
+        return areas
+
+    index = LocationIndex(args.locations)
+    resolved = []
+    for area in areas:
+        try:
+            resolved.append(area if LocationIndex.is_area_code(area) else index.resolve(area))
+        except LocationError as e:
+            candidates = ''.join(f'\n  {location}' for location in e.candidates)
+            argparser.error(f'{e}{candidates}')
+    index.close()
+    return resolved
+
+
+def _read_priorities(args, providers):
+    """The --prefer FIELD=PARSER,PARSER values as a dictionary of field -> list of parser names"""
+    from weatherterm.core.provider_fanout import MERGE_FIELDS
+
+    priorities = {}
+    for value in args.prefer or []:
+        field, _, names = value.partition('=')
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        if field not in MERGE_FIELDS or not names:
+            argparser.error(f'--prefer needs FIELD=PARSER, FIELD is one of {", ".join(MERGE_FIELDS)}')
+        unknown = [name for name in names if name not in providers]
+        if unknown:
+            argparser.error(f'--prefer {field}: {", ".join(unknown)} is not one of the -p parsers')
+        priorities[field] = names
+    return priorities
+
+
+# subcommands (eg. weatherterm serve) have their own arguments, they are handed over before anything else is done
+if len(sys.argv) > 1 and sys.argv[1] in commands.names():
+    sys.exit(commands.run(sys.argv[1], sys.argv[2:]))
+
+# loading the parsers using the parsers from the parsers directories. Only the names are read here, a parser
+# module is imported when its class is looked up
+parsers = parser_loader.load()
 
 # initialising the ArgumentParser class
 argparser = ArgumentParser(prog='weatherterm',  # prog is a kwarg for name of terminal program
@@ -44,10 +115,11 @@ required = argparser.add_argument_group('required arguments')
 # that was passed
 
 # help can be accessed using -h or --help flags
-required.add_argument('-p', '--parser', choices=parsers.keys(), required=True,
+# action='append' lets -p be repeated, the parsers given are then all queried for every forecast (see --fanout)
+required.add_argument('-p', '--parser', choices=parsers.keys(), required=True, action='append',
                       dest='parser', help="""Specify which parser is going to be used to scrape
-                      'weather information""")  # parser argument to specify which weather parser you want to use
-# it is a required argument
+                      'weather information. Repeat it to query several parsers at the same time""")
+# parser argument to specify which weather parser you want to use, it is a required argument
 
 
 # the values of the of the Temperature Unit enums so users can select which temp to use
@@ -58,10 +130,138 @@ unit_values = [name.title() for name, value in Unit.__members__.items()]  # titl
 required.add_argument('-u', '--u', choices=unit_values, required=False, action=SetUnitAction,
                       dest='unit', help='Specify the unit that will be used to display temperature')
 
-# argparser for area code. This has been added as a required argument.
-required.add_argument('-a', '--areacode', required=True, dest='area_code',
-                      help='The code area to get the weather broadcast from. It can be obtained'
-                           'at https://weather.com')
+# argparser for area code. It can be repeated to get the forecast of many areas in one run (batch mode)
+# area codes can also be read from a file, so it is not marked as required and checked in _read_areas instead
+required.add_argument('-a', '--areacode', action='append', dest='area_code',
+                      help='The code area to get the weather broadcast from. It can be obtained '
+                           'at https://weather.com, a place name ("Portland, OR"), a postal code or '
+                           'latitude,longitude coordinates are looked up in the offline location index '
+                           '(see weatherterm lookup). Repeat it to query several areas')
+
+# batch mode arguments: many area codes are fetched concurrently by a bounded number of workers
+batch_group = argparser.add_argument_group('batch arguments')
+batch_group.add_argument('--areas-file', dest='areas_file',
+                         help='Read area codes from a file, one per line. Use - to read them from stdin')
+batch_group.add_argument('--locations', dest='locations',
+                         help='The location index place names are looked up in (default: the bundled index)')
+batch_group.add_argument('--workers', dest='workers', type=int, default=8,
+                         help='Number of areas fetched at the same time in batch mode (default: 8)')
+batch_group.add_argument('--parse-workers', dest='parse_workers', type=int, default=0, metavar='N',
+                         help='Parse the pages of a batch in N worker processes, on more than one core. '
+                              '0 parses them in the fetching threads (default: 0)')
+batch_group.add_argument('--parse-chunk-size', dest='parse_chunk_size', type=int, default=4, metavar='PAGES',
+                         help='Most pages sent to a parse worker at once (default: 4)')
+batch_group.add_argument('--max-pages', dest='max_pages', type=int, metavar='N',
+                         help='Memory bounded mode: at most N fetched pages are kept in memory at once, the fetches '
+                              'wait while N pages are waiting to be parsed, and the tree of a page is freed as soon '
+                              'as its forecasts are extracted')
+
+# the values of the BackendType enums so users can choose how pages are fetched. When it is not given
+# every parser uses its own default backend
+backend_values = [name.lower() for name in BackendType.__members__]
+
+argparser.add_argument('-b', '--backend', choices=backend_values, dest='backend',
+                       help='Specify how pages are fetched. http (a pooled HTTP client) is much faster, '
+                            'browser runs headless browsers for sites that need JavaScript')
+argparser.add_argument('--browsers', type=int, default=2, metavar='N',
+                       help='Number of headless browsers kept running with the browser backend, pages are loaded '
+                            'by that many browsers at the same time (default: 2)')
+argparser.add_argument('--browser-pages', type=int, default=50, dest='browser_pages', metavar='K',
+                       help='A browser is replaced by a new one after loading K pages (default: 50)')
+
+# with more than one -p every forecast is asked to all the parsers at once, see ProviderFanout
+fanout_values = [name.lower() for name in FanoutStrategy.__members__]
+
+fanout_group = argparser.add_argument_group('provider arguments')
+fanout_group.add_argument('--fanout', choices=fanout_values, default='fastest', dest='fanout',
+                          help='How the answers of several -p parsers are used. fastest keeps the first parser that '
+                               'answers and cancels the others, merge waits for all of them and combines their '
+                               'fields (default: fastest)')
+fanout_group.add_argument('--prefer', action='append', dest='prefer', metavar='FIELD=PARSER[,PARSER...]',
+                          help='With --fanout merge, the parsers FIELD is taken from first, eg. '
+                               'wind=WeatherComParser. The other parsers follow in the -p order. Can be repeated')
+fanout_group.add_argument('--provider-times', action='store_true', dest='provider_times',
+                          help='Print which parser answered every forecast and how long every parser took to stderr')
+
+# the values of the HtmlEngine enums so users can choose how pages are parsed
+engine_values = [name.lower() for name in HtmlEngine.__members__]
+
+argparser.add_argument('-e', '--engine', choices=engine_values, dest='engine',
+                       help='Specify how pages are parsed. strained (the default) only builds the part of the page '
+                            'holding the forecast, lxml does the same faster when lxml is installed, '
+                            'full builds the whole page')
+
+# the values of the OutputFormat enums. text is for people, the other formats are for other programs
+format_values = [name.lower() for name in OutputFormat.__members__]
+
+argparser.add_argument('--format', choices=format_values, default='text', dest='output_format',
+                       help='Specify how forecasts are written to stdout. json writes one array, ndjson one record '
+                            'per line and csv one row per forecast, with numbers for temperatures and humidity '
+                            'and ISO dates. grid is a table with a row per area and a column per day (default: text)')
+argparser.add_argument('--flush-interval', type=float, dest='flush_interval', metavar='SECONDS',
+                       help='With --format grid, write the rows to the terminal at most every SECONDS seconds. '
+                            '0 only writes when the output buffer is full (default: 0.1 on a terminal, 0 otherwise)')
+
+# how fetches are run: deadlines, retries, a rate limit per host and hedged requests, see FetchScheduler
+request_group = argparser.add_argument_group('request arguments')
+request_group.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS',
+                           help='Deadline of every page fetch, retries included (default: 30)')
+request_group.add_argument('--deadline', type=float, metavar='SECONDS',
+                           help='Deadline of the whole run, fetches still running after it fail')
+request_group.add_argument('--retries', type=int, default=2,
+                           help='How many times a fetch failing with a connection error or a 408, 429 or 5xx status '
+                                'is tried again, after a random backoff (default: 2)')
+request_group.add_argument('--rate', type=float, metavar='REQUESTS',
+                           help='Most requests per second sent to a host (default: no limit)')
+request_group.add_argument('--hedge', action='store_true',
+                           help='Send a second request for a page when the first one is slower than 95%% of the '
+                                'recent ones, the first answer wins')
+
+# fetched pages are kept in an on-disk cache shared by every weatherterm process. These flags control it
+cache_group = argparser.add_argument_group('cache arguments')
+cache_group.add_argument('--cache-dir', dest='cache_dir',
+                         help='Directory of the response cache (default: $XDG_CACHE_HOME/weatherterm)')
+cache_group.add_argument('--no-cache', dest='use_cache', action='store_false',
+                         help='Bypass the response cache, pages are neither read from nor stored in it')
+cache_group.add_argument('--refresh', dest='refresh', action='store_true',
+                         help='Ignore fresh cache entries and fetch the pages again, the cache is then updated')
+cache_group.add_argument('--cache-stats', action=CacheStatsAction,
+                         help='Print the cache hit/miss counters and size as JSON and exit')
+
+# every forecast is also added to a local history database, see weatherterm history
+history_group = argparser.add_argument_group('history arguments')
+history_group.add_argument('--history-db', dest='history_db',
+                           help='The history database (default: $XDG_DATA_HOME/weatherterm/history.sqlite3)')
+history_group.add_argument('--no-history', dest='use_history', action='store_false',
+                           help='Do not add the forecasts of this run to the history')
+history_group.add_argument('--record', dest='record', metavar='DIR',
+                           help='Save every fetched page (compressed) in the archive DIR, so the pages can be '
+                                'parsed again later with weatherterm reparse')
+
+# a running `weatherterm serve` daemon can answer the queries instead of fetching pages in this process
+argparser.add_argument('--server', dest='server', default=os.environ.get('WEATHERTERM_SERVER'),
+                       help='Query a weatherterm serve daemon at host:port or unix:/path instead of the website. '
+                            'Defaults to the WEATHERTERM_SERVER environment variable')
+
+# watch mode: one process polls the pages again and again and redraws what changed
+watch_group = argparser.add_argument_group('watch arguments')
+watch_group.add_argument('--watch', type=float, metavar='SECONDS',
+                         help='Keep running and poll the forecasts every SECONDS seconds. Unchanged pages are '
+                              'not parsed again and only the forecasts that changed are redrawn')
+watch_group.add_argument('--watch-max', dest='watch_max', type=float, metavar='SECONDS',
+                         help='Longest time between two polls of a page, polling slows down up to it while a '
+                              'page does not change or fails (default: 10 times --watch)')
+
+# instrumentation: time spent per stage, bytes fetched and DOM nodes parsed for every area and forecast type
+profile_group = argparser.add_argument_group('profiling arguments')
+profile_group.add_argument('--profile', action='store_true',
+                           help='Print the time spent in every stage (fetch, soup, extract, prepare, render) to stderr')
+profile_group.add_argument('--metrics', dest='metrics_file', metavar='FILE',
+                           help='Write the stage timings and counters to FILE, in the Prometheus text format when '
+                                'FILE ends with .prom (for the node exporter textfile collector), as JSON otherwise')
+profile_group.add_argument('--memory-report', dest='memory_report', action='store_true',
+                           help='Trace the memory allocations (slow) and print the peak and the memory held by every '
+                                'stage at the peak to stderr')
 
 # argparser to display version of weatherterm
 argparser.add_argument('-v', '--version', action='version', version='%(prog)s 1.0')
@@ -87,6 +287,10 @@ argparser.add_argument('-10d', '--tenday', dest='forecast_option', action='store
 argparser.add_argument('-w', '--weekend', action='store_const', dest='forecast_option', const=ForecastType.WEEKEND,
                        help='Show the weather forecast for the next or current weekend')
 
+# argparser for every forecast type at once. Pages shared by several types are only fetched once
+argparser.add_argument('--all', action='store_true', dest='all_forecasts',
+                       help='Show all the forecasts (today, 5 days, 10 days and weekend)')
+
 
 args = argparser.parse_args()  # parser_args is an in-built function inside the argparse module
 # it will return an object with the dest params of the parse arguments becoming attributes of a Namespace class
@@ -94,15 +298,275 @@ args = argparser.parse_args()  # parser_args is an in-built function inside the
 # unit=None)
 
 _validate_forecast_args(args)
+# started before anything else so the imports of the run are traced too
+memory_report = None
+if args.memory_report:
+    from weatherterm.core import MemoryReport
+    memory_report = MemoryReport().start()
+areas = _read_areas(args)
+# a parser given twice is queried once. args.parser stays the name of the parser when there is only one
+providers = list(dict.fromkeys(args.parser))
+args.parser = '+'.join(providers)
+fanout = len(providers) > 1
+priorities = _read_priorities(args, providers)
+if fanout and args.watch is not None:
+    argparser.error('--watch can only be used with one parser')
+if fanout and args.parse_workers:
+    argparser.error('--parse-workers can only be used with one parser')
+if args.max_pages is not None and args.max_pages < 1:
+    argparser.error('--max-pages needs at least 1 page')
+if args.watch is not None and args.watch <= 0:
+    argparser.error('--watch needs a number of seconds greater than 0')
+if args.browsers < 1:
+    argparser.error('--browsers needs at least 1 browser')
+if args.server and not (args.server.startswith('unix:') and len(args.server) > len('unix:')
+                        or args.server.replace('http://', '').rpartition(':')[2].isdigit()):
+    argparser.error(f'--server must be unix:/path/to/socket or host:port, not {args.server}')
+if args.parse_workers and args.server:
+    argparser.error('--parse-workers can not be used with --server, the daemon parses the pages')
+if args.record and args.server:
+    argparser.error('--record can not be used with --server, the daemon fetches the pages')
+
+# imported only now that we know a forecast is really going to be fetched, --help and --version stay fast
+from weatherterm.core import ResponseCache
+from weatherterm.core import BatchRunner
+from weatherterm.core import ParsePool
+from weatherterm.core import FetchClient
+from weatherterm.core import create_writer
+from weatherterm.core import HistoryStore
+from weatherterm.core import ForecastWatcher
+from weatherterm.core import WatchScreen
+from weatherterm.core import PageBudget
+from weatherterm.core import FetchError
+
+# with --profile or --metrics every stage is timed, otherwise NullMetrics records nothing
+metrics = Metrics() if args.profile or args.metrics_file else NullMetrics()
+
+engine = HtmlEngine[args.engine.upper()] if args.engine else None
+# with --record the parsers save every page they fetch in the archive
+archive = None
+if args.record:
+    from weatherterm.core import PageArchive
+    archive = PageArchive(args.record)
+
+# the command line is a client of the library API like any other program: the fetch client owns what the parsers
+# share (the backend the user picked or every parser's default one, the scheduler around it and the cache) and
+# makes the parsers chosen by the user. With --server the parsers are clients of the daemon, which has its own
+# backend and cache
+cache = ResponseCache(args.cache_dir, refresh=args.refresh) if args.use_cache and not args.server else None
+client = FetchClient(BackendType[args.backend.upper()] if args.backend else None, workers=args.workers,
+                     timeout=args.timeout, deadline=args.deadline, retries=args.retries, rate=args.rate,
+                     hedge=args.hedge, browsers=args.browsers, browser_pages=args.browser_pages, cache=cache,
+                     engine=engine, archive=archive, server=args.server, parsers=parsers, metrics=metrics)
+
+# every forecast goes through this writer, it keeps stdout buffered and only the text output flushes per area
+output_format = OutputFormat[args.output_format.upper()]
+writer_options = {}
+if output_format == OutputFormat.GRID:
+    # the grid knows its columns before the first forecast, rows are written as soon as an area is done
+    flush_interval = args.flush_interval
+    if flush_interval is None:
+        flush_interval = 0.1 if sys.stdout.isatty() else 0
+    writer_options = {'forecast_types': list(ForecastType) if args.all_forecasts else [args.forecast_option],
+                      'areas': areas, 'flush_interval': flush_interval}
+writer = create_writer(output_format, **writer_options)
+# the forecasts are only kept in memory until the end of the run, then written in one transaction
+history = HistoryStore(args.history_db) if args.use_history else None
+# only given when it is used, the parsers of the parsers directory do not all know it
+parser_options = {'bounded_memory': True} if args.max_pages else {}
+
+
+def _new_parser():
+    """A new parser, with several -p parsers a ProviderFanout querying all of them"""
+    if fanout:
+        return client.fanout(providers, FanoutStrategy[args.fanout.upper()], priorities, **parser_options)
+    return client.parser(providers[0], **parser_options)
+
+
+def _report_fanout(fanout_result):
+    if args.provider_times:
+        print(fanout_result.summary(), file=sys.stderr)
+
+
+def _print_forecasts(results, area, forecast_type, provider=None):
+    # results can be a generator, every forecast is written as soon as it is produced. Only the writing is
+    # timed as render, producing the forecasts has its own stages
+    forecasts = []
+    for forecast in results:
+        with metrics.stage('render', area, forecast_type.value):
+            writer.write_one(forecast, area)
+        forecasts.append(forecast)
+    writer.flush()
+
+    if history is not None:
+        # with several parsers the rows are tagged with the parser(s) that answered
+        history.add(forecasts, area, provider or args.parser, args.unit)
+
+
+def _run_single(area):
+    parser = _new_parser()
+    args.area_code = area
+
+    if fanout:
+        fanout_result = parser.fan_out(args)
+        _report_fanout(fanout_result)
+        if fanout_result.error is not None:
+            raise fanout_result.error
+        writer.section(f'{area} ({args.forecast_option.value}) from {fanout_result.provider}')
+        _print_forecasts(fanout_result.forecasts, area, args.forecast_option, fanout_result.provider)
+        return 0
+
+    if args.all_forecasts:
+        # run_many fetches the distinct pages concurrently and returns the forecasts grouped by type
+        forecast_set = parser.run_many(args)
+        for forecast_type, results in forecast_set.items():
+            writer.section(forecast_type.value)
+            _print_forecasts(results, area, forecast_type)
+        print(forecast_set.summary(), file=sys.stderr)
+        return 0
+
+    results = parser.iter_run(args)  # the parser classes have an iter_run method yielding the forecasts
+    _print_forecasts(results, area, args.forecast_option)
+    return 0
+
+
+def _print_batch_result(batch_result, errors, derived):
+    # a result taken from the page of another forecast type of its area saved a fetch
+    if batch_result.derived_from is not None:
+        derived.append(batch_result)
+    provider = None
+    if batch_result.fanout is not None:
+        _report_fanout(batch_result.fanout)
+        provider = batch_result.fanout.provider
+    if not batch_result.ok:
+        errors.append(batch_result)
+        return
+
+    title = f'{batch_result.area} ({batch_result.forecast_type.value})'
+    writer.section(f'{title} from {provider}' if provider else title)
+    _print_forecasts(batch_result.forecasts, batch_result.area, batch_result.forecast_type, provider)
+
+
+async def _run_queries(forecast_types, page_budget, errors, derived):
+    # the queries run at the same time on one event loop through the library API, the results are printed as
+    # soon as each of them is done
+    from weatherterm.core import iter_forecasts
+
+    async for batch_result in iter_forecasts(areas, forecast_types, args.unit, providers, client,
+                                             strategy=FanoutStrategy[args.fanout.upper()], priorities=priorities,
+                                             max_pages=page_budget):
+        _print_batch_result(batch_result, errors, derived)
+
+
+def _run_batch():
+    # batch mode: results are printed as soon as each area is done, failures are reported at the end
+    # with --max-pages the fetches wait for a free page slot, pages are not fetched faster than they are parsed
+    page_budget = PageBudget(args.max_pages) if args.max_pages else None
+    errors = []
+    derived = []
+    start = time.perf_counter()
+
+    # with --all every area is queried for every forecast type
+    forecast_types = list(ForecastType) if args.all_forecasts else [args.forecast_option]
+    if args.parse_workers:
+        # with --parse-workers the threads only fetch, the pages are parsed in worker processes
+        parse_pool = ParsePool(client.parser_class(providers[0]), engine=engine, workers=args.parse_workers,
+                               chunk_size=args.parse_chunk_size)
+        runner = BatchRunner(_new_parser, workers=args.workers, parse_pool=parse_pool, page_budget=page_budget,
+                             derived_forecasts=getattr(client.parser_class(providers[0]), 'derived_forecasts', None))
+        try:
+            for batch_result in runner.run(args, areas, forecast_types):
+                _print_batch_result(batch_result, errors, derived)
+        finally:
+            parse_pool.close()
+    else:
+        import asyncio
+        asyncio.run(_run_queries(forecast_types, page_budget, errors, derived))
+
+    elapsed = time.perf_counter() - start
+    total = len(set(areas))  # repeated area codes are only fetched once
+    for batch_result in errors:
+        print(f'{batch_result.area} ({batch_result.forecast_type.value}): {batch_result.error}', file=sys.stderr)
+
+    # with --all an area fails when any of its forecast types failed
+    failed = len({batch_result.area for batch_result in errors})
+    saved = f' ({len(derived)} fetches saved)' if derived else ''
+    print(f'{total - failed} of {total} areas succeeded in {elapsed:.2f}s{saved}', file=sys.stderr)
+    if page_budget is not None and memory_report is not None:
+        print(page_budget.summary(), file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _run_watch():
+    # one parser (and so one backend) for the whole time, the tasks are polled one after the other
+    parser = _new_parser()
+    forecast_types = list(ForecastType) if args.all_forecasts else [args.forecast_option]
+    watcher = ForecastWatcher(parser, args, areas, forecast_types, args.watch, args.watch_max)
+    # on a terminal the text output is a screen redrawn in place, otherwise the forecasts that changed are
+    # written after the ones before them (eg. one ndjson record per changed forecast)
+    screen = WatchScreen(sys.stdout) if args.output_format == 'text' and sys.stdout.isatty() else None
+
+    def on_change(changed, tasks):
+        if screen is not None:
+            screen.render(tasks)
+
+        for task in changed:
+            forecasts = [task.forecasts[row] for row in task.changed_rows]
+            if history is not None and forecasts:
+                history.add(forecasts, task.area, args.parser, args.unit)
+
+            if task.error is not None:
+                if screen is None:
+                    print(f'{task.area} ({task.forecast_type.value}): {task.error}', file=sys.stderr)
+            elif screen is None and forecasts:
+                writer.section(f'{task.area} ({task.forecast_type.value})')
+                writer.write(forecasts, task.area)
+
+        if screen is None:
+            writer.flush(force=True)
+        if history is not None:
+            history.flush()
+
+    try:
+        watcher.run(on_change)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+try:
+    if args.watch:
+        status = _run_watch()
+    else:
+        # ProviderFanout has no run_many, with several parsers --all goes through the batch runner
+        single = len(set(areas)) == 1 and not (fanout and args.all_forecasts)
+        status = _run_single(areas[0]) if single else _run_batch()
+except FetchError as e:
+    # the page or the forecast server could not be reached, the message says which: no traceback
+    print(f'{argparser.prog}: {e}', file=sys.stderr)
+    status = 1
+finally:
+    # finishes the document (eg. the closing ] of json) and writes what is left in the buffer
+    writer.close()
+    # stops the backends and adds the hit/miss counters of this run to the shared stats file of the cache
+    client.close()
+
+    if archive is not None:
+        archive.close()
 
-# after the _validate_forecast_args function is run with no problem the parser attributes are retrieved
-# and used as keys to load for the parser classes dynamically in the parsers dictionary
-# args.parser will be name of the selected parser chosen by the user
-parser_class = parsers[args.parser]
+    if history is not None:
+        try:
+            history.close()
+        except Exception as e:
+            # the forecasts were shown, a locked or broken history database must not turn the run into a failure
+            print(f'{argparser.prog}: history not saved: {e}', file=sys.stderr)
 
-# the values in the parsers dictionary are a class type so it has to be initialised
-parser = parser_class()
-results = parser.run(args)  # the parser classes have a run method
+    if args.profile:
+        print(metrics.format_profile(), file=sys.stderr)
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+    if memory_report is not None:
+        memory_report.stop()
+        print(memory_report.format(), file=sys.stderr)
 
-for result in results:
-    print(result)
+sys.exit(status)
@@ -0,0 +1,21 @@
+"""Subcommands of weatherterm, eg. weatherterm serve. Every subcommand lives in its own module with a
+main(argv) function. The modules are only imported when their subcommand is used, so the normal forecast
+command does not pay for them"""
+
+import importlib
+
+_commands = {
+    'serve': 'weatherterm.commands.serve',
+    'history': 'weatherterm.commands.history',
+    'lookup': 'weatherterm.commands.lookup',
+    'reparse': 'weatherterm.commands.reparse',
+}
+
+
+def names():
+    return list(_commands)
+
+
+def run(name, argv):
+    module = importlib.import_module(_commands[name])
+    return module.main(argv)
@@ -0,0 +1,124 @@
+"""weatherterm history queries the forecasts kept by every run (see --history-db and --no-history):
+
+    weatherterm history range USNY0996 --from 2026-10-01 --to 2026-10-07 --latest
+    weatherterm history trend USNY0996 --days 30
+    weatherterm history compare USNY0996 --days 30
+
+range lists the forecasts made for the days between --from and --to, trend gives the temperatures seen every day
+and compare puts the long range forecasts of a day next to what the day really was, with the mean error per
+number of days ahead"""
+
+import csv
+import json
+import sys
+from argparse import ArgumentParser
+from datetime import date, datetime, timedelta
+
+from weatherterm.core import ForecastType
+from weatherterm.core import SetUnitAction
+from weatherterm.core import Unit
+from weatherterm.core import UnitConverter
+from weatherterm.core import HistoryStore
+
+# the columns holding temperatures, they are converted when -u celsius is given
+_temperature_columns = ('current_temp', 'high_temp', 'low_temp', 'min_temp', 'max_temp', 'avg_temp',
+                        'forecast_high', 'actual_high', 'forecast_low', 'actual_low')
+
+
+def _convert(rows, unit):
+    """The store keeps Fahrenheit, the temperature columns are converted to unit and rounded for display"""
+    converter = UnitConverter(Unit.FAHRENHEIT, unit)
+    for row in rows:
+        columns = [column for column in _temperature_columns if column in row]
+        values = converter.convert_many([row[column] for column in columns], use_numpy=False)
+        for column, value in zip(columns, values):
+            row[column] = None if value != value else round(value, 1)
+    return rows
+
+
+def _compare_summary(rows):
+    """Mean absolute error of the high and low temperatures per number of days ahead"""
+    errors = {}
+    for row in rows:
+        entry = errors.setdefault(row['lead_days'], [0, 0.0, 0, 0.0])
+        if row['forecast_high'] is not None and row['actual_high'] is not None:
+            entry[0] += 1
+            entry[1] += abs(row['forecast_high'] - row['actual_high'])
+        if row['forecast_low'] is not None and row['actual_low'] is not None:
+            entry[2] += 1
+            entry[3] += abs(row['forecast_low'] - row['actual_low'])
+
+    return [{'lead_days': lead_days,
+             'high_mae': round(high_error / high_count, 2) if high_count else None,
+             'low_mae': round(low_error / low_count, 2) if low_count else None,
+             'days': max(high_count, low_count)}
+            for lead_days, (high_count, high_error, low_count, low_error) in sorted(errors.items())]
+
+
+def _write(rows, output_format, stream=sys.stdout):
+    if output_format == 'ndjson':
+        stream.writelines(json.dumps(row) + '\n' for row in rows)
+        return
+
+    if not rows:
+        return
+
+    columns = list(rows[0])
+    if output_format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        writer.writerows(row.values() for row in rows)
+        return
+
+    # text: a table with every column as wide as its widest value
+    cells = [['' if value is None else f'{value:.1f}' if isinstance(value, float) else str(value)
+              for value in row.values()] for row in rows]
+    widths = [max(len(column), *(len(line[index]) for line in cells)) for index, column in enumerate(columns)]
+    stream.write('  '.join(column.ljust(width) for column, width in zip(columns, widths)).rstrip() + '\n')
+    stream.writelines('  '.join(value.ljust(width) for value, width in zip(line, widths)).rstrip() + '\n'
+                      for line in cells)
+
+
+def main(argv):
+    argparser = ArgumentParser(prog='weatherterm history', description='Query the history of past forecasts')
+    argparser.add_argument('query', choices=['range', 'trend', 'compare'],
+                           help='range lists forecasts, trend the temperatures seen per day, compare forecast '
+                                'against actual')
+    argparser.add_argument('area', help='The area code')
+    argparser.add_argument('--from', dest='start', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                           help='First day (forecast date) to look at')
+    argparser.add_argument('--to', dest='end', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                           help='Last day (forecast date) to look at')
+    argparser.add_argument('--days', type=int, help='Look at the last DAYS days only, instead of --from')
+    argparser.add_argument('-t', '--type', dest='forecast_type', choices=[member.value for member in ForecastType],
+                           help='Only this forecast type (range only)')
+    argparser.add_argument('--latest', action='store_true',
+                           help='Only the most recent forecast of every day and type (range only)')
+    argparser.add_argument('-u', '--u', choices=[name.title() for name in Unit.__members__], action=SetUnitAction,
+                           dest='unit', help='Unit of the temperatures (default: Fahrenheit)')
+    argparser.add_argument('--format', choices=['text', 'ndjson', 'csv'], default='text', dest='output_format')
+    argparser.add_argument('--db', help='The history database (default: $XDG_DATA_HOME/weatherterm/history.sqlite3)')
+    args = argparser.parse_args(argv)
+
+    if args.days is not None:
+        args.start = date.today() - timedelta(days=args.days)
+
+    with HistoryStore(args.db) as store:
+        if args.query == 'range':
+            forecast_type = ForecastType(args.forecast_type) if args.forecast_type else None
+            rows = store.range(args.area, args.start, args.end, forecast_type, latest=args.latest)
+            for row in rows:
+                row['fetched_at'] = datetime.fromtimestamp(row['fetched_at']).isoformat(timespec='seconds')
+        elif args.query == 'trend':
+            rows = store.trend(args.area, args.start, args.end)
+        else:
+            rows = store.compare(args.area, args.start, args.end)
+
+    rows = _convert(rows, args.unit)
+    _write(rows, args.output_format)
+
+    if args.query == 'compare' and rows and args.output_format == 'text':
+        print()
+        _write(_compare_summary(rows), args.output_format)
+
+    return 0
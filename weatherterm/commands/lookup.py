@@ -0,0 +1,65 @@
+"""weatherterm lookup finds area codes in the offline location index:
+
+    weatherterm lookup "new york"          exact, then prefix, then fuzzy matches
+    weatherterm lookup --prefix san
+    weatherterm lookup --fuzzy seattel
+    weatherterm lookup 40.71,-74.01        the nearest locations
+    weatherterm lookup --build gazetteer.tsv --locations ~/locations
+
+The same names, postal codes and coordinates can be given to -a/--areacode directly. --build turns a gazetteer
+(a TSV file: code, name, region, country, postal code, latitude, longitude) into an index directory, point
+--locations or the WEATHERTERM_LOCATIONS environment variable at it"""
+
+import json
+import sys
+from argparse import ArgumentParser
+
+from weatherterm.core import LocationIndex
+
+
+def main(argv):
+    argparser = ArgumentParser(prog='weatherterm lookup', description='Find area codes by place name, postal code '
+                                                                      'or coordinates')
+    argparser.add_argument('queries', nargs='*', metavar='QUERY',
+                           help='Place names, postal codes or latitude,longitude coordinates')
+    mode = argparser.add_mutually_exclusive_group()
+    mode.add_argument('--prefix', action='store_true', help='Only the places starting with QUERY')
+    mode.add_argument('--fuzzy', action='store_true', help='Only the places a typo or two away from QUERY')
+    argparser.add_argument('-n', '--limit', type=int, default=10, help='Most results per query (default: 10)')
+    argparser.add_argument('--format', choices=['text', 'ndjson'], default='text', dest='output_format')
+    argparser.add_argument('--locations', help='The index directory (default: the index bundled with weatherterm)')
+    argparser.add_argument('--build', metavar='GAZETTEER', help='Build the --locations index from GAZETTEER')
+    args = argparser.parse_args(argv)
+
+    if args.build:
+        if not args.locations:
+            argparser.error('--build needs --locations, the directory the index is written to')
+        count = LocationIndex.build(args.build, args.locations)
+        print(f'{count} locations indexed in {args.locations}', file=sys.stderr)
+        return 0
+
+    if not args.queries:
+        argparser.error('at least one QUERY is needed')
+
+    index = LocationIndex(args.locations)
+    status = 0
+    for query in args.queries:
+        if args.prefix:
+            locations = index.prefix(query, args.limit)
+        elif args.fuzzy:
+            locations = index.fuzzy(query, args.limit)
+        else:
+            locations = index.search(query, args.limit)
+
+        if not locations:
+            print(f'{argparser.prog}: no location found for {query!r}', file=sys.stderr)
+            status = 1
+
+        for location in locations:
+            if args.output_format == 'ndjson':
+                print(json.dumps(dict(location.to_dict(), query=query)))
+            else:
+                print(f'{location}  {location.postal_code}'.rstrip())
+
+    index.close()
+    return status
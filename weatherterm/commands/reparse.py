@@ -0,0 +1,186 @@
+"""weatherterm reparse runs the current parsers over the pages saved by --record, without fetching anything:
+
+    weatherterm --record ~/weather-archive -p WeatherComParser -a USNY0996 -td
+    weatherterm reparse ~/weather-archive --days 30
+
+The forecasts of every page replace the ones its run wrote in the history database (see --history-db). Only the
+pages that were not parsed by the current version of their parser yet are parsed, so running it again after a fix
+of a parser parses everything once and running it twice in a row parses nothing. The pages are parsed by worker
+processes on all the cores"""
+
+import os
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import date, datetime, timedelta
+
+from weatherterm.core import Forecast
+from weatherterm.core import ForecastType
+from weatherterm.core import HistoryStore
+from weatherterm.core import PageArchive
+from weatherterm.core import ParsePool
+from weatherterm.core import parser_loader
+from weatherterm.core import parser_version
+
+# the parse state of the archive is saved every this many pages, an interrupted reparse does not start over
+_checkpoint = 500
+
+
+def _timestamp(day):
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+
+def _select(pages, versions, force):
+    """The pages that were not parsed by the current version of their parser yet, or were parsed from another
+    source"""
+    todo = []
+    for page in pages:
+        if (force or page['parsed_version'] != versions[page['parser']]
+                or page['parsed_hash'] != page['hash']):
+            todo.append(page)
+    return todo
+
+
+def _parse_unique(parser_class, archive, pages, workers, chunk_size):
+    """Generator yielding forecasts or an exception for every page, in order"""
+    inputs = ((archive.read(page['hash']), Namespace(area_code=page['area'],
+                                                     forecast_option=ForecastType(page['forecast_type']), unit=None))
+              for page in pages)
+
+    if workers == 1:
+        # one worker process would only add the cost of sending the pages to it
+        parser = parser_class()
+        for content, args in inputs:
+            try:
+                yield parser.parse(content, args)
+            except Exception as e:
+                yield e
+        return
+
+    pool = ParsePool(parser_class, workers=workers, chunk_size=chunk_size)
+    try:
+        yield from pool.parse_many(inputs)
+    finally:
+        pool.close()
+
+
+def _group(pages):
+    """The pages by (source hash, forecast type), in order. The forecasts of a page only depend on its source and
+    its forecast type: a page fetched many times without changing is parsed once"""
+    groups = {}
+    for page in pages:
+        groups.setdefault((page['hash'], page['forecast_type']), []).append(page)
+    return groups
+
+
+def _parse(parser_class, archive, groups, workers, chunk_size):
+    """Generator yielding (page, forecasts or exception) for every page of groups (see _group). The pages of a
+    group come out as soon as its first page is parsed, so the pages can be marked as parsed while the others are
+    still being parsed. groups is emptied along the way, only the results of the group being yielded are kept"""
+    for key in [key for key in groups if not archive.has(key[0])]:
+        # eg. the objects directory was cleaned up by hand
+        error = FileNotFoundError(f'page {key[0]} is missing from the archive')
+        for page in groups.pop(key):
+            yield page, error
+
+    keys = list(groups)
+    results = _parse_unique(parser_class, archive, [groups[key][0] for key in keys], workers, chunk_size)
+    for key, forecasts in zip(keys, results):
+        for page in groups.pop(key):
+            yield page, forecasts
+
+
+def _on_fetch_day(forecasts, page):
+    """The forecast of today has no date on the page, the parser dates it the day it runs. It is the day the page
+    was fetched"""
+    if page['forecast_type'] != ForecastType.TODAY.value:
+        return forecasts
+    fetch_day = date.fromtimestamp(page['fetched_at']).isoformat()
+    return [Forecast.from_dict(dict(forecast.to_dict(), forecast_date=fetch_day)) for forecast in forecasts]
+
+
+def main(argv):
+    argparser = ArgumentParser(prog='weatherterm reparse',
+                               description='Parse the pages saved with --record again and update the history')
+    argparser.add_argument('archive', help='The directory given to --record')
+    argparser.add_argument('-p', '--parser', help='Only the pages of this parser')
+    argparser.add_argument('-a', '--areacode', action='append', dest='areas', help='Only this area, can be repeated')
+    argparser.add_argument('--from', dest='start', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                           help='Only the pages fetched on this day or later')
+    argparser.add_argument('--to', dest='end', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                           help='Only the pages fetched on this day or earlier')
+    argparser.add_argument('--days', type=int, help='Only the pages fetched in the last DAYS days, instead of --from')
+    argparser.add_argument('--force', action='store_true',
+                           help='Parse every page again, also the ones the current parser already parsed')
+    argparser.add_argument('--dry-run', action='store_true', help='Only count the pages that would be parsed')
+    argparser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                           help='Number of parsing processes (default: the number of cores)')
+    argparser.add_argument('--chunk-size', type=int, default=8, dest='chunk_size',
+                           help='Pages sent to a parsing process at once (default: 8)')
+    argparser.add_argument('--db', help='The history database (default: $XDG_DATA_HOME/weatherterm/history.sqlite3)')
+    argparser.add_argument('-v', '--verbose', action='store_true', help='List the pages that could not be parsed')
+    args = argparser.parse_args(argv)
+
+    if not os.path.isdir(args.archive):
+        argparser.error(f'{args.archive} is not a directory')
+    if args.days is not None:
+        args.start = date.today() - timedelta(days=args.days)
+
+    parsers = parser_loader.load()
+    if args.parser is not None and args.parser not in parsers:
+        argparser.error(f'unknown parser {args.parser}, choose from {", ".join(parsers)}')
+
+    start = time.perf_counter()
+    with PageArchive(args.archive) as archive:
+        pages = archive.pages(args.parser, args.areas,
+                              _timestamp(args.start) if args.start else None,
+                              _timestamp(args.end + timedelta(days=1)) if args.end else None)
+
+        # pages of a parser that does not exist any more are left alone
+        unknown = [page for page in pages if page['parser'] not in parsers]
+        pages = [page for page in pages if page['parser'] in parsers]
+        versions = {name: parser_version(parsers[name]) for name in {page['parser'] for page in pages}}
+        todo = _select(pages, versions, args.force)
+
+        print(f'{len(pages)} pages, {len(pages) - len(todo)} already parsed by the current parsers, '
+              f'{len(todo)} to parse', file=sys.stderr)
+        if unknown:
+            print(f'{len(unknown)} pages of unknown parsers skipped', file=sys.stderr)
+        if args.dry_run or not todo:
+            return 0
+
+        parsed = errors = rows = distinct = 0
+        marks = []
+        with HistoryStore(args.db) as history:
+            for name, version in versions.items():
+                groups = _group(page for page in todo if page['parser'] == name)
+                distinct += len(groups)
+                for page, forecasts in _parse(parsers[name], archive, groups, args.workers, args.chunk_size):
+                    if isinstance(forecasts, Exception):
+                        # the rows of the run that fetched the page are kept
+                        errors += 1
+                        marks.append((page['id'], page['hash'], version, None, str(forecasts)))
+                        if args.verbose:
+                            print(f'{page["area"]} ({page["forecast_type"]}) fetched '
+                                  f'{datetime.fromtimestamp(page["fetched_at"]).isoformat(timespec="seconds")}: '
+                                  f'{forecasts}', file=sys.stderr)
+                    else:
+                        history.replace(_on_fetch_day(forecasts, page), page['area'], name,
+                                        ForecastType(page['forecast_type']), page['fetched_at'],
+                                        until=page['next_fetched_at'])
+                        rows += len(forecasts)
+                        marks.append((page['id'], page['hash'], version, len(forecasts), None))
+                    parsed += 1
+
+                    if len(marks) >= _checkpoint:
+                        # the history first: a page marked as parsed always has its rows written
+                        history.flush()
+                        archive.mark_parsed(marks)
+                        marks = []
+
+            history.flush()
+            archive.mark_parsed(marks)
+
+    print(f'{parsed} pages parsed ({distinct} distinct, {errors} failed), {rows} forecasts written in '
+          f'{time.perf_counter() - start:.1f}s', file=sys.stderr)
+    return 1 if errors else 0
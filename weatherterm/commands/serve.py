@@ -0,0 +1,66 @@
+"""weatherterm serve runs a long lived daemon answering forecast queries over a Unix socket or a localhost
+HTTP port. The parsers, the fetch backend and a cache of results stay warm between queries.
+Point the normal command at it with --server (or the WEATHERTERM_SERVER environment variable)"""
+
+import signal
+import sys
+from argparse import ArgumentParser
+
+from weatherterm.core import parser_loader
+from weatherterm.core import BackendType
+from weatherterm.core import FetchClient
+from weatherterm.core import HtmlEngine
+from weatherterm.core import ResponseCache
+from weatherterm.core import ForecastService
+from weatherterm.core import ForecastServer
+
+
+def main(argv):
+    argparser = ArgumentParser(prog='weatherterm serve', description='Serve weather forecasts over a local socket')
+    argparser.add_argument('--listen', default='127.0.0.1:8765', dest='address',
+                           help='Address to listen on, host:port or unix:/path/to/socket (default: 127.0.0.1:8765)')
+    argparser.add_argument('-b', '--backend', choices=[name.lower() for name in BackendType.__members__],
+                           default='http', help='Specify how pages are fetched (default: http)')
+    argparser.add_argument('-e', '--engine', choices=[name.lower() for name in HtmlEngine.__members__],
+                           help='Specify how pages are parsed (default: the parser\'s own default)')
+    argparser.add_argument('--ttl', type=int, default=60,
+                           help='Seconds a parsed forecast is served from memory before it is fetched again')
+    argparser.add_argument('--cache-dir', dest='cache_dir', help='Directory of the response cache')
+    argparser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                           help='Do not use the on-disk response cache')
+    argparser.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS',
+                           help='Deadline of every page fetch, retries included (default: 30)')
+    argparser.add_argument('--retries', type=int, default=2,
+                           help='How many times a failing fetch is tried again, after a random backoff (default: 2)')
+    argparser.add_argument('--rate', type=float, metavar='REQUESTS',
+                           help='Most requests per second sent to a host (default: no limit)')
+    argparser.add_argument('--hedge', action='store_true',
+                           help='Send a second request for a page when the first one is slower than 95%% of the '
+                                'recent ones, the first answer wins')
+    argparser.add_argument('--verbose', action='store_true', help='Log every query to stderr')
+    args = argparser.parse_args(argv)
+
+    parsers = parser_loader.load()
+    backend_type = BackendType[args.backend.upper()]
+    cache = ResponseCache(args.cache_dir) if args.use_cache else None
+    # the backend is wrapped in a FetchScheduler like on the command line: a stalled upstream request is given up
+    # at --timeout instead of holding a server thread. The pooled HTTP client keeps up to 32 open connections
+    client = FetchClient(backend_type, workers=32, timeout=args.timeout, retries=args.retries, rate=args.rate,
+                         hedge=args.hedge, cache=cache, parsers=parsers)
+    backend = client.backend(backend_type)
+
+    engine = HtmlEngine[args.engine.upper()] if args.engine else None
+    service = ForecastService(parsers, backend=backend, cache=cache, ttl=args.ttl, engine=engine)
+    server = ForecastServer(service, args.address, verbose=args.verbose)
+
+    # turn SIGTERM into a normal exit so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f'weatherterm serving on {server.address}', file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # stops the backend and adds the counters of the cache to its stats file
+        client.close()
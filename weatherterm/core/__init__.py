@@ -1,9 +1,72 @@
+import importlib
+
 from .unit import Unit
 from .forecast_type import ForecastType
 from .base_enum import BaseEnum
 from .unit_converter import UnitConverter
 from .forecast import Forecast
+from .backend_type import BackendType
+from .fetch_error import FetchError
+from .response import Response
+from .http_backend import HttpBackend
+from .browser_pool import BrowserPool
+from .browser_backend import BrowserBackend
+from .fetch_backend import create_backend
 from .request import Request
 from .set_unit_action import SetUnitAction
+from .cache_stats_action import CacheStatsAction
 from .mapper import Mapper
+from .metrics import Metrics
+from .metrics import NullMetrics
+from .forecast_set import ForecastSet
+from .forecast_batch import ForecastBatch
+from .html_engine import HtmlEngine
+from .output_format import OutputFormat
+from .page_parser import parse_container
+from .page_parser import count_nodes
+from .field import Field
+from .extraction_plan import ExtractionPlan
+from .fanout_strategy import FanoutStrategy
+
+# these modules pull in big parts of the standard library (http.server, concurrent.futures, tempfile, csv, sqlite3...)
+# that --help, --version or a single forecast never need. They are imported the first time one of their
+# names is used, eg. from weatherterm.core import BatchRunner
+_lazy = {
+    'ResponseCache': '.response_cache',
+    'BatchResult': '.batch_result',
+    'BatchRunner': '.batch_runner',
+    'ParsePool': '.parse_pool',
+    'PageBudget': '.page_budget',
+    'MemoryReport': '.memory_report',
+    'PageArchive': '.page_archive',
+    'parser_version': '.page_archive',
+    'ProviderFanout': '.provider_fanout',
+    'FanoutResult': '.fanout_result',
+    'SingleFlight': '.single_flight',
+    'MemoryCache': '.memory_cache',
+    'ForecastService': '.forecast_server',
+    'ForecastServer': '.forecast_server',
+    'ForecastClient': '.forecast_client',
+    'ForecastWriter': '.forecast_writer',
+    'create_writer': '.forecast_writer',
+    'HistoryStore': '.history_store',
+    'ForecastWatcher': '.forecast_watcher',
+    'WatchScreen': '.watch_screen',
+    'TokenBucket': '.token_bucket',
+    'FetchScheduler': '.fetch_scheduler',
+    'FetchClient': '.fetch_client',
+    'get_forecasts': '.forecast_api',
+    'iter_forecasts': '.forecast_api',
+    'Location': '.location',
+    'LocationError': '.location_error',
+    'LocationIndex': '.location_index',
+}
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value  # the next lookup does not go through __getattr__
+    return value
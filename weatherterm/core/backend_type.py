@@ -0,0 +1,11 @@
+from .base_enum import BaseEnum
+from enum import auto, unique
+
+
+@unique
+class BackendType(BaseEnum):
+    """BackendType Enum class lists the ways a page can be fetched from a weather website.
+    HTTP is a plain pooled HTTP client and is the default, BROWSER drives a real (headless) browser
+    for sites that only render their data with JavaScript"""
+    HTTP = auto()
+    BROWSER = auto()
@@ -0,0 +1,18 @@
+class BatchResult:
+    """The outcome of one (area, forecast type) pair of a batch run. Either forecasts holds the list of
+    Forecast objects returned by the parser or error holds the exception that stopped it. When the parser was a
+    ProviderFanout, fanout holds its FanoutResult (which provider answered and how long every provider took).
+    derived_from is the forecast type whose page the forecasts were taken from when this type was not fetched"""
+
+    def __init__(self, area, forecast_type, forecasts=None, error=None, elapsed=0.0, fanout=None, derived_from=None):
+        self.area = area
+        self.forecast_type = forecast_type
+        self.forecasts = forecasts or []
+        self.error = error
+        self.elapsed = elapsed
+        self.fanout = fanout
+        self.derived_from = derived_from
+
+    @property
+    def ok(self):
+        return self.error is None
@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+from argparse import Namespace
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .batch_result import BatchResult
+from .forecast import Forecast
+
+
+class BatchRunner:
+    """Runs a parser for many area codes at once on a bounded pool of worker threads.
+    Fetching is I/O bound so threads are enough. Parsers keep per run state (forecast type, unit) so every
+    worker thread gets its own parser from parser_factory, while the backend and the cache passed to the
+    factory are shared.
+
+    Parsing is not I/O bound: with a parse_pool (a ParsePool) the threads only fetch and the pages are parsed in
+    its worker processes, on all the cores.
+
+    With a page_budget (a PageBudget) every page takes a slot of the budget before it is fetched and gives it back
+    when it is parsed, so no more pages than the budget allows are in memory at once and the fetching threads wait
+    when parsing is behind.
+
+    derived_forecasts are the forecast types that can be taken from the page of another type, like the parsers'
+    derived_forecasts ({ForecastType.FIVEDAYS: (ForecastType.TENDAYS, 5)}). When an area is asked for both types
+    only the page of the source type is fetched, the result of the derived type is made from its forecasts (see
+    BatchResult.derived_from), like run_many does for one area"""
+
+    def __init__(self, parser_factory, workers=8, parse_pool=None, page_budget=None, derived_forecasts=None):
+        self._parser_factory = parser_factory
+        self._workers = max(1, workers)
+        self._parse_pool = parse_pool
+        self._page_budget = page_budget
+        self._derived_forecasts = derived_forecasts or {}
+        self._local = threading.local()
+
+    def _parser(self):
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = self._parser_factory()
+        return parser
+
+    @staticmethod
+    def _task_args(args, area, forecast_type):
+        # every task gets its own copy of the command line arguments with its area and forecast type
+        task_args = Namespace(**vars(args))
+        task_args.area_code = area
+        task_args.forecast_option = forecast_type
+        return task_args
+
+    def run_one(self, args, area, forecast_type):
+        """Fetches and parses one (area, forecast type) pair in the calling thread and returns its BatchResult,
+        the parser of the thread is made on its first task. weatherterm.get_forecasts runs it on its thread pool"""
+        task_args = self._task_args(args, area, forecast_type)
+        start = time.perf_counter()
+        parser = self._parser()
+        if self._page_budget is not None:
+            # the page is fetched and parsed by run(), the slot is held until the forecasts are out
+            self._page_budget.acquire()
+        try:
+            if hasattr(parser, 'fan_out'):
+                # a ProviderFanout, the result also tells which provider answered
+                fanout = parser.fan_out(task_args)
+                return BatchResult(area, forecast_type, fanout.forecasts, error=fanout.error,
+                                   elapsed=time.perf_counter() - start, fanout=fanout)
+
+            forecasts = parser.run(task_args)
+        except Exception as e:
+            # a failing area must not stop the rest of the batch, the error is handed back with the result
+            return BatchResult(area, forecast_type, error=e, elapsed=time.perf_counter() - start)
+        finally:
+            if self._page_budget is not None:
+                self._page_budget.release()
+
+        return BatchResult(area, forecast_type, forecasts, elapsed=time.perf_counter() - start)
+
+    def _fetch_one(self, args, area, forecast_type, done):
+        task_args = self._task_args(args, area, forecast_type)
+        start = time.perf_counter()
+        if self._page_budget is not None:
+            # given back by the main loop once the page is parsed
+            self._page_budget.acquire()
+        try:
+            content = self._parser().fetch(task_args)
+        except Exception as e:
+            if self._page_budget is not None:
+                self._page_budget.release()
+            done.put(('failed', BatchResult(area, forecast_type, error=e, elapsed=time.perf_counter() - start)))
+            return
+        done.put(('fetched', (content, task_args, time.perf_counter() - start)))
+
+    def _run_pooled(self, args, tasks, executor):
+        # the fetch threads and the parse chunks report to the same queue, results come out as soon as their
+        # page is parsed whatever finishes first
+        done = queue.Queue()
+        for area, forecast_type in tasks:
+            executor.submit(self._fetch_one, args, area, forecast_type, done)
+
+        fetching = len(tasks)
+        parsing = 0
+        chunk = []
+        while fetching or parsing:
+            kind, value = done.get()
+            if kind == 'failed':
+                fetching -= 1
+                yield value
+            elif kind == 'fetched':
+                fetching -= 1
+                chunk.append(value)
+            else:
+                parsing -= 1
+                pages, results = value
+                if self._page_budget is not None:
+                    self._page_budget.release(len(pages))
+                for (_, task_args, fetch_time), (forecasts, parse_time) in zip(pages, results):
+                    elapsed = fetch_time + parse_time
+                    if isinstance(forecasts, Exception):
+                        yield BatchResult(task_args.area_code, task_args.forecast_option, error=forecasts,
+                                          elapsed=elapsed)
+                    else:
+                        yield BatchResult(task_args.area_code, task_args.forecast_option, forecasts,
+                                          elapsed=elapsed)
+
+            # a chunk is sent when it is full, when no more pages are coming or when a worker would sit idle
+            # otherwise: parsing faster than fetching gives small chunks, fetching faster gives full ones
+            if chunk and (len(chunk) >= self._parse_pool.chunk_size or not fetching
+                          or parsing < self._parse_pool.workers):
+                pages, chunk = chunk, []
+                future = self._parse_pool.submit([(content, task_args) for content, task_args, _ in pages])
+                # result() is taken on the worker's callback thread, the main loop only gets the forecasts
+                future.add_done_callback(
+                    lambda future, pages=pages: done.put(('parsed', (pages, _chunk_results(future, len(pages))))))
+                parsing += 1
+
+    def plan(self, tasks):
+        """Splits the (area, forecast type) pairs of tasks into the list of pairs to query and a dictionary of
+        (area, source type) -> [(derived type, rows)] of the pairs that are taken from the page of another pair"""
+        asked = set(tasks)
+        to_query = []
+        derived = {}
+        for area, forecast_type in tasks:
+            source_type, rows = self._derived_forecasts.get(forecast_type, (None, None))
+            if (area, source_type) in asked:
+                derived.setdefault((area, source_type), []).append((forecast_type, rows))
+            else:
+                to_query.append((area, forecast_type))
+        return to_query, derived
+
+    @staticmethod
+    def derive(result, derived):
+        """Generator yielding the BatchResults of the pairs that plan took from the page of result, they fail with
+        its error when it failed. Their entry is removed from derived"""
+        for forecast_type, rows in derived.pop((result.area, result.forecast_type), ()):
+            if not result.ok:
+                yield BatchResult(result.area, forecast_type, error=result.error, derived_from=result.forecast_type)
+                continue
+            # the source forecasts are copied with the derived forecast type, the page is not parsed again
+            forecasts = [Forecast.from_dict(dict(forecast.to_dict(), forecast_type=forecast_type.value))
+                         for forecast in result.forecasts[:rows]]
+            yield BatchResult(result.area, forecast_type, forecasts, derived_from=result.forecast_type)
+
+    def run(self, args, areas, forecast_types=None):
+        """Generator yielding a BatchResult for every distinct (area, forecast type) pair as soon as it is done,
+        so the results come out in completion order. forecast_types defaults to args.forecast_option"""
+        forecast_types = forecast_types or [args.forecast_option]
+        # dict.fromkeys drops repeated pairs but keeps the order in which they were given
+        tasks, derived = self.plan(list(dict.fromkeys((area, forecast_type) for area in areas
+                                                      for forecast_type in forecast_types)))
+
+        for result in self._run_tasks(args, tasks):
+            yield result
+            yield from self.derive(result, derived)
+
+    def _run_tasks(self, args, tasks):
+        with ThreadPoolExecutor(max_workers=min(self._workers, len(tasks) or 1)) as executor:
+            if self._parse_pool is not None:
+                yield from self._run_pooled(args, tasks, executor)
+                return
+
+            # only a window of tasks is submitted at a time: a list of the futures of every task would keep the
+            # forecasts of the whole batch in memory until the end
+            pending = iter(tasks)
+            running = set()
+            while True:
+                for area, forecast_type in pending:
+                    running.add(executor.submit(self.run_one, args, area, forecast_type))
+                    if len(running) >= self._workers * 2:
+                        break
+                if not running:
+                    return
+
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+
+
+def _chunk_results(future, pages):
+    try:
+        return future.result()
+    except Exception as e:
+        # the worker died or the chunk could not be sent, every page of the chunk fails with the same error
+        return [(e, 0.0)] * pages
@@ -0,0 +1,157 @@
+import os
+import threading
+
+from .browser_pool import BrowserPool
+from .fetch_error import FetchError
+from .metrics import NullMetrics
+from .response import Response
+
+# what a forecast page does not need to build its data. Images and fonts are most of the bytes of a page and the
+# stylesheets only lay it out, the browser loads the page and runs its scripts much faster without them
+BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.css']
+
+
+def _driver_errors():
+    """The exceptions of a page load that timed out and of any other driver failure: selenium's, and TimeoutError
+    and RuntimeError for a driver_factory that does not use selenium (eg. the stand-in browser of the benchmarks)"""
+    try:
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+    except ImportError:
+        return TimeoutError, RuntimeError
+    return (TimeoutException, TimeoutError), (WebDriverException, RuntimeError)
+
+
+def _message(error):
+    # selenium keeps the message of the driver in msg, str() of its exceptions adds the whole stack trace
+    return getattr(error, 'msg', None) or error
+
+
+class BrowserBackend:
+    """Fetches pages by driving headless browsers through selenium. This is much slower than HttpBackend and is
+    only worth it for sites which build their pages with JavaScript.
+
+    The browsers are kept in a BrowserPool: up to pool_size pages load at the same time, each in its own browser,
+    and a browser is replaced after max_pages pages or when it crashes. Pages are loaded with the eager strategy
+    (the page is read as soon as the document and its scripts are loaded, without waiting for every image and
+    frame) and with block_assets images, fonts and stylesheets are not downloaded at all.
+
+    browser is 'chrome' (headless Chrome, needs chromedriver on the PATH) or 'phantomjs'. When it is not given
+    PhantomJS is used if it is found at phantomjs_path and Chrome otherwise. driver_factory replaces both, it is
+    called to start every browser of the pool"""
+
+    # selenium never sees the status code or the response headers so it can not revalidate pages
+    supports_conditional = False
+    # every fetch leases its own browser from the pool
+    thread_safe = True
+
+    def __init__(self, phantomjs_path=None, metrics=None, timeout=30.0, pool_size=2, max_pages=50,
+                 block_assets=True, browser=None, driver_factory=None):
+        # we find the phantomjs path which is in the phantomjs directory by using os.path.join to
+        # join the current directory with the phantomjs executable
+        self._phantomjs_path = phantomjs_path or os.path.join(os.curdir, 'phantomjs/bin/phantomjs')
+        # the browser start up times are recorded as their own stage, they are included in the first fetches
+        # otherwise
+        self._metrics = metrics or NullMetrics()
+        # seconds a page may take to load, a stalled page must not hang the whole run. A fetch also waits at
+        # most this long for a free browser
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._max_pages = max_pages
+        self._block_assets = block_assets
+        if driver_factory is None:
+            if browser is None:
+                browser = 'phantomjs' if os.path.exists(self._phantomjs_path) else 'chrome'
+            driver_factory = self._phantomjs_driver if browser == 'phantomjs' else self._chrome_driver
+        self._driver_factory = driver_factory
+        # the browsers are started on the first fetch and not here, starting a browser takes seconds
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        return self._pool
+
+    def _phantomjs_driver(self):
+        # selenium is only imported when a browser is really needed
+        from selenium import webdriver
+
+        capabilities = dict(webdriver.DesiredCapabilities.PHANTOMJS)
+        capabilities['pageLoadStrategy'] = 'eager'
+        if self._block_assets:
+            # PhantomJS can only be told to skip images
+            capabilities['phantomjs.page.settings.loadImages'] = False
+        # PhantomJS of selenium is then run using the phantomjs directory path
+        driver = webdriver.PhantomJS(self._phantomjs_path, desired_capabilities=capabilities)
+        driver.set_page_load_timeout(self._timeout)
+        return driver
+
+    def _chrome_driver(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-extensions')
+        if self._block_assets:
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        driver = webdriver.Chrome(options=options, desired_capabilities={'pageLoadStrategy': 'eager'})
+        driver.set_page_load_timeout(self._timeout)
+        if self._block_assets:
+            # the requests for fonts and stylesheets are dropped by the browser's network layer
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+        return driver
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                return self._pool
+            self._pool = BrowserPool(self._driver_factory, size=self._pool_size, max_pages=self._max_pages,
+                                     metrics=self._metrics)
+        # the whole pool is started at once, about as long as starting one browser. Fetches arriving meanwhile
+        # wait for the first browser that is ready
+        self._pool.warm()
+        return self._pool
+
+    def fetch(self, url, headers=None):
+        """Loads url in a browser of the pool and returns the rendered page source. headers are ignored
+        because selenium does not let us set request headers"""
+        timeout_error, driver_error = _driver_errors()
+        try:
+            pool = self._get_pool()
+            session = pool.acquire(self._timeout)
+        except TimeoutError as e:
+            raise FetchError(f'Could not load {url}: {e}', url=url) from e
+        except driver_error as e:
+            # no browser could be started, or the pool was closed by another thread. Without a status the
+            # FetchScheduler tries again, a browser may start the next time
+            raise FetchError(f'Could not load {url}: {_message(e)}', url=url) from e
+
+        broken = False
+        try:
+            driver = session.driver
+            driver.get(url)
+            title = driver.title
+            source = driver.page_source
+        except timeout_error as e:
+            # the page did not load in time, the browser itself still works. There is no status, it can be retried
+            raise FetchError(f'Could not load {url}: {_message(e)}', url=url) from e
+        except driver_error as e:
+            # the browser crashed or stopped answering, the pool replaces it
+            broken = True
+            raise FetchError(f'Could not load {url}: {_message(e)}', url=url) from e
+        finally:
+            pool.release(session, broken=broken)
+
+        # if url does not exist or data not available raise custom error message
+        # this is because selenium does not produce status codes so we just have to compare strings
+        if '404 Not Found' in title:
+            raise FetchError('Could not find the area you were searching for', url=url, status=404)
+
+        return Response(url, 200, source)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
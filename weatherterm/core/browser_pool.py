@@ -0,0 +1,163 @@
+import threading
+import time
+
+from .metrics import NullMetrics
+
+
+class _Session:
+    """One browser of the pool and the number of pages it has loaded"""
+
+    __slots__ = ('driver', 'pages')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """Keeps up to size browsers running and lends them to concurrent fetches, a browser shows one page at a time
+    so every fetch needs one for itself. factory() starts a new browser (a selenium driver).
+
+    Browsers slow down and leak memory the longer they run, so a browser is quit and replaced after max_pages
+    pages. A fetch that finds its browser broken (crashed, lost its connection) gives it back with broken=True and
+    it is replaced too. Once the pool is warm (see warm()) replacements are started in the background, a fetch
+    only waits for one when every other browser is busy"""
+
+    def __init__(self, factory, size=2, max_pages=50, metrics=None):
+        self._factory = factory
+        self._size = max(1, size)
+        self._max_pages = max_pages
+        self._metrics = metrics or NullMetrics()
+        # idle browsers, the last one given back is lent first
+        self._idle = []
+        # browsers running, lent or idle, and browsers being started
+        self._running = 0
+        self._closed = False
+        # set by warm(), from then on every browser quit is replaced straight away
+        self._warm = False
+        self._available = threading.Condition(threading.Lock())
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def running(self):
+        return self._running
+
+    def _start(self):
+        # a browser takes seconds to start, the lock is not held meanwhile
+        try:
+            with self._metrics.stage('browser_start'):
+                session = _Session(self._factory())
+        except BaseException:
+            with self._available:
+                self._running -= 1
+                self._available.notify()
+            raise
+        self._metrics.count('browser_starts', 1)
+        return session
+
+    def _quit(self, session):
+        try:
+            session.driver.quit()
+        except Exception:
+            # a crashed browser may not answer any more, its process is gone or is killed by selenium anyway
+            pass
+
+    def warm(self):
+        """Starts browsers until size of them are running. They are started at the same time, so warming a pool
+        takes about as long as starting one browser. The error of a browser that did not start is only raised
+        when no browser is running at all, the pool works with the others"""
+        with self._available:
+            self._warm = True
+            missing = 0 if self._closed else self._size - self._running
+            self._running += missing
+        if not missing:
+            return
+
+        # only imported here, the browser backend is imported by every run but only started by a few
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=missing, thread_name_prefix='weatherterm-browser') as executor:
+            futures = [executor.submit(self._start) for _ in range(missing)]
+        sessions = [future.result() for future in futures if future.exception() is None]
+        with self._available:
+            self._idle.extend(sessions)
+            self._available.notify(len(sessions))
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        with self._available:
+            running = self._running
+        if errors and not running:
+            raise errors[0]
+
+    def acquire(self, timeout=None):
+        """Returns an idle browser, starts one when fewer than size are running or waits for one to be given back.
+        Raises TimeoutError when none is free after timeout seconds"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError('The browser pool is closed')
+                if self._idle:
+                    return self._idle.pop()
+                if self._running < self._size:
+                    self._running += 1
+                    break
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._metrics.count('browser_lease_timeouts', 1)
+                    raise TimeoutError(f'No browser was free within {timeout} seconds')
+                self._available.wait(remaining)
+
+        return self._start()
+
+    def release(self, session, broken=False):
+        """Gives a browser back. It is quit instead when it is broken, has loaded max_pages pages or the pool
+        is closed"""
+        session.pages += 1
+        recycle = broken or (self._max_pages and session.pages >= self._max_pages)
+        with self._available:
+            if not (recycle or self._closed):
+                self._idle.append(session)
+                self._available.notify()
+                return
+            replace = self._warm and not self._closed
+            if not replace:
+                self._running -= 1
+                self._available.notify()
+
+        if recycle:
+            self._metrics.count('browser_crashes' if broken else 'browser_recycles', 1)
+        if replace:
+            # the new browser takes the place of the old one in running, fetches wait for it or for another one
+            threading.Thread(target=self._replace, name='weatherterm-browser', daemon=True).start()
+        self._quit(session)
+
+    def _replace(self):
+        try:
+            session = self._start()
+        except Exception:
+            # _start gave the place back, the next fetch that needs a browser starts one itself
+            return
+        with self._available:
+            if not self._closed:
+                self._idle.append(session)
+                self._available.notify()
+                return
+            self._running -= 1
+        self._quit(session)
+
+    def close(self):
+        """Quits the idle browsers, the lent ones are quit when they are given back"""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+            self._available.notify_all()
+        for session in idle:
+            self._quit(session)
@@ -0,0 +1,19 @@
+import json
+from argparse import Action
+
+
+class CacheStatsAction(Action):
+    """Like the built in version action, prints the response cache counters as JSON and exits.
+    The output is meant to be scraped, eg. by a cron job feeding a monitoring system"""
+
+    def __init__(self, option_strings, dest, help=None):
+        super().__init__(option_strings, dest, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        # imported here so that defining the argument does not import the cache module
+        from .response_cache import ResponseCache
+
+        # --cache-dir has to come before --cache-stats on the command line to be taken into account
+        cache = ResponseCache(getattr(namespace, 'cache_dir', None))
+        print(json.dumps(cache.stats(), indent=2, sort_keys=True))
+        parser.exit()
@@ -0,0 +1,60 @@
+class ExtractionPlan:
+    """A list of Fields compiled into a lookup table of (tag, CSS class) -> field. extract() then collects every
+    field of an item in a single walk over its elements, instead of one find() over the whole item per field.
+    Like find(), the first element in document order wins when several elements match a field"""
+
+    def __init__(self, fields):
+        self._fields = list(fields)
+        self._lookup = {}
+        for field in self._fields:
+            self._lookup.setdefault((field.tag, field.css_class), []).append(field)
+
+    @property
+    def fields(self):
+        return self._fields
+
+    @classmethod
+    def compile_schemas(cls, parser_class):
+        """Returns a dictionary of ForecastType -> ExtractionPlan for the schemas class attribute of
+        parser_class. The plans are compiled the first time and kept on the class"""
+        plans = parser_class.__dict__.get('_compiled_plans')
+        if plans is None:
+            plans = {forecast_type: cls(fields) for forecast_type, fields in parser_class.schemas.items()}
+            parser_class._compiled_plans = plans
+        return plans
+
+    def extract(self, item):
+        """Returns a dictionary of field name -> text for the fields found among the descendants of item"""
+        scraped_data = {}
+        remaining = len(self._fields)
+        lookup = self._lookup
+
+        for element in item.descendants:
+            # text nodes have no name, only tags can match a field
+            if element.name is None:
+                continue
+
+            for css_class in element.get('class') or ():
+                for field in lookup.get((element.name, css_class), ()):
+                    if field.name not in scraped_data:
+                        scraped_data[field.name] = element.get_text()
+                        remaining -= 1
+
+            # everything was found, the rest of the item does not need to be walked
+            if remaining == 0:
+                break
+
+        return scraped_data
+
+    def iter_extract(self, container):
+        """Generator doing extract() for every child element of container, one item at a time. Children without
+        any field are left out"""
+        for item in container.children:
+            if item.name is not None:
+                result = self.extract(item)
+                if result:
+                    yield result
+
+    def extract_all(self, container):
+        """iter_extract as a list"""
+        return list(self.iter_extract(container))
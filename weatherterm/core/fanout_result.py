@@ -0,0 +1,30 @@
+class FanoutResult:
+    """The outcome of one ProviderFanout query. forecasts holds the forecasts that were kept and provider the name
+    of the parser that answered (with the merge strategy the names of the parsers that gave at least one field,
+    joined with +). When no parser answered, error holds an exception naming the error of every parser.
+
+    outcomes has an entry per parser, in the order they were given: name -> (status, seconds, error). status is
+    'won' (its forecasts were kept), 'ok' (it answered, too late or only partly used), 'failed', 'cancelled' (the
+    query was over before it answered) or 'skipped' (cancelled before it started). seconds is the time it took to
+    answer or fail, for cancelled parsers the time they had been running"""
+
+    def __init__(self, area, forecast_type):
+        self.area = area
+        self.forecast_type = forecast_type
+        self.forecasts = []
+        self.provider = None
+        self.error = None
+        self.outcomes = {}
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def summary(self):
+        parts = []
+        for name, (status, seconds, error) in self.outcomes.items():
+            detail = f'{status} {seconds:.2f}s' if status != 'skipped' else status
+            parts.append(f'{name} {detail}' + (f' ({error})' if error is not None else ''))
+        answer = f'{self.provider} answered' if self.ok else 'no answer'
+        return f'{self.area} ({self.forecast_type.value}): {answer} in {self.elapsed:.2f}s, {", ".join(parts)}'
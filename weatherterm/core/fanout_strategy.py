@@ -0,0 +1,11 @@
+from .base_enum import BaseEnum
+from enum import auto, unique
+
+
+@unique
+class FanoutStrategy(BaseEnum):
+    """FanoutStrategy Enum class lists how ProviderFanout combines the answers of several parsers queried for the
+    same forecast. FASTEST takes the first parser that answers and cancels the others, MERGE waits for all of them
+    and takes every field from the first parser in its priority order that has a value for it"""
+    FASTEST = auto()
+    MERGE = auto()
@@ -0,0 +1,18 @@
+"""fetch_backend.py maps every BackendType to the class that implements it.
+A backend is any object with a fetch(url, headers=None) method returning a Response, a close() method
+and a supports_conditional attribute"""
+
+from .backend_type import BackendType
+from .http_backend import HttpBackend
+from .browser_backend import BrowserBackend
+
+_backends = {
+    BackendType.HTTP: HttpBackend,
+    BackendType.BROWSER: BrowserBackend,
+}
+
+
+def create_backend(backend_type=BackendType.HTTP, **kwargs):
+    """Returns a new backend instance for backend_type. kwargs are handed to the backend class"""
+    backend_class = _backends[backend_type]
+    return backend_class(**kwargs)
@@ -0,0 +1,146 @@
+import threading
+
+from . import parser_loader
+from .backend_type import BackendType
+from .fetch_backend import create_backend
+from .metrics import NullMetrics
+
+
+class FetchClient:
+    """Everything the parsers share to fetch pages: one backend per BackendType (each wrapped in a FetchScheduler
+    with the timeouts, retries, rate limit and hedging), the ResponseCache and the thread pool the fetches of
+    weatherterm.get_forecasts run on. A long running application makes one, hands it to every get_forecasts call
+    so the connections, the browsers and the cache stay warm between calls, and closes it when it stops:
+
+        client = FetchClient(cache=ResponseCache())
+        results = await weatherterm.get_forecasts(['USNY0996'], 'today', client=client)
+        ...
+        client.close()
+
+    The backends are only started when a parser needs them. parsers maps parser names to classes, parser_loader's
+    registry of the parsers directory by default. With server (the address of weatherterm serve) the parsers are
+    ForecastClients of the daemon, which has its own backend and cache. It is thread safe"""
+
+    def __init__(self, backend_type=None, workers=8, timeout=30.0, deadline=None, retries=2, rate=None, hedge=False,
+                 browsers=2, browser_pages=50, cache=None, engine=None, archive=None, server=None, parsers=None,
+                 metrics=None):
+        # backend_type replaces the default backend of every parser
+        self._backend_type = backend_type
+        self._workers = max(1, workers)
+        self._scheduler_options = {'timeout': timeout, 'deadline': deadline, 'retries': retries, 'rate': rate,
+                                   'hedge': hedge}
+        self._browsers = browsers
+        self._browser_pages = browser_pages
+        self._cache = cache
+        self._engine = engine
+        self._archive = archive
+        self._server = server
+        self._parsers = parsers if parsers is not None else parser_loader.load()
+        self._metrics = metrics or NullMetrics()
+        self._lock = threading.Lock()
+        self._backends = {}
+        self._executor = None
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def parsers(self):
+        return self._parsers
+
+    @property
+    def backends(self):
+        """The backends started so far, BackendType -> FetchScheduler"""
+        return dict(self._backends)
+
+    def parser_class(self, parser):
+        """The class of parser, a parser name (KeyError when there is no such parser) or already a class"""
+        return self._parsers[parser] if isinstance(parser, str) else parser
+
+    def backend_type(self, parser):
+        return self._backend_type or self.parser_class(parser).default_backend
+
+    def backend(self, backend_type=BackendType.HTTP):
+        """The shared backend of backend_type, started on the first call"""
+        with self._lock:
+            backend = self._backends.get(backend_type)
+            if backend is None:
+                # imported here, FetchScheduler pulls in concurrent.futures
+                from .fetch_scheduler import FetchScheduler
+
+                # the pooled HTTP client keeps up to one open connection per worker, the browser pool times the
+                # start up of its browsers
+                if backend_type == BackendType.HTTP:
+                    backend_options = {'maxsize': self._workers}
+                else:
+                    backend_options = {'metrics': self._metrics, 'timeout': self._scheduler_options['timeout'],
+                                       'pool_size': self._browsers, 'max_pages': self._browser_pages}
+                with self._metrics.stage('backend_start'):
+                    backend = create_backend(backend_type, **backend_options)
+                # the scheduler wraps the backend, the parsers use it like any other backend
+                backend = self._backends[backend_type] = FetchScheduler(
+                    backend, max_workers=self._workers * 2, metrics=self._metrics, **self._scheduler_options)
+            return backend
+
+    def parser(self, parser, **options):
+        """A new parser (a name or a class) fetching with the shared backend and cache. options are handed to the
+        parser, eg. bounded_memory=True. Parsers keep per run state, a parser is only used by one thread at a
+        time"""
+        if self._server is not None:
+            from .forecast_client import ForecastClient
+            return ForecastClient(self._server, parser if isinstance(parser, str) else parser.__name__)
+
+        parser_class = self.parser_class(parser)
+        return parser_class(backend=self.backend(self.backend_type(parser_class)), cache=self._cache,
+                            engine=self._engine, metrics=self._metrics, archive=self._archive, **options)
+
+    def fanout(self, parsers, strategy=None, priorities=None, **options):
+        """A ProviderFanout querying all of parsers at the same time, see ProviderFanout"""
+        from .fanout_strategy import FanoutStrategy
+        from .provider_fanout import ProviderFanout
+
+        names = [parser if isinstance(parser, str) else parser.__name__ for parser in parsers]
+        factories = {name: lambda parser=parser: self.parser(parser, **options) for name, parser in zip(names, parsers)}
+        return ProviderFanout(factories, strategy or FanoutStrategy.FASTEST, priorities, self._metrics)
+
+    @property
+    def executor(self):
+        """The thread pool of the blocking fetches and parses of get_forecasts, started on the first use"""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='weatherterm')
+            return self._executor
+
+    def close(self):
+        """Stops the backends and the thread pool and adds the hit/miss counters of the cache to its stats file"""
+        with self._lock:
+            backends, self._backends = self._backends, {}
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for backend in backends.values():
+            backend.close()
+        if self._cache is not None:
+            self._cache.flush_stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
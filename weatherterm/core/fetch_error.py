@@ -0,0 +1,8 @@
+class FetchError(Exception):
+    """Raised by the fetch backends when a page could not be retrieved.
+    status holds the HTTP status code when the backend knows it, otherwise it is None"""
+
+    def __init__(self, message, url=None, status=None):
+        super().__init__(message)
+        self.url = url
+        self.status = status
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from .fetch_error import FetchError
+from .metrics import NullMetrics
+from .token_bucket import TokenBucket
+
+
+class FetchScheduler:
+    """Wraps a backend and controls when and how long its fetches run. It has the same fetch/close methods and
+    supports_conditional attribute as the backends, so a Request or a parser can use it in place of one.
+
+    - timeout is the deadline of one fetch, retries included. deadline (seconds from now) is the deadline of the
+      whole run, no fetch starts or waits after it
+    - failed fetches with a status in retry_statuses, or without a status (connection errors), are tried again
+      up to retries times after a random wait of up to backoff, 2 * backoff, 4 * backoff... seconds
+    - rate limits the requests to every host (per second, bursts of burst requests) with a TokenBucket
+    - with hedge on, a second request for the same page is sent when the first one takes longer than the 95th
+      percentile of the recent fetches of its host, at most hedge_cap times their median. The first answer wins.
+      Hedging needs a thread safe backend
+
+    With a thread safe backend every request runs on a pool thread, so a stalled request is given up at the
+    deadline instead of holding the run until the backend's own timeout"""
+
+    retry_statuses = frozenset({408, 429, 500, 502, 503, 504})
+    # number of recent fetch times kept per host, and how many are needed before hedging starts
+    latency_samples = 200
+    min_samples = 20
+    # the stalled fetches are in the recent fetch times too: when they are 5% of them the 95th percentile is the
+    # stall itself and the hedge would come too late, so the delay is at most this many times the median
+    hedge_cap = 3
+
+    def __init__(self, backend, timeout=30.0, deadline=None, retries=2, backoff=0.25, max_backoff=8.0, rate=None,
+                 burst=None, hedge=False, hedge_delay=None, max_workers=32, metrics=None):
+        self._backend = backend
+        self._timeout = timeout
+        self._run_deadline = time.monotonic() + deadline if deadline is not None else None
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._rate = rate
+        self._burst = burst
+        # the fetches of a backend that is not thread safe run in the calling thread and are never hedged
+        self._thread_safe = getattr(backend, 'thread_safe', False)
+        # a backend taking a timeout is told how long is left, so requests given up at the deadline do not keep
+        # running (and keep the process from exiting) until the backend's own timeout
+        self._supports_timeout = getattr(backend, 'supports_timeout', False)
+        self._hedge = hedge and self._thread_safe
+        # hedge_delay is used until enough fetch times are known to take the 95th percentile
+        self._hedge_delay = hedge_delay
+        self._max_workers = max_workers
+        self._metrics = metrics or NullMetrics()
+        self._executor = None
+        self._lock = threading.Lock()
+        # host -> TokenBucket and host -> recent fetch times
+        self._buckets = {}
+        self._latencies = {}
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def supports_conditional(self):
+        return self._backend.supports_conditional
+
+    def _bucket(self, host):
+        if self._rate is None:
+            return None
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self._rate, self._burst)
+            return self._buckets[host]
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix='weatherterm-fetch')
+            return self._executor
+
+    def hedge_delay(self, host):
+        """Seconds after which a request to host gets a hedge, None when hedging is not possible yet"""
+        latencies = self._latencies.get(host)
+        if latencies is None or len(latencies) < self.min_samples:
+            return self._hedge_delay
+        ordered = sorted(latencies)
+        return min(ordered[int(len(ordered) * 0.95) - 1], ordered[len(ordered) // 2] * self.hedge_cap)
+
+    def _timed_fetch(self, host, url, headers, deadline):
+        start = time.monotonic()
+        if self._supports_timeout:
+            response = self._backend.fetch(url, headers=headers, timeout=max(0.001, deadline - start))
+        else:
+            response = self._backend.fetch(url, headers=headers)
+        with self._lock:
+            self._latencies.setdefault(host, deque(maxlen=self.latency_samples)).append(time.monotonic() - start)
+        return response
+
+    def _timeout_error(self, url):
+        self._metrics.count('timeouts', 1)
+        return FetchError(f'Request to {url} did not finish before its deadline', url=url)
+
+    def _attempt(self, host, url, headers, deadline):
+        bucket = self._bucket(host)
+        if bucket is not None and not bucket.acquire(deadline):
+            raise self._timeout_error(url)
+
+        if not self._thread_safe:
+            return self._timed_fetch(host, url, headers, deadline)
+
+        pool = self._pool()
+        start = time.monotonic()
+        first = pool.submit(self._timed_fetch, host, url, headers, deadline)
+        futures = {first}
+        hedge_delay = self.hedge_delay(host) if self._hedge else None
+        hedged = False
+        error = None
+
+        while futures:
+            now = time.monotonic()
+            if now >= deadline:
+                for future in futures:
+                    future.cancel()
+                raise self._timeout_error(url)
+
+            wait_for = deadline - now
+            if hedge_delay is not None and not hedged:
+                wait_for = max(0.0, min(wait_for, start + hedge_delay - now))
+
+            done, futures = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedged:
+                        self._metrics.count('hedge_wins' if future is not first else 'hedge_losses', 1)
+                    for other in futures:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+
+            if not done and hedge_delay is not None and not hedged:
+                # the request is slower than most, a second one is sent if the rate limit allows it right now
+                hedged = True
+                if bucket is None or bucket.try_acquire():
+                    futures.add(pool.submit(self._timed_fetch, host, url, headers, deadline))
+                    self._metrics.count('hedges', 1)
+
+        raise error
+
+    def _retryable(self, error):
+        return error.status is None or error.status in self.retry_statuses
+
+    def fetch(self, url, headers=None):
+        host = urlsplit(url).netloc
+        deadline = time.monotonic() + self._timeout
+        if self._run_deadline is not None:
+            deadline = min(deadline, self._run_deadline)
+
+        attempt = 0
+        while True:
+            if time.monotonic() >= deadline:
+                raise self._timeout_error(url)
+
+            try:
+                return self._attempt(host, url, headers, deadline)
+            except FetchError as e:
+                if attempt >= self._retries or not self._retryable(e):
+                    raise
+
+                # full jitter: a random wait between 0 and the exponential backoff, so clients that failed
+                # together do not all come back at the same moment
+                delay = random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    raise
+                self._metrics.count('retries', 1)
+                time.sleep(delay)
+                attempt += 1
+
+    def close(self):
+        if self._executor is not None:
+            # requests still running were given up at their deadline, there is no point waiting for them
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._backend.close()
@@ -0,0 +1,12 @@
+class Field:
+    """One value a parser scrapes from a page: the text of the first <tag class="css_class"> element inside
+    an item of the forecast container. name is the key the value gets in the results, by default the CSS class
+    itself, so a field can be renamed without a Mapper"""
+
+    def __init__(self, css_class, tag, name=None):
+        self.css_class = css_class
+        self.tag = tag
+        self.name = name or css_class
+
+    def __repr__(self):
+        return f'Field({self.css_class!r}, {self.tag!r}, name={self.name!r})'
@@ -1,10 +1,17 @@
 from .forecast_type import ForecastType
+from .unit_converter import UnitConverter
 from datetime import date
+import math
 
 
 class Forecast:
     """A Class to represent the properties for the forecast data going to be parsed"""
 
+    # __slots__ stops every instance from carrying its own __dict__, it matters when many forecasts are kept.
+    # For large amounts of forecasts use ForecastBatch, which stores them column by column
+    __slots__ = ('_current_temp', '_humidity', '_wind', '_high_temp', '_low_temp', '_description',
+                 '_forecast_date', '_forecast_type')
+
     def __init__(
             self,
             current_temp,
@@ -53,6 +60,21 @@ class Forecast:
         on date format codes"""
         self._forecast_date = forecast_date.strftime("%a %b %d")
 
+    @property
+    def high_temp(self):
+        """return high temp attribute, the highest temperature of the day"""
+        return self._high_temp
+
+    @property
+    def low_temp(self):
+        """return low temp attribute, the lowest temperature of the day"""
+        return self._low_temp
+
+    @property
+    def forecast_type(self):
+        """return forecast type attribute, the ForecastType this forecast was parsed for"""
+        return self._forecast_type
+
     @property
     def wind(self):
         """return wind attribute, info about the day's wind levels"""
@@ -68,26 +90,69 @@ class Forecast:
         """return description attribute, info of description of the day's weather eg. Sunny"""
         return self._description
 
+    def to_dict(self):
+        """Returns the forecast as a dictionary of plain values (strings and numbers) that can be turned into JSON.
+        Dates are written in ISO format, forecast dates that were already formatted are kept as they are"""
+        forecast_date = self._forecast_date
+        if isinstance(forecast_date, date):
+            forecast_date = forecast_date.isoformat()
+
+        return {
+            'current_temp': _json_number(self._current_temp),
+            'high_temp': _json_number(self._high_temp),
+            'low_temp': _json_number(self._low_temp),
+            'humidity': self._humidity,
+            'wind': self._wind,
+            'description': self._description,
+            'forecast_date': forecast_date,
+            'forecast_type': self._forecast_type.value,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """The reverse of to_dict"""
+        forecast_date = data.get('forecast_date')
+        try:
+            forecast_date = date.fromisoformat(forecast_date)
+        except (TypeError, ValueError):
+            # not an ISO date, eg. 'Sat OCT 19' from the 5 and 10 day pages
+            pass
+
+        return cls(data['current_temp'], data['humidity'], data['wind'],
+                   high_temp=data.get('high_temp'), low_temp=data.get('low_temp'),
+                   description=data.get('description', ''), forecast_date=forecast_date,
+                   forecast_type=ForecastType(data.get('forecast_type', ForecastType.TODAY.value)))
+
     def __str__(self):
         """if forecast type is today print the day's current temp together with low and high temps.
         However if forecast type is not today just print low and high temps"""
         temperature = None
         spacing = '' * 4
+        # temperatures are kept as numbers, they are only formatted here
+        current_temp, high_temp, low_temp = (UnitConverter.format_value(value) for value in
+                                             (self._current_temp, self._high_temp, self._low_temp))
 
         # self._low_temp represents the lowest temp of the day
         # self._high_temp the highest temp of the day
 
         if self._forecast_type == ForecastType.TODAY:
-            temperature = (f'{spacing} {self._current_temp}\xb0\n'  # xb0 is for the degree celsius symbol
-                           f'{spacing} High {self._high_temp}\xb0 /'
-                           f'Low {self._low_temp}\xb0')
+            temperature = (f'{spacing} {current_temp}\xb0\n'  # xb0 is for the degree celsius symbol
+                           f'{spacing} High {high_temp}\xb0 /'
+                           f'Low {low_temp}\xb0')
 
         else:
-            temperature = (f'{spacing} {self._high_temp}\xb0 /'
-                           f'Low {self._low_temp}\xb0 ')
+            temperature = (f'{spacing} {high_temp}\xb0 /'
+                           f'Low {low_temp}\xb0 ')
 
         return (f'>> {self._forecast_date}\n'
                 f'{temperature}\n'
                 f'({self._description})\n'
                 f'{spacing}Wind:'
                 f'{self._wind}  / Humidity: {self._humidity}\n')
+
+
+def _json_number(value):
+    # NaN is not valid JSON, a missing temperature is written as null
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    return value
@@ -0,0 +1,143 @@
+"""The library API of weatherterm, for programs using it without going through the command line:
+
+    import weatherterm
+
+    async with weatherterm.FetchClient() as client:
+        for result in await weatherterm.get_forecasts(['USNY0996', 'USCA0987'], ['today', '5day'], 'celsius',
+                                                      client=client):
+            print(result.area, result.forecast_type, result.error or result.forecasts)
+
+Every query runs on the event loop of the caller and the queries of a call run at the same time. The backends
+(urllib3, selenium) and the parsers block, the loop hands them to the thread pool of the FetchClient and awaits
+them, so the loop itself never waits for a page. Nothing is printed, nothing is read from sys.argv and errors come
+back in the BatchResult of their query"""
+
+import asyncio
+from argparse import Namespace
+
+from .batch_runner import BatchRunner
+from .fetch_client import FetchClient
+from .forecast_type import ForecastType
+from .page_budget import PageBudget
+from .unit import Unit
+
+
+def _as_list(value):
+    # one area, forecast type or parser can be given without a list
+    if value is None:
+        return []
+    if isinstance(value, (str, ForecastType, type)):
+        return [value]
+    return list(value)
+
+
+def _forecast_type(value):
+    """A ForecastType, from a ForecastType, its value ('today', '5day', '10day', 'weekend') or its name"""
+    if isinstance(value, ForecastType):
+        return value
+    for forecast_type in ForecastType:
+        if value.lower() in (forecast_type.value, forecast_type.name.lower()):
+            return forecast_type
+    raise ValueError(f'Unknown forecast type {value!r}, one of {", ".join(item.value for item in ForecastType)}')
+
+
+def _unit(value):
+    """A Unit from a Unit or its name ('celsius', 'fahrenheit'), None keeps the unit of the website"""
+    if value is None or isinstance(value, Unit):
+        return value
+    try:
+        return Unit[value.upper()]
+    except KeyError:
+        raise ValueError(f'Unknown unit {value!r}, one of {", ".join(item.name.lower() for item in Unit)}') from None
+
+
+def _tasks(areas, forecast_types):
+    # dict.fromkeys drops repeated pairs but keeps the order in which they were given, like BatchRunner.run
+    forecast_types = [_forecast_type(value) for value in _as_list(forecast_types)] or [ForecastType.TODAY]
+    return list(dict.fromkeys((area, forecast_type) for area in _as_list(areas) for forecast_type in forecast_types))
+
+
+async def iter_forecasts(areas, forecast_types=ForecastType.TODAY, unit=None, parser='WeatherComParser',
+                         client=None, strategy=None, priorities=None, max_pages=None, concurrency=None):
+    """Async generator yielding a BatchResult for every distinct (area, forecast type) pair as soon as it is done,
+    so the results come out in completion order.
+
+    areas are area codes, forecast_types ForecastTypes or their values ('today', '5day'...), unit a Unit or its
+    name. parser is a parser name (or class), several of them are queried at the same time by a ProviderFanout
+    with strategy and priorities (see --fanout and --prefer). client is the FetchClient to fetch with, a FetchClient
+    of its own is made and closed when it is not given. With max_pages at most that many pages are in memory at
+    once (see --max-pages), it can also be a PageBudget shared by several calls. Up to concurrency (default: the
+    workers of the client) queries run at the same time"""
+    tasks = _tasks(areas, forecast_types)
+    parsers = _as_list(parser)
+    if not parsers:
+        raise ValueError('At least one parser is needed')
+
+    owned = client is None
+    client = client or FetchClient()
+    try:
+        # an unknown parser is a KeyError right away rather than the error of every query
+        for name in parsers:
+            client.parser_class(name)
+    except Exception:
+        if owned:
+            client.close()
+        raise
+
+    options = {'bounded_memory': True} if max_pages else {}
+    if len(parsers) > 1:
+        def parser_factory():
+            return client.fanout(parsers, strategy, priorities, **options)
+    else:
+        def parser_factory():
+            return client.parser(parsers[0], **options)
+    # the batch runner keeps a parser per thread of the pool, run_one does one query in the calling thread
+    page_budget = max_pages
+    if max_pages and not isinstance(max_pages, PageBudget):
+        page_budget = PageBudget(max_pages)
+    # with one parser, a forecast type that can be taken from the page of another type asked for the same area
+    # is not fetched (eg. the 5 day forecast of the 10 day page), the providers of a fan out can differ
+    derived_forecasts = None
+    if len(parsers) == 1:
+        derived_forecasts = getattr(client.parser_class(parsers[0]), 'derived_forecasts', None)
+    runner = BatchRunner(parser_factory, workers=client.workers, page_budget=page_budget or None,
+                         derived_forecasts=derived_forecasts)
+    args = Namespace(area_code=None, forecast_option=None, unit=_unit(unit))
+    tasks, derived = runner.plan(tasks)
+
+    loop = asyncio.get_running_loop()
+    window = max(1, concurrency or client.workers)
+    pending = iter(tasks)
+    running = set()
+    try:
+        while True:
+            # only a window of queries is started at a time, so a long list of areas does not queue up a future
+            # (and later the forecasts) for every one of them
+            for area, forecast_type in pending:
+                running.add(loop.run_in_executor(client.executor, runner.run_one, args, area, forecast_type))
+                if len(running) >= window:
+                    break
+            if not running:
+                return
+
+            finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                yield result
+                for derived_result in runner.derive(result, derived):
+                    yield derived_result
+    finally:
+        # the caller stopped early or was cancelled: the queries not started yet never start
+        for future in running:
+            future.cancel()
+        if owned:
+            client.close()
+
+
+async def get_forecasts(areas, forecast_types=ForecastType.TODAY, unit=None, parser='WeatherComParser', client=None,
+                        **options):
+    """Queries every area for every forecast type at the same time and returns the list of their BatchResults in
+    the order of areas and forecast_types. The options are the ones of iter_forecasts"""
+    order = {task: index for index, task in enumerate(_tasks(areas, forecast_types))}
+    results = [result async for result in iter_forecasts(areas, forecast_types, unit, parser, client, **options)]
+    return sorted(results, key=lambda result: order[(result.area, result.forecast_type)])
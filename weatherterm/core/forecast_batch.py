@@ -0,0 +1,157 @@
+import math
+import re
+from array import array
+from datetime import date, datetime
+
+from .forecast import Forecast
+from .forecast_type import ForecastType
+from .unit_converter import UnitConverter
+
+_nan = float('nan')
+_number_regex = re.compile(r'-?\d+(?:\.\d+)?')
+_month_day_regex = re.compile(r'([A-Za-z]{3})\s*(\d{1,2})\s*$')
+_forecast_types = list(ForecastType)
+
+
+def _to_float(value):
+    """Temperatures come as ints, strings like '22.2' or '--', humidity as '64%'. Anything that is not a number
+    becomes NaN"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _number_regex.search(value or '')
+    return float(match.group()) if match else _nan
+
+
+def _to_ordinal(forecast_date, reference):
+    """Returns the ordinal of forecast_date, which is a date or a weather.com label like 'Sat OCT 17'.
+    Labels have no year: the year of reference is used, or the next one when the date would be months in the
+    past (a January forecast fetched in December). 0 means no date"""
+    if isinstance(forecast_date, date):
+        return forecast_date.toordinal()
+
+    match = _month_day_regex.search(forecast_date or '')
+    if match is None:
+        return 0
+
+    try:
+        parsed = datetime.strptime(f'{match.group(1).title()} {match.group(2)} {reference.year}', '%b %d %Y').date()
+    except ValueError:
+        return 0
+
+    if (reference - parsed).days > 180:
+        parsed = parsed.replace(year=parsed.year + 1)
+    return parsed.toordinal()
+
+
+class _Strings:
+    """A dictionary encoded column of strings: every distinct string is stored once and rows hold its index"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('I')
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+
+class ForecastBatch:
+    """Stores many forecasts column by column. Temperatures, humidity and wind speed are float arrays
+    (NaN when a value is missing), dates are day ordinals, and the few distinct strings (area, description, wind)
+    are dictionary encoded. Iterating or indexing a batch gives Forecast objects built on the fly, so code written
+    for lists of forecasts keeps working"""
+
+    def __init__(self, reference_date=None):
+        # the year used for dates that have none, see _to_ordinal
+        self._reference_date = reference_date or date.today()
+        self.current_temp = array('d')
+        self.high_temp = array('d')
+        self.low_temp = array('d')
+        self.humidity = array('d')
+        self.wind_speed = array('d')
+        self.date_ordinal = array('l')
+        self.forecast_type = array('B')
+        self._areas = _Strings()
+        self._descriptions = _Strings()
+        self._winds = _Strings()
+
+    @classmethod
+    def from_forecasts(cls, forecasts, area='', reference_date=None):
+        batch = cls(reference_date)
+        batch.extend(forecasts, area)
+        return batch
+
+    def append(self, forecast, area=''):
+        self.current_temp.append(_to_float(forecast.current_temp))
+        self.high_temp.append(_to_float(forecast.high_temp))
+        self.low_temp.append(_to_float(forecast.low_temp))
+        self.humidity.append(_to_float(forecast.humidity))
+        self.wind_speed.append(_to_float(forecast.wind))
+        self.date_ordinal.append(_to_ordinal(forecast.forecast_date, self._reference_date))
+        self.forecast_type.append(_forecast_types.index(forecast.forecast_type))
+        self._areas.append(area)
+        self._descriptions.append(forecast.description)
+        self._winds.append(forecast.wind)
+
+    def extend(self, forecasts, area=''):
+        for forecast in forecasts:
+            self.append(forecast, area)
+
+    def __len__(self):
+        return len(self.current_temp)
+
+    def area(self, row):
+        return self._areas[row]
+
+    def date(self, row):
+        ordinal = self.date_ordinal[row]
+        return date.fromordinal(ordinal) if ordinal else None
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('ForecastBatch index out of range')
+
+        forecast_type = _forecast_types[self.forecast_type[row]]
+        forecast_date = self.date(row)
+        if forecast_date is not None and forecast_type != ForecastType.TODAY:
+            # the same label the 5/10 day and weekend pages use, eg. Sat OCT 17
+            forecast_date = f'{forecast_date:%a} {forecast_date.strftime("%b").upper()} {forecast_date.day}'
+
+        humidity = self.humidity[row]
+        # temperatures are handed over as numbers, Forecast formats them when it is printed
+        return Forecast(self.current_temp[row],
+                        '--' if math.isnan(humidity) else f'{UnitConverter.format_value(humidity)}%',
+                        self._winds[row],
+                        high_temp=self.high_temp[row],
+                        low_temp=self.low_temp[row],
+                        description=self._descriptions[row],
+                        forecast_date=forecast_date,
+                        forecast_type=forecast_type)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def column(self, name):
+        """Returns a numeric column as a NumPy array sharing the memory of the batch when NumPy is installed,
+        otherwise the array itself"""
+        values = getattr(self, name)
+        try:
+            import numpy
+        except ImportError:
+            return values
+        return numpy.frombuffer(values, dtype=values.typecode)
+
+    def mean(self, name):
+        """Mean of a numeric column, NaN values are left out"""
+        values = [value for value in getattr(self, name) if not math.isnan(value)]
+        return math.fsum(values) / len(values) if values else _nan
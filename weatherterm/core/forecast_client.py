@@ -0,0 +1,102 @@
+import http.client
+import json
+import socket
+import time
+from urllib.parse import urlencode
+
+from .fetch_error import FetchError
+from .forecast import Forecast
+from .forecast_set import ForecastSet
+from .forecast_type import ForecastType
+
+
+class _UnixConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class ForecastClient:
+    """A thin client of the forecast server (weatherterm serve). It has the same run(args) method as the
+    parsers, so the command line can use it in place of a parser without any other change.
+    address is 'unix:/path/to/socket' or 'host:port'"""
+
+    def __init__(self, address, parser_name, timeout=30.0):
+        self._address = address
+        self._parser_name = parser_name
+        self._timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self._address.startswith('unix:'):
+            return _UnixConnection(self._address[len('unix:'):], self._timeout)
+        host, _, port = self._address.replace('http://', '').rpartition(':')
+        if not port.isdigit():
+            raise FetchError(f'Bad forecast server address {self._address}, it is unix:/path/to/socket or host:port')
+        return http.client.HTTPConnection(host or '127.0.0.1', int(port), timeout=self._timeout)
+
+    def _get(self, path):
+        # the connection is kept open between queries, it is opened again if the server closed it
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request('GET', path)
+                response = self._connection.getresponse()
+                return response.status, json.loads(response.read())
+            except (http.client.HTTPException, OSError) as e:
+                # OSError also covers a daemon that is not running: a refused connection, a socket file that is
+                # not there or a timeout
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    raise FetchError(f'Could not reach the forecast server at {self._address}: {e}') from e
+
+    def query(self, area, forecast_type, unit=None):
+        params = {'parser': self._parser_name, 'area': area, 'type': forecast_type.value}
+        if unit is not None:
+            params['unit'] = unit.name.lower()
+
+        status, data = self._get(f'/forecast?{urlencode(params)}')
+        if status != 200:
+            raise FetchError(data.get('error', f'Forecast server answered with status {status}'), status=status)
+
+        return [Forecast.from_dict(item) for item in data['forecasts']]
+
+    def run(self, args):
+        return self.query(args.area_code, args.forecast_option, args.unit)
+
+    def poll(self, args, validators=None):
+        """Same as the parsers' poll. The daemon has no validators to give, the answers are compared instead"""
+        forecasts = self.run(args)
+        digest = [forecast.to_dict() for forecast in forecasts]
+        if validators is not None and validators['digest'] == digest:
+            return None, validators
+        return forecasts, {'digest': digest}
+
+    def iter_run(self, args):
+        # the daemon answers with all the forecasts at once, this is only here to look like a parser
+        return iter(self.run(args))
+
+    def run_many(self, args, forecast_types=None):
+        """Same as the parsers' run_many. The daemon keeps every page in its cache, so each type is just a query"""
+        forecast_set = ForecastSet(args.area_code)
+        start = time.perf_counter()
+
+        for forecast_type in forecast_types or ForecastType:
+            forecast_set.forecasts[forecast_type] = self.query(args.area_code, forecast_type, args.unit)
+            forecast_set.fetched.append(forecast_type)
+
+        forecast_set.elapsed = forecast_set.fetch_time = time.perf_counter() - start
+        return forecast_set
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
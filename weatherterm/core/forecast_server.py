@@ -0,0 +1,181 @@
+import json
+import os
+import socket
+import threading
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingUnixStreamServer
+from urllib.parse import parse_qs, urlparse
+
+from .forecast_type import ForecastType
+from .memory_cache import MemoryCache
+from .single_flight import SingleFlight
+from .unit import Unit
+
+
+class ForecastService:
+    """Keeps parsers, their fetch backend and a cache of results warm between queries. This is the part of the
+    daemon that does not know about HTTP: query() returns the forecasts of one area as a list of dictionaries.
+    Identical queries arriving at the same time only fetch and parse the page once (single-flight)"""
+
+    def __init__(self, parsers, backend=None, cache=None, ttl=60, engine=None):
+        # parsers maps parser names to parser classes, like the dictionary returned by parser_loader.load
+        self._parsers = parsers
+        self._backend = backend
+        self._cache = cache
+        self._engine = engine
+        self._results = MemoryCache(ttl)
+        self._single_flight = SingleFlight()
+        # parsers keep per run state so every server thread gets its own instance of each parser
+        self._local = threading.local()
+
+    @property
+    def parsers(self):
+        return self._parsers
+
+    def _parser(self, parser_name):
+        instances = self._local.__dict__.setdefault('parsers', {})
+        if parser_name not in instances:
+            parser_class = self._parsers[parser_name]
+            instances[parser_name] = parser_class(backend=self._backend, cache=self._cache,
+                                                   engine=self._engine)
+        return instances[parser_name]
+
+    def query(self, parser_name, area, forecast_type, unit=None):
+        if parser_name not in self._parsers:
+            raise KeyError(f'Unknown parser {parser_name}')
+
+        key = (parser_name, area, forecast_type, unit)
+        results = self._results.get(key)
+        if results is None:
+            results = self._single_flight.do(key, self._run, key)
+        return results
+
+    def _run(self, key):
+        parser_name, area, forecast_type, unit = key
+        args = Namespace(area_code=area, forecast_option=forecast_type, unit=unit)
+        results = [forecast.to_dict() for forecast in self._parser(parser_name).run(args)]
+        self._results.put(key, results)
+        return results
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+            return
+
+        if url.path != '/forecast':
+            self._send_json(404, {'error': f'Unknown path {url.path}'})
+            return
+
+        # query string: parser=WeatherComParser&area=USNY0996&type=today&unit=celsius
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        # the query is checked before it runs: a KeyError or a ValueError raised by a parser is a failure of the
+        # upstream site, not a bad query
+        parser_name = query.get('parser')
+        if parser_name not in self.server.service.parsers:
+            self._send_json(400, {'error': f'Bad query: unknown parser {parser_name}'})
+            return
+        if not query.get('area'):
+            self._send_json(400, {'error': 'Bad query: no area'})
+            return
+        try:
+            forecast_type = ForecastType(query.get('type', ForecastType.TODAY.value))
+            unit = Unit[query['unit'].upper()] if query.get('unit') else None
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error': f'Bad query: unknown type or unit {e}'})
+            return
+
+        try:
+            results = self.server.service.query(parser_name, query['area'], forecast_type, unit)
+        except Exception as e:
+            # the upstream site failed, the client turns this back into an exception
+            self._send_json(502, {'error': str(e)})
+            return
+
+        self._send_json(200, {'forecasts': results})
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _UnixHandler(_Handler):
+    # TCP_NODELAY does not exist for Unix sockets
+    disable_nagle_algorithm = False
+
+
+class _TcpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # a socket file left behind by a daemon that crashed would make bind fail
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+
+
+class ForecastServer:
+    """Serves a ForecastService over HTTP, either on a localhost port or on a Unix socket.
+    address is 'unix:/path/to/socket' or 'host:port'"""
+
+    def __init__(self, service, address='127.0.0.1:8765', verbose=False):
+        if address.startswith('unix:'):
+            self._server = _UnixServer(address[len('unix:'):], _UnixHandler)
+        else:
+            host, _, port = address.rpartition(':')
+            self._server = _TcpServer((host or '127.0.0.1', int(port)), _Handler)
+
+        self._server.service = service
+        self._server.verbose = verbose
+        self._thread = None
+
+    @property
+    def address(self):
+        """The address clients should connect to, with the real port when port 0 was asked for"""
+        if self._server.address_family == socket.AF_UNIX:
+            return f'unix:{self._server.server_address}'
+        host, port = self._server.server_address[:2]
+        return f'{host}:{port}'
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        """Serves in a background thread, used by tests and benchmarks"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+        if self._server.address_family == socket.AF_UNIX and os.path.exists(self._server.server_address):
+            os.unlink(self._server.server_address)
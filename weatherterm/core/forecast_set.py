@@ -0,0 +1,28 @@
+class ForecastSet:
+    """The result of a parser's run_many: the forecasts of several forecast types for one area, grouped by type,
+    together with how many pages had to be fetched for them and how long fetching and parsing took"""
+
+    def __init__(self, area):
+        self.area = area
+        self.forecasts = {}
+        # forecast types whose page was fetched, and forecast types derived from another type's page
+        self.fetched = []
+        self.derived = []
+        self.fetch_time = 0.0
+        self.parse_time = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def fetches_saved(self):
+        return len(self.derived)
+
+    def items(self):
+        return self.forecasts.items()
+
+    def __getitem__(self, forecast_type):
+        return self.forecasts[forecast_type]
+
+    def summary(self):
+        return (f'{len(self.fetched)} pages fetched for {len(self.forecasts)} forecast types '
+                f'({self.fetches_saved} fetches saved), fetch {self.fetch_time:.2f}s, '
+                f'parse {self.parse_time:.2f}s, total {self.elapsed:.2f}s')
@@ -0,0 +1,109 @@
+import random
+import time
+from argparse import Namespace
+
+
+class WatchTask:
+    """The state of one (area, forecast type) being watched"""
+
+    __slots__ = ('area', 'forecast_type', 'args', 'validators', 'forecasts', 'changed_rows', 'error', 'interval',
+                 'due', 'polls', 'changes')
+
+    def __init__(self, args, area, forecast_type, interval):
+        self.area = area
+        self.forecast_type = forecast_type
+        # every task has its own copy of the command line arguments with its area and forecast type
+        self.args = Namespace(**vars(args))
+        self.args.area_code = area
+        self.args.forecast_option = forecast_type
+        self.validators = None
+        self.forecasts = []
+        # indexes of the forecasts that differ from the previous poll
+        self.changed_rows = []
+        self.error = None
+        self.interval = interval
+        self.due = 0.0
+        self.polls = 0
+        self.changes = 0
+
+
+class ForecastWatcher:
+    """Polls the forecasts of some areas forever with one parser, so the fetch backend (the connection pool or the
+    browser) stays alive between polls. Every poll is a conditional request and a page that did not change is not
+    parsed again (see Request.poll).
+
+    Every task has its own polling interval: it starts at interval, grows by backoff every time the page did not
+    change and doubles when polling fails, up to max_interval. A change brings it back to interval.
+    A bit of jitter keeps the tasks of many areas from polling all at the same moment"""
+
+    backoff = 1.5
+
+    def __init__(self, parser, args, areas, forecast_types, interval, max_interval=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self._parser = parser
+        self._interval = interval
+        self._max_interval = max(max_interval or interval * 10, interval)
+        self._clock = clock
+        self._sleep = sleep
+        # dict.fromkeys drops repeated pairs but keeps the order in which they were given
+        self._tasks = [WatchTask(args, area, forecast_type, interval)
+                       for area, forecast_type in dict.fromkeys((area, forecast_type) for area in areas
+                                                                for forecast_type in forecast_types)]
+
+    @property
+    def tasks(self):
+        return self._tasks
+
+    def _poll(self, task):
+        task.polls += 1
+        try:
+            forecasts, task.validators = self._parser.poll(task.args, task.validators)
+        except Exception as e:
+            # the last good forecasts are kept on screen, the upstream is given more time before the next try
+            task.error = e
+            task.changed_rows = []
+            task.interval = min(task.interval * 2, self._max_interval)
+            return True
+
+        had_error, task.error = task.error is not None, None
+        if forecasts is None:
+            task.changed_rows = []
+            task.interval = min(task.interval * self.backoff, self._max_interval)
+            return had_error
+
+        previous = [forecast.to_dict() for forecast in task.forecasts]
+        task.changed_rows = [row for row, forecast in enumerate(forecasts)
+                             if row >= len(previous) or forecast.to_dict() != previous[row]]
+        task.forecasts = forecasts
+        task.interval = self._interval
+
+        if task.changed_rows or len(forecasts) != len(previous):
+            task.changes += 1
+            return True
+        # the page changed somewhere the forecasts do not come from (eg. an advert)
+        return had_error
+
+    def poll_due(self):
+        """Polls every task that is due and returns the ones whose forecasts or error changed"""
+        now = self._clock()
+        changed = []
+        for task in self._tasks:
+            if task.due <= now:
+                if self._poll(task):
+                    changed.append(task)
+                task.due = self._clock() + task.interval * random.uniform(1.0, 1.1)
+        return changed
+
+    def next_poll(self):
+        """Seconds until the next task is due"""
+        return max(0.0, min(task.due for task in self._tasks) - self._clock())
+
+    def run(self, on_change, polls=None):
+        """Polls forever (or polls times) calling on_change(changed tasks, all tasks) after every round of polls,
+        on_change is also called when nothing changed so a status line can be updated"""
+        rounds = 0
+        while polls is None or rounds < polls:
+            on_change(self.poll_due(), self._tasks)
+            rounds += 1
+            if polls is None or rounds < polls:
+                self._sleep(self.next_poll())
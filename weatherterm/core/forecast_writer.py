@@ -0,0 +1,347 @@
+"""forecast_writer.py has one writer class per OutputFormat. The structured formats (JSON, NDJSON, CSV) write
+records with typed values: temperatures are numbers, humidity is a number (percent), missing values are null
+(an empty field in CSV) and dates are ISO dates. Records are written as they come to one buffered stream, nothing
+is flushed per line, so batch runs producing lots of rows are not slowed down by the terminal or the pipe"""
+
+import csv
+import io
+from abc import ABC, abstractmethod
+import json
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+from .forecast_type import ForecastType
+from .output_format import OutputFormat
+
+# the fields of a record, in the order they are written
+FIELDS = ('area', 'forecast_type', 'forecast_date', 'current_temp', 'high_temp', 'low_temp', 'humidity', 'wind',
+          'description')
+
+_months = {month: number for number, month in enumerate(
+    ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'), start=1)}
+
+
+def _number(value):
+    # temperatures that could not be converted are NaN, NaN is the only value that is not equal to itself
+    if value is None or value != value:
+        return None
+    return value
+
+
+def _percent(value):
+    """'64%' -> 64, None when the page had no humidity (eg. '--')"""
+    try:
+        return int(str(value).strip().rstrip('%'))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _iso_date(value, today):
+    """The 5 day, 10 day and weekend pages only have the day of the week, month and day eg. 'Sat OCT 19'.
+    The year is the one putting the date closest to today, so a forecast made in December for January gets the
+    next year. Values that are not dates are returned as they are"""
+    parts = value.split()
+    try:
+        month, day = _months[parts[-2].upper()[:3]], int(parts[-1])
+    except (IndexError, KeyError, ValueError):
+        return value
+
+    candidates = []
+    for year in (today.year - 1, today.year, today.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            # Feb 29 only exists in leap years
+            pass
+
+    if not candidates:
+        return value
+    return min(candidates, key=lambda candidate: abs(candidate - today)).isoformat()
+
+
+def to_record(forecast, area=None, today=None):
+    """Returns the forecast as a dictionary with the keys in FIELDS and typed values. today is the date the
+    year of 'Sat OCT 19' like dates is guessed from (default: today)"""
+    forecast_date = forecast.forecast_date
+    if isinstance(forecast_date, date):
+        forecast_date = forecast_date.isoformat()
+    elif isinstance(forecast_date, str):
+        forecast_date = _iso_date(forecast_date, today or date.today())
+
+    return {
+        'area': area,
+        'forecast_type': forecast.forecast_type.value,
+        'forecast_date': forecast_date,
+        'current_temp': _number(forecast.current_temp),
+        'high_temp': _number(forecast.high_temp),
+        'low_temp': _number(forecast.low_temp),
+        'humidity': _percent(forecast.humidity),
+        'wind': forecast.wind,
+        'description': forecast.description,
+    }
+
+
+class ForecastWriter(ABC):
+    """Base class of the writers, a writer implements write_one(). write_one() is called with every forecast as
+    soon as it is ready, write() with many of them (any iterable, eg. the generator of parser.iter_run) and flush()
+    after the forecasts of an area. close() must be called at the end, it finishes the document (eg. the closing ]
+    of JSON) and flushes the stream. The stream is not closed, it is usually stdout"""
+
+    def __init__(self, stream=None):
+        self._stream = stream or _buffered_stdout()
+        self._today = date.today()
+
+    def record(self, forecast, area=None):
+        """Returns the forecast as a dictionary with the keys in FIELDS, see to_record"""
+        return to_record(forecast, area, self._today)
+
+    def section(self, title):
+        """A heading before the forecasts of one area and forecast type, only the text output has them"""
+        pass
+
+    @abstractmethod
+    def write_one(self, forecast, area=None):
+        """Writes one forecast of area"""
+
+    def write(self, forecasts, area=None):
+        for forecast in forecasts:
+            self.write_one(forecast, area)
+
+    def flush(self, force=False):
+        """Called at the end of an area. Only the text output is flushed, the structured formats are written when
+        the buffer is full unless force is True (watch mode, where records come in now and then)"""
+        if force:
+            self._stream.flush()
+
+    def close(self):
+        self._stream.flush()
+
+
+class TextWriter(ForecastWriter):
+    """The human readable output, the same as printing every forecast"""
+
+    def section(self, title):
+        self._stream.write(f'== {title}\n')
+
+    def write_one(self, forecast, area=None):
+        self._stream.write(f'{forecast}\n')
+
+    def flush(self, force=False):
+        # somebody is reading this, results of an area are shown as soon as they are ready
+        self._stream.flush()
+
+
+class JsonWriter(ForecastWriter):
+    """One JSON array holding every record. The array is streamed, the records are not kept in memory"""
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        self._started = False
+
+    def write_one(self, forecast, area=None):
+        self._stream.write(',\n' if self._started else '[\n')
+        self._stream.write(self._encoder.encode(self.record(forecast, area)))
+        self._started = True
+
+    def close(self):
+        self._stream.write('\n]\n' if self._started else '[]\n')
+        super().close()
+
+
+class NdjsonWriter(ForecastWriter):
+    """One JSON record per line (newline delimited JSON)"""
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def write_one(self, forecast, area=None):
+        self._stream.write(self._encoder.encode(self.record(forecast, area)))
+        self._stream.write('\n')
+
+
+class CsvWriter(ForecastWriter):
+    """A header row with the FIELDS names then one row per forecast, missing values are empty fields"""
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._writer = csv.writer(self._stream)
+        self._writer.writerow(FIELDS)
+
+    def write_one(self, forecast, area=None):
+        self._writer.writerow(self.record(forecast, area).values())
+
+
+class GridWriter(ForecastWriter):
+    """A table with a row per area (per area and forecast type when there are several types) and a column per
+    day, the high/low temperatures of the day in every cell and the current temperature in today's cell of the
+    today forecast. A 10 day forecast of 50 areas is 50 lines instead of 500 blocks of the text output.
+
+    The columns are known before the first forecast comes in: the days come from forecast_types (the forecast
+    types of the run, default: the 10 day forecast, see days_for) and areas are the areas that are going to be
+    written, the widths are computed from them in one pass. So rows are written as soon as their forecasts are in,
+    nothing is held back to measure it. A label longer than its column is cut, forecasts of days that are not a
+    column are counted and reported under the table.
+
+    Every row is rendered into one string and written to the buffered stream. flush_interval is the flush policy:
+    None flushes after every row, 0 only when the buffer is full and at close(), a number of seconds flushes at
+    most that often, the rows written in between are flushed together by a timer at the latest flush_interval
+    seconds after the first of them. The number of writes to the terminal is then bounded by time, not by rows"""
+
+    # the cells of today's column can hold the current temperature, eg. -12° -8/-15
+    _cell_width = 7
+    _today_width = 12
+    _label_width = 16
+
+    def __init__(self, stream=None, forecast_types=None, areas=None, flush_interval=None):
+        super().__init__(stream)
+        forecast_types = list(forecast_types or [ForecastType.TENDAYS])
+        self._days = [day.isoformat() for day in self.days_for(forecast_types, self._today)]
+        self._columns = {day: column for column, day in enumerate(self._days)}
+        # with several forecast types an area has a row per type, the type is added to the label
+        self._with_type = len(forecast_types) > 1
+        if areas:
+            type_width = max(len(forecast_type.value) + 1 for forecast_type in forecast_types)
+            self._label_width = max(len(area) for area in areas) + (type_width if self._with_type else 0)
+        self._widths = [max(self._today_width if day == self._today.isoformat() else self._cell_width,
+                            len(self._header(day))) for day in self._days]
+        self._flush_interval = flush_interval
+        # the current row: its (area, forecast type) and its cells
+        self._row_key = None
+        self._cells = None
+        self._started = False
+        self.dropped = 0
+        # the timer of the flush_interval policy flushes the stream from its own thread
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._timer = None
+
+    @staticmethod
+    def days_for(forecast_types, today=None):
+        """The days the forecasts of forecast_types can fall on, from today: the 10 day forecast covers 10 days,
+        the weekend forecast goes to the next Sunday"""
+        today = today or date.today()
+        spans = {ForecastType.TODAY: 1, ForecastType.FIVEDAYS: 5, ForecastType.TENDAYS: 10,
+                 ForecastType.WEEKEND: 7 - today.weekday()}
+        return [today + timedelta(days=day) for day in range(max(spans[forecast_type]
+                                                                 for forecast_type in forecast_types))]
+
+    @staticmethod
+    def _header(day):
+        return date.fromisoformat(day).strftime('%a %d')
+
+    @staticmethod
+    def _temp(value):
+        return '--' if value is None else str(round(value))
+
+    def _fit(self, text, width):
+        return text[:width - 1] + '\u2026' if len(text) > width else text.ljust(width)
+
+    def _header_line(self):
+        cells = [' ' * self._label_width] + [self._header(day).rjust(width)
+                                             for day, width in zip(self._days, self._widths)]
+        return '  '.join(cells).rstrip() + '\n'
+
+    def write_one(self, forecast, area=None):
+        key = (area, forecast.forecast_type)
+        if key != self._row_key:
+            self._end_row()
+            self._row_key = key
+            self._cells = [''] * len(self._days)
+
+        record = self.record(forecast, area)
+        column = self._columns.get(record['forecast_date'])
+        if column is None:
+            self.dropped += 1
+            return
+
+        cell = f'{self._temp(record["high_temp"])}/{self._temp(record["low_temp"])}'
+        if forecast.forecast_type == ForecastType.TODAY:
+            cell = f'{self._temp(record["current_temp"])}\xb0 {cell}'
+        self._cells[column] = cell
+
+    def _end_row(self):
+        if self._row_key is None:
+            return
+        area, forecast_type = self._row_key
+        label = f'{area or ""} {forecast_type.value}' if self._with_type else area or ''
+        line = '  '.join([self._fit(label, self._label_width)] +
+                         [cell.rjust(width)[:width] for cell, width in zip(self._cells, self._widths)])
+        self._row_key = self._cells = None
+
+        with self._lock:
+            if not self._started:
+                self._stream.write(self._header_line())
+                self._started = True
+            self._stream.write(line.rstrip() + '\n')
+        self._apply_policy()
+
+    def _apply_policy(self):
+        if self._flush_interval == 0:
+            return
+        with self._lock:
+            waited = time.monotonic() - self._last_flush
+            if self._flush_interval is None or waited >= self._flush_interval:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._flush_interval - waited, self._flush_now)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        # called with the lock held
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._stream.flush()
+        self._last_flush = time.monotonic()
+
+    def _flush_now(self):
+        with self._lock:
+            self._flush()
+
+    def flush(self, force=False):
+        # the end of an area is the end of its row
+        self._end_row()
+        if force:
+            self._flush_now()
+
+    def close(self):
+        self._end_row()
+        if self.dropped:
+            with self._lock:
+                forecasts = 'forecast' if self.dropped == 1 else 'forecasts'
+                self._stream.write(f'({self.dropped} {forecasts} of other days not shown)\n')
+        self._flush_now()
+
+
+_writers = {
+    OutputFormat.TEXT: TextWriter,
+    OutputFormat.JSON: JsonWriter,
+    OutputFormat.NDJSON: NdjsonWriter,
+    OutputFormat.CSV: CsvWriter,
+    OutputFormat.GRID: GridWriter,
+}
+
+
+def _buffered_stdout():
+    # a text stream over stdout's file descriptor with a large buffer and no line buffering, print() on a
+    # terminal flushes every line. newline='' leaves the line endings alone, the csv module writes its own
+    sys.stdout.flush()
+    try:
+        fileno = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        # stdout was replaced, eg. by a StringIO
+        return sys.stdout
+    return open(fileno, 'w', buffering=1 << 16, encoding='utf-8', newline='', closefd=False)
+
+
+def create_writer(output_format=OutputFormat.TEXT, stream=None, **options):
+    """Returns the writer of output_format writing to stream (default: a buffered stdout). options are handed to
+    the writer class, eg. the days, labels and flush_interval of GridWriter"""
+    return _writers[output_format](stream, **options)
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+
+from .forecast_type import ForecastType
+from .forecast_writer import to_record
+from .unit import Unit
+from .unit_converter import UnitConverter
+
+
+class HistoryStore:
+    """A persistent history of every forecast weatherterm has produced, in a SQLite database shared by every
+    weatherterm process. Every row is one Forecast tagged with the area, the parser, the forecast type and the time
+    it was fetched. Temperatures are stored in Fahrenheit whatever unit they were shown in, so rows of runs with
+    different units can be compared.
+
+    add() only keeps the rows in memory, they are written in one transaction when batch_size rows are waiting
+    and by flush() or close(), so a normal run pays for a single commit at the end"""
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS forecasts (
+            fetched_at REAL NOT NULL,
+            fetch_day TEXT NOT NULL,
+            area TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            forecast_type TEXT NOT NULL,
+            forecast_date TEXT,
+            current_temp REAL,
+            high_temp REAL,
+            low_temp REAL,
+            humidity INTEGER,
+            wind TEXT,
+            description TEXT
+        );
+        CREATE INDEX IF NOT EXISTS forecasts_area_date ON forecasts (area, forecast_date, forecast_type);
+        CREATE INDEX IF NOT EXISTS forecasts_area_fetched ON forecasts (area, fetched_at);
+    '''
+
+    _columns = ('fetched_at', 'fetch_day', 'area', 'parser', 'forecast_type', 'forecast_date', 'current_temp',
+                'high_temp', 'low_temp', 'humidity', 'wind', 'description')
+
+    # the rows of a run are written a moment after their page was fetched, see replace
+    replace_window = 300
+
+    def __init__(self, path=None, batch_size=1000):
+        self._path = path or self.default_path()
+        self._batch_size = batch_size
+        self._pending = []
+        # (area, parser, forecast type, from, to) of the rows replace() removes before writing the pending rows
+        self._deletes = []
+        self._connection = None
+        # turns the temperatures of runs made with -u celsius back into Fahrenheit
+        self._to_fahrenheit = UnitConverter(Unit.CELSIUS, Unit.FAHRENHEIT)
+
+    @staticmethod
+    def default_path():
+        """$XDG_DATA_HOME/weatherterm/history.sqlite3, or ~/.local/share/weatherterm/history.sqlite3 when
+        XDG_DATA_HOME is not set. The history is data, it does not go in the cache directory"""
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        return os.path.join(base, 'weatherterm', 'history.sqlite3')
+
+    @property
+    def path(self):
+        return self._path
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # other weatherterm processes may be writing at the same time, wait for their transaction to end
+            self._connection = sqlite3.connect(self._path, timeout=30)
+            self._connection.row_factory = sqlite3.Row
+            # with the write-ahead log readers (weatherterm history) do not block writers and the other way round
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(self._schema)
+        return self._connection
+
+    def add(self, forecasts, area, parser, unit=None, fetched_at=None):
+        """Queues the forecasts of one area for writing. unit is the unit the temperatures are in (None is the
+        parsers' default, Fahrenheit) and fetched_at a Unix time (default: now)"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        fetch_day = datetime.fromtimestamp(fetched_at).date()
+        celsius = unit == Unit.CELSIUS
+
+        for forecast in forecasts:
+            record = to_record(forecast, area, fetch_day)
+            temps = (record['current_temp'], record['high_temp'], record['low_temp'])
+            if celsius:
+                temps = [None if value != value else round(value, 2)
+                         for value in self._to_fahrenheit.convert_many(temps, use_numpy=False)]
+
+            self._pending.append((fetched_at, fetch_day.isoformat(), area, parser, record['forecast_type'],
+                                  record['forecast_date'], *temps, record['humidity'], record['wind'],
+                                  record['description']))
+
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def replace(self, forecasts, area, parser, forecast_type, fetched_at, until=None, unit=None):
+        """Like add, for forecasts parsed again from a page fetched at fetched_at (see weatherterm reparse): the
+        rows written for the same area, parser and forecast type from fetched_at until until (excluded) are removed
+        first. The run that fetched the page wrote its rows a moment after the fetch, until defaults to
+        replace_window seconds later and should be the time of the next fetch of the page when there is one"""
+        until = fetched_at + self.replace_window if until is None else min(until, fetched_at + self.replace_window)
+        self._deletes.append((area, parser, forecast_type.value, fetched_at, until))
+        self.add(forecasts, area, parser, unit, fetched_at)
+
+    def flush(self):
+        """Writes the queued rows in one transaction"""
+        if not self._pending and not self._deletes:
+            return
+
+        connection = self._connect()
+        with connection:
+            if self._deletes:
+                connection.executemany('DELETE FROM forecasts WHERE area = ? AND parser = ? AND forecast_type = ? '
+                                       'AND fetched_at >= ? AND fetched_at < ?', self._deletes)
+            connection.executemany(f'INSERT INTO forecasts ({", ".join(self._columns)}) '
+                                   f'VALUES ({", ".join("?" * len(self._columns))})', self._pending)
+        self._pending = []
+        self._deletes = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _query(self, sql, parameters):
+        return [dict(row) for row in self._connect().execute(sql, parameters)]
+
+    @staticmethod
+    def _date_range(start, end):
+        # ISO dates compare like strings, the open ends take the smallest and the largest possible date
+        return (start or date.min).isoformat(), (end or date.max).isoformat()
+
+    def range(self, area, start=None, end=None, forecast_type=None, latest=False):
+        """Returns the rows for area with a forecast date between start and end (datetime.date, both included),
+        ordered by date. With latest=True only the most recent fetch of every date and forecast type is
+        returned, instead of every forecast ever made for it"""
+        conditions = 'area = ? AND forecast_date BETWEEN ? AND ?'
+        parameters = [area, *self._date_range(start, end)]
+        if forecast_type is not None:
+            conditions += ' AND forecast_type = ?'
+            parameters.append(forecast_type.value)
+
+        columns = ', '.join(column for column in self._columns if column != 'fetched_at')
+        if latest:
+            # SQLite takes the other columns of a MAX() aggregate from the row holding the maximum
+            sql = (f'SELECT MAX(fetched_at) AS fetched_at, {columns} FROM forecasts WHERE {conditions} '
+                   f'GROUP BY forecast_date, forecast_type ORDER BY forecast_date, forecast_type')
+        else:
+            sql = f'SELECT fetched_at, {columns} FROM forecasts WHERE {conditions} ORDER BY forecast_date, fetched_at'
+        return self._query(sql, parameters)
+
+    def trend(self, area, start=None, end=None):
+        """Returns one row per day with the lowest, highest and average current temperature and the average
+        humidity seen by the today forecasts of area, ordered by date"""
+        sql = ('SELECT forecast_date AS day, COUNT(*) AS samples, MIN(current_temp) AS min_temp, '
+               'MAX(current_temp) AS max_temp, AVG(current_temp) AS avg_temp, AVG(humidity) AS avg_humidity '
+               'FROM forecasts WHERE area = ? AND forecast_date BETWEEN ? AND ? AND forecast_type = ? '
+               'GROUP BY forecast_date ORDER BY forecast_date')
+        return self._query(sql, [area, *self._date_range(start, end), ForecastType.TODAY.value])
+
+    def compare(self, area, start=None, end=None):
+        """Forecast against actual: for every day that has a today forecast (the actual high and low) returns the
+        high and low that the longer range forecasts gave for it, one row per lead time in days. For every day
+        and lead time the most recent fetch wins"""
+        sql = '''
+            WITH actual AS (
+                SELECT forecast_date, high_temp, low_temp, MAX(fetched_at)
+                FROM forecasts
+                WHERE area = :area AND forecast_type = :today AND forecast_date BETWEEN :start AND :end
+                GROUP BY forecast_date
+            ), predicted AS (
+                SELECT forecast_date, CAST(julianday(forecast_date) - julianday(fetch_day) AS INTEGER) AS lead_days,
+                       high_temp, low_temp, MAX(fetched_at)
+                FROM forecasts
+                WHERE area = :area AND forecast_type != :today AND forecast_date BETWEEN :start AND :end
+                      AND fetch_day < forecast_date
+                GROUP BY forecast_date, lead_days
+            )
+            SELECT predicted.forecast_date AS day, lead_days,
+                   predicted.high_temp AS forecast_high, actual.high_temp AS actual_high,
+                   predicted.low_temp AS forecast_low, actual.low_temp AS actual_low
+            FROM predicted JOIN actual ON actual.forecast_date = predicted.forecast_date
+            ORDER BY day, lead_days
+        '''
+        start, end = self._date_range(start, end)
+        return self._query(sql, {'area': area, 'today': ForecastType.TODAY.value, 'start': start, 'end': end})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
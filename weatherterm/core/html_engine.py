@@ -0,0 +1,13 @@
+from .base_enum import BaseEnum
+from enum import auto, unique
+
+
+@unique
+class HtmlEngine(BaseEnum):
+    """HtmlEngine Enum class lists the ways a page can be turned into a BeautifulSoup tree.
+    FULL builds the tree of the whole page with html.parser (the original behaviour), STRAINED uses a SoupStrainer
+    so html.parser only builds the container the forecast needs, LXML does the same with the much faster lxml
+    tree builder (lxml has to be installed)"""
+    FULL = auto()
+    STRAINED = auto()
+    LXML = auto()
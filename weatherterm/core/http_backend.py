@@ -0,0 +1,74 @@
+from .fetch_error import FetchError
+from .response import Response
+
+
+class HttpBackend:
+    """Fetches pages with a pooled keep-alive HTTP client. A single HttpBackend keeps its connections open
+    between fetches, so only the first request to a host pays for the TCP (and TLS) handshake.
+    It is safe to share one instance between threads"""
+
+    # conditional requests (ETag/Last-Modified) can be answered with 304 by a plain HTTP server
+    supports_conditional = True
+    # fetch can be called from many threads at once and takes a timeout, see FetchScheduler
+    thread_safe = True
+    supports_timeout = True
+
+    def __init__(self, timeout=10.0, connect_timeout=5.0, maxsize=10):
+        # urllib3 is imported here instead of at the top of the module so that importing weatherterm
+        # (eg. for --help) does not pay for it
+        import urllib3
+
+        self._timeout = urllib3.Timeout(connect=connect_timeout, read=timeout)
+        self._connect_timeout = connect_timeout
+        self._timeout_class = urllib3.Timeout
+        # make_headers builds the keep-alive and gzip/deflate headers, urllib3 then decodes
+        # compressed bodies for us since decode_content is on by default
+        headers = urllib3.make_headers(keep_alive=True, accept_encoding=True,
+                                       user_agent='Mozilla/5.0 (X11; Linux x86_64) weatherterm/1.0')
+        # retries are switched off, a failed fetch is reported straight away with its status code
+        self._pool = urllib3.PoolManager(num_pools=4, maxsize=maxsize, block=False,
+                                         headers=headers, retries=False, timeout=self._timeout)
+        self._errors = (urllib3.exceptions.HTTPError,)
+
+    def fetch(self, url, headers=None, timeout=None):
+        """Performs a GET request on url and returns a Response. headers are extra request headers,
+        eg. If-None-Match for conditional requests. timeout (seconds) replaces the backend's own timeouts for
+        this request"""
+        request_timeout = self._timeout
+        if timeout is not None:
+            request_timeout = self._timeout_class(connect=min(self._connect_timeout, timeout), read=timeout)
+
+        try:
+            # preload_content is off so that the compressed size can be read before the body is decoded.
+            # urllib3 replaces the headers of the pool with the ones of the request, the extra headers are added
+            # to them so conditional requests keep gzip, keep-alive and the user agent
+            result = self._pool.request('GET', url, headers={**self._pool.headers, **headers} if headers else None,
+                                        redirect=True, preload_content=False, timeout=request_timeout)
+            data = result.read(decode_content=True)
+            size = result.tell()  # bytes read from the socket
+            result.release_conn()
+        except self._errors as e:
+            raise FetchError(f'Could not connect to {url}: {e}', url=url) from e
+
+        if result.status == 404:
+            raise FetchError('Could not find the area you were searching for', url=url, status=404)
+
+        if result.status >= 400:
+            raise FetchError(f'Request to {url} failed with status {result.status}', url=url, status=result.status)
+
+        return Response(url, result.status, self._decode(result, data), dict(result.headers), size=size)
+
+    def _decode(self, result, data):
+        # the charset is taken from the Content-Type header, weather websites are utf-8 when they do not say
+        content_type = result.headers.get('Content-Type', '')
+        charset = 'utf-8'
+
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                charset = value.strip('"\'')
+
+        return data.decode(charset, errors='replace')
+
+    def close(self):
+        self._pool.clear()
@@ -0,0 +1,26 @@
+class Location:
+    """A place of the location index with the area code the weather websites know it by"""
+
+    __slots__ = ('code', 'name', 'region', 'country', 'postal_code', 'latitude', 'longitude')
+
+    def __init__(self, code, name, region='', country='', postal_code='', latitude=None, longitude=None):
+        self.code = code
+        self.name = name
+        self.region = region
+        self.country = country
+        self.postal_code = postal_code
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, Location) and self.code == other.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __str__(self):
+        place = ', '.join(part for part in (self.name, self.region, self.country) if part)
+        return f'{self.code}  {place}'
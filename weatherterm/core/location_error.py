@@ -0,0 +1,8 @@
+class LocationError(Exception):
+    """Raised by LocationIndex.resolve when a place name does not match exactly one location.
+    candidates holds the locations that came close (the ambiguous ones or suggestions), it may be empty"""
+
+    def __init__(self, message, query=None, candidates=()):
+        super().__init__(message)
+        self.query = query
+        self.candidates = list(candidates)
@@ -0,0 +1,312 @@
+"""location_index.py resolves place names, postal codes and coordinates to area codes without going online.
+
+An index is a directory of three text files, sorted so that they can be binary searched in place:
+
+  places.tsv  code, name, region, country, postal code, latitude, longitude   sorted by code
+  names.tsv   search key, code                                               sorted by key (as UTF-8 bytes)
+  coords.tsv  latitude key, longitude, code                                  sorted by latitude
+
+The files are memory-mapped when first used: nothing is read up front and only the pages a lookup touches end up
+in memory, so a gazetteer of millions of places costs little more than a small one. Build an index from a
+gazetteer (a TSV file with the columns of places.tsv) with LocationIndex.build or weatherterm lookup --build"""
+
+import math
+import mmap
+import os
+import re
+import unicodedata
+
+from .location import Location
+from .location_error import LocationError
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'locations')
+
+_files = ('places.tsv', 'names.tsv', 'coords.tsv')
+
+# weather.com area codes are upper case letters and digits, eg. USNY0996. A value made only of digits is a postal
+# code and anything else (lower case letters, spaces, commas...) is a place name or coordinates
+_area_code_regex = re.compile(r'^(?=.*[A-Z])[A-Z0-9]+$')
+_coordinates_regex = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[, ]\s*(-?\d+(?:\.\d+)?)\s*$')
+_separators_regex = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """The form names are searched by: no accents, lower case, punctuation turned into single spaces.
+    'Saint-Étienne, FR' -> 'saint etienne fr'"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _separators_regex.sub(' ', text.casefold()).strip()
+
+
+def _latitude_key(latitude):
+    # fixed width and never negative so the keys sort like the latitudes
+    return f'{round((latitude + 90) * 10000):07d}'
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    """Great circle distance (haversine)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 as soon as it is known to be more than limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for row, char_a in enumerate(a, start=1):
+        current = [row]
+        for column, char_b in enumerate(b, start=1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1,
+                               previous[column - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _SortedLines:
+    """A memory-mapped text file of sorted lines, the key of a line is what comes before its first tab"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # an empty file can not be mapped
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def lower_bound(self, key):
+        """Offset of the first line whose key is >= key. lo and hi are always line starts"""
+        data = self._data
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b'\n', lo, mid) + 1 or lo
+            end = data.find(b'\t', start)
+            if data[start:end] < key:
+                lo = data.find(b'\n', end) + 1 or len(data)
+            else:
+                hi = start
+        return lo
+
+    def block(self, prefix):
+        """The lines whose key starts with prefix, as one bytes object"""
+        start = self.lower_bound(prefix)
+        # the first key after the block starts with prefix with its last byte one higher
+        end = self.lower_bound(prefix[:-1] + bytes([prefix[-1] + 1])) if prefix and prefix[-1] < 0xff \
+            else len(self._data)
+        return self._data[start:end]
+
+    def lines(self, offset, end=None):
+        """Yields the lines (as lists of fields) from offset, up to offset end"""
+        data = self._data
+        end = len(data) if end is None else end
+        while offset < end:
+            newline = data.find(b'\n', offset)
+            if newline < 0:
+                newline = len(data)
+            yield data[offset:newline].decode('utf-8').split('\t')
+            offset = newline + 1
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class LocationIndex:
+    """Looks up locations in an index directory (see the top of this module), by default the one bundled in
+    weatherterm/data/locations. The files are only opened by the first lookup"""
+
+    def __init__(self, directory=None):
+        self._directory = directory or os.environ.get('WEATHERTERM_LOCATIONS') or DEFAULT_DIRECTORY
+        self._files = None
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @staticmethod
+    def is_area_code(value):
+        """True when value already is an area code and does not need to be looked up"""
+        return bool(_area_code_regex.match(value))
+
+    def _open(self):
+        if self._files is None:
+            self._files = [_SortedLines(os.path.join(self._directory, name)) for name in _files]
+        return self._files
+
+    def get(self, code):
+        """The Location of an area code, None when the index does not have it"""
+        places = self._open()[0]
+        key = code.encode('utf-8')
+        for fields in places.lines(places.lower_bound(key)):
+            # the first line at or after the code is the only one that can be it
+            return self._location(fields) if fields[0] == code else None
+        return None
+
+    @staticmethod
+    def _location(fields):
+        code, name, region, country, postal_code, latitude, longitude = fields
+        return Location(code, name, region, country, postal_code,
+                        float(latitude) if latitude else None, float(longitude) if longitude else None)
+
+    def _codes(self, prefix, exact=False):
+        """Yields the codes of the keys starting with prefix (or equal to it when exact is True) in key order"""
+        names = self._open()[1]
+        key = prefix.encode('utf-8')
+        for fields in names.lines(names.lower_bound(key)):
+            if fields[0] == prefix or (not exact and fields[0].startswith(prefix)):
+                yield fields[1]
+            else:
+                return
+
+    def _unique(self, codes, limit):
+        # codes can be a generator over a big part of the index, it is only read until limit locations are found
+        locations = []
+        seen = set()
+        for code in codes:
+            if code in seen:
+                continue
+            seen.add(code)
+            location = self.get(code)
+            if location is not None:
+                locations.append(location)
+                if len(locations) == limit:
+                    break
+        return locations
+
+    def exact(self, query, limit=10):
+        """Locations whose name, 'name region' or postal code is query, ignoring case, accents and punctuation"""
+        return self._unique(self._codes(normalize(query), exact=True), limit)
+
+    def prefix(self, query, limit=10):
+        """Locations with a name, 'name region' or postal code starting with query"""
+        query = normalize(query)
+        return self._unique(self._codes(query), limit) if query else []
+
+    def fuzzy(self, query, limit=10, max_distance=None):
+        """Locations whose name is at most max_distance typos (insertions, deletions, substitutions) away from
+        query, closest first. Only the names sharing the first two letters of query are compared, that keeps the
+        search to a small part of the index: the names sharing the first three letters are compared first, then the
+        ones sharing the first two, then the first one, until one of them has a close enough name"""
+        query = normalize(query)
+        if not query:
+            return []
+        if max_distance is None:
+            max_distance = 1 if len(query) <= 5 else 2
+
+        names = self._open()[1]
+        # normalized keys are ASCII, the comparisons are done on the raw bytes of the mapped file
+        target = query.encode('ascii')
+        bigrams = {target[i:i + 2] for i in range(len(target) - 1)}
+        matches = {}
+        for block in dict.fromkeys((target[:3], target[:2], target[:1])):
+            for line in names.block(block).split(b'\n'):
+                key, _, code = line.partition(b'\t')
+                # cheap filters first: the length can only change by one per typo, and one typo changes at most
+                # two of the bigrams of the query
+                if abs(len(key) - len(target)) > max_distance:
+                    continue
+                if sum(bigram not in key for bigram in bigrams) > 2 * max_distance:
+                    continue
+                distance = _edit_distance(target, key, max_distance)
+                if distance <= max_distance and distance < matches.get(code, max_distance + 1):
+                    matches[code] = distance
+            # a wider block is only searched when the narrower one had nothing close enough
+            if matches:
+                break
+
+        ordered = sorted(matches, key=lambda code: matches[code])
+        return self._unique((code.decode('utf-8') for code in ordered), limit)
+
+    def nearest(self, latitude, longitude, limit=1, radius_km=100.0):
+        """The locations closest to the coordinates, within radius_km"""
+        coords = self._open()[2]
+        # one degree of latitude is ~111 km, only the band of latitudes within the radius is looked at
+        band = radius_km / 111.0
+        start = coords.lower_bound(_latitude_key(max(-90.0, latitude - band)).encode('ascii'))
+        end = coords.lower_bound(_latitude_key(min(90.0, latitude + band)).encode('ascii') + b'\x7f')
+
+        # the degrees of longitude within the radius grow towards the poles
+        longitude_band = band / max(math.cos(math.radians(min(89.0, abs(latitude) + band))), 0.01)
+
+        candidates = []
+        for key, candidate_longitude, code in coords.lines(start, end):
+            candidate_longitude = float(candidate_longitude)
+            if abs((candidate_longitude - longitude + 180) % 360 - 180) > longitude_band:
+                continue
+            distance = _distance_km(latitude, longitude, int(key) / 10000 - 90, candidate_longitude)
+            if distance <= radius_km:
+                candidates.append((distance, code))
+        return [self.get(code) for _, code in sorted(candidates)[:limit]]
+
+    def search(self, query, limit=10):
+        """What weatherterm lookup shows: the nearest locations for coordinates ('40.71,-74.01'), otherwise the
+        exact matches, then the prefix matches and when there is none of those the fuzzy matches"""
+        match = _coordinates_regex.match(query)
+        if match:
+            return self.nearest(float(match.group(1)), float(match.group(2)), limit)
+
+        locations = self.exact(query, limit)
+        if len(locations) < limit:
+            locations += [location for location in self.prefix(query, limit)
+                          if location not in locations][:limit - len(locations)]
+        return locations or self.fuzzy(query, limit)
+
+    def resolve(self, query):
+        """The area code of query (a place name, a postal code or coordinates). Raises LocationError when nothing
+        or more than one location matches, with the close matches as candidates"""
+        match = _coordinates_regex.match(query)
+        if match:
+            locations = self.nearest(float(match.group(1)), float(match.group(2)))
+            if not locations:
+                raise LocationError(f'No known location near {query}', query)
+            return locations[0].code
+
+        locations = self.exact(query)
+        if len(locations) == 1:
+            return locations[0].code
+        if len(locations) > 1:
+            raise LocationError(f'{query!r} matches several locations, add the region (eg. "Portland, OR") or use '
+                                f'an area code', query, locations)
+        raise LocationError(f'Unknown location {query!r}', query, self.prefix(query, 5) or self.fuzzy(query, 5))
+
+    def close(self):
+        if self._files is not None:
+            for file in self._files:
+                file.close()
+            self._files = None
+
+    @staticmethod
+    def build(gazetteer, directory):
+        """Builds an index in directory from a gazetteer: a TSV file with the columns code, name, region, country,
+        postal code, latitude and longitude. Empty lines and lines starting with # are skipped.
+        Returns the number of locations"""
+        places = {}
+        with open(gazetteer, encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = (line.split('\t') + [''] * 7)[:7]
+                places[fields[0]] = [field.strip().replace('\t', ' ') for field in fields]
+
+        names = set()
+        coords = []
+        for code, name, region, country, postal_code, latitude, longitude in places.values():
+            for key in (normalize(name), normalize(f'{name} {region}'), normalize(postal_code)):
+                if key:
+                    names.add((key.encode('utf-8'), code))
+            if latitude and longitude:
+                coords.append((_latitude_key(float(latitude)), float(longitude), code))
+
+        os.makedirs(directory, exist_ok=True)
+        # the lines are sorted as UTF-8 bytes, the order the binary search compares them in
+        with open(os.path.join(directory, 'places.tsv'), 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines('\t'.join(places[code]) + '\n' for code in sorted(places, key=lambda c: c.encode('utf-8')))
+        with open(os.path.join(directory, 'names.tsv'), 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines(f'{key.decode("utf-8")}\t{code}\n' for key, code in sorted(names))
+        with open(os.path.join(directory, 'coords.tsv'), 'w', encoding='ascii', newline='\n') as f:
+            f.writelines(f'{key}\t{longitude}\t{code}\n' for key, longitude, code in sorted(coords))
+        return len(places)
@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class MemoryCache:
+    """A thread safe in-memory cache with a time to live per entry, used by the forecast server to answer
+    repeated queries without parsing the page again. The oldest entries are dropped once max_entries is reached"""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        # dicts keep insertion order, so the first key is always the oldest entry
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            return value
+
+    def put(self, key, value, ttl=None):
+        expires = time.monotonic() + (self._ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+
+            while len(self._entries) > self._max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,180 @@
+import os
+import sys
+import threading
+import tracemalloc
+
+# the stage an allocation is counted under, from the weatherterm module that made it. The innermost frame of the
+# allocation that is in weatherterm decides: a bs4 object made for page_parser is soup, a str made by http.client
+# for the HTTP backend is fetch
+_module_stages = {
+    'http_backend': 'fetch',
+    'browser_backend': 'fetch',
+    'browser_pool': 'fetch',
+    'fetch_scheduler': 'fetch',
+    'request': 'fetch',
+    'response': 'fetch',
+    'response_cache': 'cache',
+    'memory_cache': 'cache',
+    'page_parser': 'soup',
+    'extraction_plan': 'extract',
+    'field': 'extract',
+    'forecast': 'prepare',
+    'unit_converter': 'prepare',
+    'forecast_batch': 'prepare',
+    'forecast_writer': 'render',
+    'history_store': 'history',
+    'page_archive': 'record',
+    'batch_runner': 'batch',
+    'batch_result': 'batch',
+    'parse_pool': 'parse pool',
+    'provider_fanout': 'fanout',
+}
+# the stage of an allocation made by a library, for the allocations with no weatherterm frame in their traceback.
+# Only the most recent frame is kept by default, every frame more makes the tracing a lot slower
+_library_stages = {
+    'bs4': 'soup',
+    'soupsieve': 'soup',
+    'html': 'soup',
+    'lxml': 'soup',
+    'http': 'fetch',
+    'urllib': 'fetch',
+    'socket': 'fetch',
+    'ssl': 'fetch',
+    'selectors': 'fetch',
+    'email': 'fetch',
+    'sqlite3': 'history',
+    'json': 'render',
+    'csv': 'render',
+    'pickle': 'parse pool',
+    'multiprocessing': 'parse pool',
+    'concurrent': 'batch',
+}
+
+_package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_parsers_dir = os.path.join(_package_dir, 'parsers')
+# the standard library and site-packages directories, the first directory under one of them is the library
+_library_dirs = sorted({os.path.dirname(os.__file__)} | {path for path in sys.path if path.endswith('-packages')},
+                       key=len, reverse=True)
+
+
+def _library_stage(filename):
+    if filename.startswith('<frozen importlib'):
+        return 'import'
+    for directory in _library_dirs:
+        if filename.startswith(directory + os.sep):
+            library = filename[len(directory) + 1:].split(os.sep, 1)[0]
+            return _library_stages.get(os.path.splitext(library)[0])
+    return None
+
+
+class MemoryReport:
+    """--memory-report: traces the memory allocated by Python with tracemalloc while weatherterm runs and reports
+    the peak, and what was holding the memory at the peak split by stage (fetch, soup, extract, prepare, render...).
+
+    A background thread samples the traced memory every interval seconds. Every time it is growth times higher
+    than at the last look at the allocations, the allocations are looked at again (a tracemalloc snapshot, which
+    is slow). The peak does not count the memory of the snapshots themselves. Tracing makes everything a few
+    times slower, it is only meant to find where the memory goes. Every allocation keeps frames frames of its
+    traceback: with the default of 1 an allocation made by a library (bs4 building the soup) is counted under the
+    stage of the library, more frames find the weatherterm module that called it but parsing gets ten times slower
+    again"""
+
+    def __init__(self, frames=1, interval=0.05, growth=1.1):
+        self._frames = frames
+        self._interval = interval
+        self._growth = growth
+        self._stop = threading.Event()
+        self._thread = None
+        self._stages_cache = {}
+        self.peak = 0
+        self.current = 0
+        # what was allocated at the highest point that was looked at: stage -> [bytes, blocks], and the source
+        # lines with the most memory
+        self.stages = {}
+        self.lines = []
+        self._snapshot_size = 0
+
+    def start(self):
+        tracemalloc.start(self._frames)
+        self._thread = threading.Thread(target=self._run, name='memory-report', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def _sample(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        if current > self._snapshot_size * self._growth:
+            self._snapshot_size = current
+            self._look(tracemalloc.take_snapshot())
+        # the peak of the snapshot that was just taken is not weatherterm's
+        tracemalloc.reset_peak()
+
+    def _stage(self, traceback):
+        stage = self._stages_cache.get(traceback)
+        if stage is None:
+            # the frames go from the oldest to the most recent one. The most recent weatherterm frame decides, the
+            # library of the most recent frame when there is none
+            for frame in reversed(traceback):
+                filename = frame.filename
+                if filename.startswith(_parsers_dir):
+                    stage = 'parse'
+                    break
+                if filename.startswith(_package_dir):
+                    stage = _module_stages.get(os.path.splitext(os.path.basename(filename))[0], 'other')
+                    break
+                if stage is None:
+                    stage = _library_stage(filename)
+            stage = stage or 'other'
+            self._stages_cache[traceback] = stage
+        return stage
+
+    def _look(self, snapshot):
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                           tracemalloc.Filter(False, __file__)])
+        stages = {}
+        for trace in snapshot.traces:
+            entry = stages.setdefault(self._stage(trace.traceback), [0, 0])
+            entry[0] += trace.size
+            entry[1] += 1
+        self.stages = stages
+        self.lines = [(f'{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}', statistic.size)
+                      for statistic in snapshot.statistics('lineno')[:5]]
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.current = tracemalloc.get_traced_memory()[0]
+        self._sample()
+        tracemalloc.stop()
+        self._stages_cache.clear()
+
+    @staticmethod
+    def max_rss():
+        """The most memory the process ever had (resident set size) in bytes, None where it is not known"""
+        try:
+            import resource
+        except ImportError:
+            return None
+        # kilobytes on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+    def format(self):
+        megabyte = 1024 * 1024
+        rss = self.max_rss()
+        lines = [f'memory: peak {self.peak / megabyte:.1f} MB traced, {self.current / megabyte:.1f} MB at the end'
+                 + (f', max RSS {rss / megabyte:.1f} MB' if rss is not None else '')]
+        lines.append(f'{"stage":<16}{"MB at peak":>11}{"blocks":>10}')
+        for stage, (size, blocks) in sorted(self.stages.items(), key=lambda item: -item[1][0]):
+            lines.append(f'{stage:<16}{size / megabyte:>11.2f}{blocks:>10}')
+        if self.lines:
+            lines.append('largest at peak:')
+            lines.extend(f'  {line} {size / megabyte:.2f} MB' for line, size in self.lines)
+        return '\n'.join(lines)
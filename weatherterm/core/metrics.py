@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+
+
+class _Stage:
+    """Context manager timing one stage, returned by Metrics.stage"""
+
+    __slots__ = ('_metrics', '_key', '_start')
+
+    def __init__(self, metrics, key):
+        self._metrics = metrics
+        self._key = key
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics._record(self._key, time.perf_counter() - self._start)
+
+
+class _NullStage:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullMetrics:
+    """Metrics that records nothing, used when --profile and --metrics are not given. stage() hands back the same
+    do nothing context manager every time, so instrumented code costs a method call and a with block"""
+
+    enabled = False
+    _null_stage = _NullStage()
+
+    def stage(self, name, area=None, forecast=None):
+        return self._null_stage
+
+    def add(self, name, seconds, area=None, forecast=None):
+        pass
+
+    def count(self, name, value, area=None, forecast=None):
+        pass
+
+    def timed(self, iterable, name, area=None, forecast=None):
+        return iterable
+
+
+class Metrics:
+    """Collects the time spent in every stage of a run (backend start up, fetch, soup, extract, prepare, render)
+    and counters like bytes fetched and DOM nodes parsed, per area and forecast type. It is thread safe, one
+    Metrics object can be shared by all the parsers of a batch"""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stage, area, forecast) -> [calls, seconds]
+        self._stages = {}
+        # (counter, area, forecast) -> value
+        self._counters = {}
+        self._local = threading.local()
+
+    def stage(self, name, area=None, forecast=None):
+        """with metrics.stage('fetch', area, forecast): ... adds the time of the block to the stage"""
+        return _Stage(self, (name, area, forecast))
+
+    def timed(self, iterable, name, area=None, forecast=None):
+        """Generator yielding the items of iterable, for the lazy stages. Only the time spent producing the items
+        is added to the stage, not the time the caller spends on them, and the whole iteration counts as one call.
+        When iterable pulls its items from another timed iterable (prepare from extract) the time of the inner
+        stage is not counted twice"""
+        iterator = iter(iterable)
+        local = self._local
+        seconds = 0.0
+        try:
+            while True:
+                # local.nested collects the time of the timed iterables used while producing this item
+                outer = getattr(local, 'nested', 0.0)
+                local.nested = 0.0
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed = time.perf_counter() - start
+                    seconds += elapsed - local.nested
+                    local.nested = outer + elapsed
+                yield item
+        finally:
+            # also recorded when the caller stops early
+            self._record((name, area, forecast), seconds)
+
+    def _record(self, key, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add(self, name, seconds, area=None, forecast=None):
+        """Adds seconds to the stage, for times that were not measured with a with block (eg. a parser of
+        ProviderFanout still running after the query returned)"""
+        self._record((name, area, forecast), seconds)
+
+    def count(self, name, value, area=None, forecast=None):
+        key = (name, area, forecast)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'stages': [{'stage': stage, 'area': area, 'forecast': forecast, 'calls': calls, 'seconds': seconds}
+                           for (stage, area, forecast), (calls, seconds) in self._stages.items()],
+                'counters': [{'counter': name, 'area': area, 'forecast': forecast, 'value': value}
+                             for (name, area, forecast), value in self._counters.items()],
+            }
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format, for the node exporter textfile collector. The
+        file is written again by every run with the numbers of that run only, so they are gauges: a counter would
+        have to keep growing from one scrape to the next"""
+        lines = [
+            '# HELP weatherterm_stage_seconds Time spent in each stage of the last weatherterm run.',
+            '# TYPE weatherterm_stage_seconds gauge',
+        ]
+        data = self.to_dict()
+        for item in data['stages']:
+            lines.append(f'weatherterm_stage_seconds{{{_labels(item, stage=item["stage"])}}} {item["seconds"]:.6f}')
+
+        lines += [
+            '# HELP weatherterm_stage_calls Number of times each stage ran in the last weatherterm run.',
+            '# TYPE weatherterm_stage_calls gauge',
+        ]
+        for item in data['stages']:
+            lines.append(f'weatherterm_stage_calls{{{_labels(item, stage=item["stage"])}}} {item["calls"]}')
+
+        for name in sorted({item['counter'] for item in data['counters']}):
+            lines += [f'# TYPE weatherterm_{name} gauge']
+            for item in data['counters']:
+                if item['counter'] == name:
+                    lines.append(f'weatherterm_{name}{{{_labels(item)}}} {item["value"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Writes the metrics to path, as Prometheus text when it ends with .prom and as JSON otherwise.
+        The file is replaced atomically so a collector never reads a half written file"""
+        import tempfile
+
+        text = self.to_prometheus() if path.endswith('.prom') else json.dumps(self.to_dict(), indent=2)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-metrics-')
+        try:
+            # mkstemp makes the file readable by its owner only and os.replace keeps that. The collector usually
+            # runs as another user, the file gets the mode of a file made with open() (0666 minus the umask)
+            umask = os.umask(0)
+            os.umask(umask)
+            if hasattr(os, 'fchmod'):
+                os.fchmod(fd, 0o666 & ~umask)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def format_profile(self):
+        """A table of the time spent per stage over all areas, then per area and forecast type"""
+        totals = {}
+        for (stage, _, _), (calls, seconds) in self._stages.items():
+            entry = totals.setdefault(stage, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+
+        # stage names like provider:WeatherComParser are longer than the built in ones
+        width = max([16] + [len(stage) + 2 for stage in totals])
+        lines = [f'{"stage":<{width}}{"calls":>7}{"total ms":>11}{"mean ms":>10}']
+        for stage, (calls, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{stage:<{width}}{calls:>7}{seconds * 1000:>11.2f}{seconds * 1000 / calls:>10.2f}')
+
+        counters = {}
+        for (name, _, _), value in self._counters.items():
+            counters[name] = counters.get(name, 0) + value
+        for name, value in sorted(counters.items()):
+            lines.append(f'{name}: {value}')
+
+        per_run = {}
+        for (stage, area, forecast), (_, seconds) in self._stages.items():
+            if area is not None:
+                per_run.setdefault((area, forecast), {})[stage] = seconds
+        if len(per_run) > 1:
+            lines.append('')
+            for (area, forecast), stages in sorted(per_run.items()):
+                breakdown = ', '.join(f'{stage} {seconds * 1000:.1f}ms' for stage, seconds in stages.items())
+                lines.append(f'{area} ({forecast}): {breakdown}')
+
+        return '\n'.join(lines)
+
+
+def _labels(item, **extra):
+    labels = dict(extra)
+    for name in ('area', 'forecast'):
+        if item.get(name) is not None:
+            labels[name] = item[name]
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,15 @@
+from .base_enum import BaseEnum
+from enum import auto, unique
+
+
+@unique
+class OutputFormat(BaseEnum):
+    """OutputFormat Enum class lists the ways forecasts can be written to stdout.
+    TEXT is the human readable output of Forecast.__str__, JSON writes one array of records, NDJSON one record per
+    line and CSV one row per forecast with a header row. GRID is a table for people with a row per area and a
+    column per day. See weatherterm.core.forecast_writer"""
+    TEXT = auto()
+    JSON = auto()
+    NDJSON = auto()
+    CSV = auto()
+    GRID = auto()
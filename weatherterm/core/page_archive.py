@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import inspect
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+# the modules every parser goes through to turn a page into forecasts. A change in one of them can change the
+# forecasts of every parser, so they are part of every parser version
+_parsing_modules = ('page_parser', 'extraction_plan', 'field', 'html_engine', 'unit_converter', 'forecast')
+
+
+@lru_cache(maxsize=None)
+def parser_version(parser_class):
+    """A short hash of the source code parser_class parses pages with: its own module and the core parsing
+    modules. It changes whenever that code changes, a parser class can also set its own version attribute"""
+    version = getattr(parser_class, 'version', None)
+    if version is not None:
+        return str(version)
+
+    import importlib
+
+    digest = hashlib.sha1()
+    modules = [inspect.getmodule(parser_class)] + [importlib.import_module(f'{__package__}.{name}')
+                                                   for name in _parsing_modules]
+    for module in modules:
+        with open(inspect.getsourcefile(module), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class PageArchive:
+    """Every page fetched by the runs made with --record DIR, so they can be parsed again later without fetching
+    them (see weatherterm reparse).
+
+    The pages are stored gzip compressed and content addressed: the file of a page is named after the SHA-256 of
+    its source (objects/ab/abcdef....html.gz), a page fetched many times without changing is stored once. An index
+    (a SQLite database in the same directory) has one row per fetch: the area, the forecast type, the parser, its
+    version (see parser_version) and the time of the fetch. It also remembers which parser version last parsed
+    every fetch, so reparse only parses what changed.
+
+    It is thread safe. add() only keeps the index rows in memory, they are written in one transaction when
+    batch_size rows are waiting and by flush() or close()"""
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL,
+            area TEXT NOT NULL,
+            forecast_type TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            parser_version TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pages_fetch ON pages (parser, area, forecast_type, fetched_at);
+        CREATE TABLE IF NOT EXISTS parsed (
+            page_id INTEGER PRIMARY KEY REFERENCES pages (id),
+            hash TEXT NOT NULL,
+            parser_version TEXT NOT NULL,
+            parsed_at REAL NOT NULL,
+            forecasts INTEGER,
+            error TEXT
+        );
+    '''
+
+    _index_file = 'index.sqlite3'
+
+    def __init__(self, directory, batch_size=200, compresslevel=6):
+        self._directory = directory
+        self._batch_size = batch_size
+        self._compresslevel = compresslevel
+        self._pending = []
+        self._connection = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _connect(self):
+        if self._connection is None:
+            # the fetch threads of a batch record their pages, the connection is only used under the lock
+            self._connection = sqlite3.connect(os.path.join(self._directory, self._index_file), timeout=30,
+                                               check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(self._schema)
+        return self._connection
+
+    def _object_path(self, digest):
+        # 256 subdirectories keep the directories small, a month of pages is tens of thousands of files
+        return os.path.join(self._directory, 'objects', digest[:2], f'{digest}.html.gz')
+
+    def _store(self, digest, data):
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # written to a temporary file and renamed, another process storing the same page at the same time writes
+        # the same bytes
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=self._compresslevel, mtime=0))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def add(self, content, area, forecast_type, parser, parser_version, fetched_at=None):
+        """Archives the page source content fetched for area and forecast_type (the url value, eg. 'today') by
+        the parser named parser. Returns the hash of the page"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        self._store(digest, data)
+
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            self._pending.append((digest, area, forecast_type, parser, parser_version, fetched_at))
+            if len(self._pending) >= self._batch_size:
+                self._flush()
+        return digest
+
+    def _flush(self):
+        if not self._pending:
+            return
+        connection = self._connect()
+        with connection:
+            connection.executemany('INSERT INTO pages (hash, area, forecast_type, parser, parser_version, '
+                                   'fetched_at) VALUES (?, ?, ?, ?, ?, ?)', self._pending)
+        self._pending = []
+
+    def flush(self):
+        """Writes the queued index rows in one transaction"""
+        with self._lock:
+            self._flush()
+
+    def has(self, digest):
+        return os.path.exists(self._object_path(digest))
+
+    def read(self, digest):
+        """The source of the page with hash digest"""
+        with open(self._object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    def pages(self, parser=None, areas=None, start=None, end=None):
+        """The fetches in the archive as dictionaries (id, hash, area, forecast_type, parser, parser_version,
+        fetched_at), ordered by parser, area, forecast type and time. Every fetch also gets next_fetched_at, the
+        time of the next fetch of the same page (None for the last one), and the parsed_hash and parsed_version
+        of its last reparse (None when it was never parsed again). start and end limit the fetch times (Unix
+        times, start included, end excluded)"""
+        conditions = []
+        parameters = []
+        if parser is not None:
+            conditions.append('parser = ?')
+            parameters.append(parser)
+        if areas:
+            conditions.append(f'area IN ({", ".join("?" * len(areas))})')
+            parameters.extend(areas)
+        if start is not None:
+            conditions.append('fetched_at >= ?')
+            parameters.append(start)
+        if end is not None:
+            conditions.append('fetched_at < ?')
+            parameters.append(end)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+
+        # the next fetch is taken over every fetch of the page, not only the selected ones
+        sql = f'''
+            WITH fetches AS (
+                SELECT *, LEAD(fetched_at) OVER (PARTITION BY parser, area, forecast_type ORDER BY fetched_at)
+                          AS next_fetched_at
+                FROM pages
+            )
+            SELECT fetches.*, parsed.hash AS parsed_hash, parsed.parser_version AS parsed_version
+            FROM fetches LEFT JOIN parsed ON parsed.page_id = fetches.id
+            {where}
+            ORDER BY parser, area, forecast_type, fetched_at
+        '''
+        with self._lock:
+            self._flush()
+            return [dict(row) for row in self._connect().execute(sql, parameters)]
+
+    def mark_parsed(self, results):
+        """Records the reparse of some fetches, results are (page id, hash, parser version, number of forecasts,
+        error message or None) tuples"""
+        parsed_at = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO parsed (page_id, hash, parser_version, parsed_at, '
+                                       'forecasts, error) VALUES (?, ?, ?, ?, ?, ?)',
+                                       [(page_id, digest, version, parsed_at, forecasts, error)
+                                        for page_id, digest, version, forecasts, error in results])
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                if self._connection is not None:
+                    self._connection.close()
+                    self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
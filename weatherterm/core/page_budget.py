@@ -0,0 +1,57 @@
+import threading
+import time
+
+
+class PageBudget:
+    """The memory bound of --max-pages: at most max_pages fetched pages are held in memory at once. A page takes
+    a slot before it is fetched and gives it back once its forecasts are extracted, a fetcher finding no free slot
+    waits for one. So when parsing falls behind fetching, the fetchers slow down instead of piling up pages.
+    It is thread safe, slots can be given back by another thread than the one that took them"""
+
+    def __init__(self, max_pages):
+        self._max_pages = max(1, max_pages)
+        self._semaphore = threading.BoundedSemaphore(self._max_pages)
+        self._lock = threading.Lock()
+        self._held = 0
+        self.peak = 0
+        # how many times a fetcher had to wait for a slot and for how long in total
+        self.waits = 0
+        self.wait_time = 0.0
+
+    @property
+    def max_pages(self):
+        return self._max_pages
+
+    @property
+    def held(self):
+        return self._held
+
+    def acquire(self):
+        """Takes a slot, waits until one is free"""
+        if not self._semaphore.acquire(blocking=False):
+            start = time.perf_counter()
+            self._semaphore.acquire()
+            with self._lock:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+
+        with self._lock:
+            self._held += 1
+            self.peak = max(self.peak, self._held)
+
+    def release(self, pages=1):
+        with self._lock:
+            self._held -= pages
+        for _ in range(pages):
+            self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def summary(self):
+        return (f'at most {self.peak} of {self._max_pages} pages in memory, fetchers waited {self.waits} times '
+                f'({self.wait_time:.2f}s)')
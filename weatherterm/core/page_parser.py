@@ -0,0 +1,36 @@
+"""page_parser.py turns a fetched page into the BeautifulSoup tree of the one element a parser is interested in.
+Weather pages are hundreds of KB of navigation, adverts and scripts around a small forecast container, with a
+SoupStrainer only the container (and everything inside it) is ever materialised"""
+
+from .html_engine import HtmlEngine
+
+# the BeautifulSoup tree builder used by each engine
+_builders = {
+    HtmlEngine.FULL: 'html.parser',
+    HtmlEngine.STRAINED: 'html.parser',
+    HtmlEngine.LXML: 'lxml',
+}
+
+
+def parse_container(content, name, class_, engine=HtmlEngine.STRAINED):
+    """Returns the first <name class="class_"> element of the page content, or None when the page does not
+    have one. The result is the same for every engine, only the time and memory it takes differs"""
+    # bs4 is imported on first use, importing weatherterm does not pay for it
+    from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
+
+    # the class is matched word by word. While the page is being parsed some bs4 versions hand the strainer the
+    # raw attribute (eg. 'ls-mod weekend-forecast') instead of the list of classes
+    parse_only = None if engine == HtmlEngine.FULL else \
+        SoupStrainer(name, class_=lambda value: value is not None and class_ in value.split())
+
+    try:
+        bs = BeautifulSoup(content, _builders[engine], parse_only=parse_only)
+    except FeatureNotFound as e:
+        raise ImportError(f'The {engine.name.lower()} engine needs the lxml package to be installed') from e
+
+    return bs.find(name, class_=class_)
+
+
+def count_nodes(element):
+    """Number of elements and strings in the tree under element, used by the metrics"""
+    return 0 if element is None else sum(1 for _ in element.descendants)
@@ -0,0 +1,137 @@
+import os
+import time
+from argparse import Namespace
+
+from .forecast import Forecast
+from .forecast_type import ForecastType
+
+# the parsers of a worker process, one per parser class and engine. A worker builds them for its first page and
+# keeps them (with their compiled extraction plans and regexes) for all the pages after it
+_parsers = {}
+
+
+def _worker_parser(parser_class, engine):
+    key = (parser_class, engine)
+    parser = _parsers.get(key)
+    if parser is None:
+        parser = _parsers[key] = parser_class(engine=engine)
+    return parser
+
+
+def _pack(forecast):
+    # a forecast goes back to the main process as a tuple of plain values, they pickle to a fraction of the size
+    # of the objects and are unpickled without looking up any class
+    return (forecast.current_temp, forecast.humidity, forecast.wind, forecast.high_temp, forecast.low_temp,
+            forecast.description, forecast.forecast_date, forecast.forecast_type.value)
+
+
+def _unpack(row):
+    current_temp, humidity, wind, high_temp, low_temp, description, forecast_date, forecast_type = row
+    return Forecast(current_temp, humidity, wind, high_temp=high_temp, low_temp=low_temp, description=description,
+                    forecast_date=forecast_date, forecast_type=ForecastType(forecast_type))
+
+
+def _parse_chunk(parser_class, engine, chunk):
+    """Runs in a worker process: parses every (content, area, forecast type, unit) of chunk and returns a
+    (packed forecasts or exception, seconds) pair per page, the soup trees never leave the worker"""
+    parser = _worker_parser(parser_class, engine)
+    results = []
+    for content, area, forecast_type, unit in chunk:
+        start = time.perf_counter()
+        try:
+            rows = [_pack(forecast) for forecast in
+                    parser.iter_parse(content, Namespace(area_code=area, forecast_option=forecast_type, unit=unit))]
+        except Exception as e:
+            # a page that can not be parsed fails alone, the other pages of the chunk are still returned
+            rows = e
+        results.append((rows, time.perf_counter() - start))
+    return results
+
+
+class ParsePool:
+    """Parses fetched pages in worker processes, for batches big enough to keep more than one core busy.
+    Building the soup and extracting the rows is pure Python, threads would take turns on the GIL.
+
+    Pages are sent in chunks of up to chunk_size pages, one message to a worker and one back per chunk, and
+    only the forecasts come back, as tuples of plain values. parser_class must be importable by the workers
+    (a class defined in a module, like the ones of weatherterm.parsers). The workers are started once, on the
+    first chunk, and live until close()"""
+
+    def __init__(self, parser_class, engine=None, workers=None, chunk_size=4):
+        self._parser_class = parser_class
+        self._engine = engine
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._chunk_size = max(1, chunk_size)
+        self._executor = None
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    def _pool(self):
+        if self._executor is None:
+            # multiprocessing is only imported when a pool is really used
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # the batch keeps fetching on threads while the workers start, forking a process with running threads
+            # can copy a lock in its locked state. The fork server starts the workers from a clean process
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=context)
+        return self._executor
+
+    def submit(self, pages):
+        """Sends pages, a list of (content, args) pairs, to a worker. Returns a Future of the list of
+        (forecasts or exception, parse seconds) of the pages, in the same order"""
+        chunk = [(content, getattr(args, 'area_code', None), args.forecast_option, args.unit)
+                 for content, args in pages]
+        future = self._pool().submit(_parse_chunk, self._parser_class, self._engine, chunk)
+        return _ChunkFuture(future)
+
+    def parse_many(self, pages):
+        """Generator yielding (forecasts or exception) for every (content, args) pair of pages, in order. The
+        chunks are parsed at the same time by all the workers"""
+        pages = iter(pages)
+        pending = []
+        while True:
+            # up to two chunks per worker are in flight, so a worker has the next chunk as soon as it is done
+            while len(pending) < self._workers * 2:
+                chunk = [page for _, page in zip(range(self._chunk_size), pages)]
+                if not chunk:
+                    break
+                pending.append(self.submit(chunk))
+            if not pending:
+                return
+            for forecasts, _ in pending.pop(0).result():
+                yield forecasts
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+class _ChunkFuture:
+    """The Future of submit: unpacks the forecasts of the worker when its result is taken"""
+
+    __slots__ = ('_future',)
+
+    def __init__(self, future):
+        self._future = future
+
+    def add_done_callback(self, callback):
+        # a new wrapper of the future the callback gets rather than self: a lambda holding self would be a cycle
+        # (future -> callback -> self -> future) keeping the pages of the chunk until the garbage collector runs
+        self._future.add_done_callback(lambda future: callback(_ChunkFuture(future)))
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return [([_unpack(row) for row in rows] if isinstance(rows, list) else rows, seconds)
+                for rows, seconds in self._future.result(timeout)]
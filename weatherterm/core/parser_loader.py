@@ -1,59 +1,78 @@
 import os
-import inspect
 import re
+import importlib
+from collections.abc import Mapping
 
 """In order to make the app flexible and reusable, every website will have a different parser.
 parser_loader.py searches for parsers inside the weatherterm.parsers directory and loads them without requiring any other
 changes.
 The files loaded will be the parser files. Parser files will have a suffix of 'parsers' added to filename
-eg. openforecast_parser.py for identification. Files beginning with double underscores will not be retrieved"""
+eg. openforecast_parser.py for identification. Files beginning with double underscores will not be retrieved.
+
+The parser class name is derived from the file name (weather_com_parser.py -> WeatherComParser), so the list of
+parsers is known without importing anything. A parser module, and with it heavy dependencies like BeautifulSoup,
+is only imported when its parser is selected"""
+
+# the parsers directory is found relative to this package, not to the current working directory
+_parsers_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parsers')
+
+# regex to match file which has a suffix of 'parser'
+_parser_regex = re.compile('.+parser$', re.IGNORECASE)  # make string case insensitive
 
 
 def _get_parser_list(dirname):
     """The function returns the list of items/files residing in weatherterm/parsers directory
     if only it doesn't start with a double underscore."""
     # .py extension replaced with an empty string since later they will be used for import
-    # and __import__() takes only the filename as a string and not the extension.
-    files = [file.replace('.py', '')
+    # and import_module() takes only the module name as a string and not the extension.
+    files = [file[:-len('.py')]
              for file in os.listdir(dirname)  # os.listdir lists the items of a directory as a list
-             if not file.startswith('__')]
+             if file.endswith('.py') and not file.startswith('__')]
+
+    return [file for file in sorted(files) if _parser_regex.match(file)]
+
+
+def _class_name(module_name):
+    """weather_com_parser -> WeatherComParser"""
+    return ''.join(part.title() for part in module_name.split('_'))
+
+
+def _import_parser(module_name, class_name):
+    module = importlib.import_module(f'weatherterm.parsers.{module_name}')
 
-    return files
+    parser_class = getattr(module, class_name, None)
+    if parser_class is not None:
+        return parser_class
 
+    # the class does not follow the naming convention, take the first class with a 'parser' suffix
+    # that is defined in the module itself
+    for name, data in vars(module).items():
+        if isinstance(data, type) and data.__module__ == module.__name__ and _parser_regex.match(name):
+            return data
 
-def _import_parsers(parser_files):
-    # regex to match file which has a suffix of 'parser'
-    m = re.compile('.+parser$', re.IGNORECASE)  # make string case insensitive
+    raise ImportError(f'No parser class found in weatherterm.parsers.{module_name}')
 
-    # import modules in parser directory using built in module function __import__(name, globals, local, fromlist,
-    # level)
-    # name takes the package path of the module
-    # globals(), locals() import the globals and locals of the said module fromlist refers to the string
-    # of actual module being imported from the package directory(in this case parser_files)
-    # level specifies whether to use absolute imports or relative imports. 0 is absolute import and 1
-    # and above signify relative imports
 
-    # import all modules in weatherterm/parsers directory
-    _modules = __import__('weatherterm.parsers',
-                          globals(), locals(), parser_files, 0)
+class ParserRegistry(Mapping):
+    """A read only dictionary of parser name to parser class. Keys come from the file names, a parser module is
+    imported the first time its class is looked up"""
 
-    # getmembers by default returns a tuple if object is a module and has a parser suffix
-    # m.match matches if 'parser' substring in module string
-    _parsers = [(name, data) for name, data in inspect.getmembers(_modules) if
-                inspect.ismodule(name) and m.match(data)]
+    def __init__(self, parser_files):
+        self._modules = {_class_name(file): file for file in parser_files}
+        self._classes = {}
 
-    _classes = dict()
+    def __getitem__(self, name):
+        if name not in self._classes:
+            self._classes[name] = _import_parser(self._modules[name], name)
+        return self._classes[name]
 
-    # dictionary comprehension
-    # getmembers to find classes within parser modules and match to find only classes which have a 'parser' substring
-    # then store name of class and class object in a dictionary.
-    for name, data in _parsers:
-        _classes.update({name: data for name, data in
-                         inspect.getmembers(data) if inspect.isclass(data) and m.match(name)})
+    def __iter__(self):
+        return iter(self._modules)
 
-    return _classes
+    def __len__(self):
+        return len(self._modules)
 
 
-def load(dirname):
-    parser_files = _get_parser_list(dirname)
-    return _import_parsers(parser_files)
+def load(dirname=None):
+    parser_files = _get_parser_list(dirname or _parsers_dir)
+    return ParserRegistry(parser_files)
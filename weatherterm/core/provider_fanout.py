@@ -0,0 +1,219 @@
+import math
+import queue
+import threading
+import time
+
+from .fanout_result import FanoutResult
+from .fanout_strategy import FanoutStrategy
+from .forecast import Forecast
+from .forecast_type import ForecastType
+from .metrics import NullMetrics
+
+# the fields of a Forecast the merge strategy takes from different parsers, see --prefer
+MERGE_FIELDS = ('forecast_date', 'current_temp', 'high_temp', 'low_temp', 'humidity', 'wind', 'description')
+
+
+def _missing(value):
+    # a temperature the page did not have is NaN, humidity and wind are '--' or an empty string
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    if isinstance(value, str):
+        return not value.strip('- ')
+    return False
+
+
+def _date_key(value):
+    # the same day written by two websites may differ in case and spacing ('Sat  Feb 20', 'sat feb 20')
+    return ' '.join(str(value).lower().split())
+
+
+class ProviderFanout:
+    """Queries several parsers (providers) for the same area and forecast type at the same time, so one slow or
+    broken website does not make the whole run slow or broken. providers is a dictionary of name -> factory
+    returning a new parser, eg. {'WeatherComParser': lambda: WeatherComParser(backend=backend)}.
+
+    With FanoutStrategy.FASTEST the forecasts of the first parser that answers are kept and the query is over, the
+    other parsers are cancelled: the ones that did not start are not run and the ones still fetching do not parse
+    their page. A fetch that is running can not be interrupted, it goes on in the background until its deadline.
+    With FanoutStrategy.MERGE every parser is waited for and the forecasts are combined row by row: every field is
+    taken from the first parser of priorities[field] (default: the order of providers) that has a value for it.
+
+    It has the run and iter_run methods of the parsers, so it can be used in place of one. fan_out returns a
+    FanoutResult with the parser that answered and how long every parser took, the time of every parser is also
+    added to metrics (the provider:<name> stage), also when it finishes after the query returned. It is thread
+    safe, a parser is only used by one query at a time and is kept for the next queries when it is done"""
+
+    def __init__(self, providers, strategy=FanoutStrategy.FASTEST, priorities=None, metrics=None):
+        self._factories = dict(providers)
+        self._strategy = strategy
+        self._metrics = metrics or NullMetrics()
+        # every field gets the full list of providers, the ones without a priority come after the others in the
+        # order they were given
+        priorities = priorities or {}
+        self._priorities = {}
+        for field in MERGE_FIELDS:
+            preferred = [name for name in priorities.get(field, ()) if name in self._factories]
+            self._priorities[field] = preferred + [name for name in self._factories if name not in preferred]
+        # parsers keep per run state, a parser of a cancelled query may still be fetching when the next query
+        # starts so every query takes an idle parser or makes a new one
+        self._lock = threading.Lock()
+        self._idle = {name: [] for name in self._factories}
+
+    @property
+    def providers(self):
+        return list(self._factories)
+
+    @property
+    def strategy(self):
+        return self._strategy
+
+    def _acquire(self, name):
+        with self._lock:
+            if self._idle[name]:
+                return self._idle[name].pop()
+        return self._factories[name]()
+
+    def _release(self, name, parser):
+        with self._lock:
+            self._idle[name].append(parser)
+
+    def _query_one(self, name, args, cancelled, parsing, done):
+        if cancelled.is_set():
+            done.put((name, 'skipped', None, 0.0))
+            return
+
+        start = time.perf_counter()
+        parser = None
+        status = 'ok'
+        try:
+            parser = self._acquire(name)
+            if hasattr(parser, 'fetch'):
+                content = parser.fetch(args)
+                # the pages are parsed one at a time in the order they arrived: parsing holds the GIL, two pages
+                # parsed at once would both be late. With fastest, the pages waiting behind the first good one are
+                # never parsed
+                with parsing:
+                    if cancelled.is_set():
+                        status, value = 'cancelled', None
+                    else:
+                        value = parser.parse(content, args)
+                        if value and self._strategy == FanoutStrategy.FASTEST:
+                            # set before the lock is released, the next page in line must see it
+                            cancelled.set()
+            else:
+                # eg. a ForecastClient, it fetches and parses in one call
+                value = parser.run(args)
+
+            if status == 'ok' and not value:
+                raise Exception(f'{name} found no forecast')
+        except Exception as e:
+            status, value = 'failed', e
+        finally:
+            if parser is not None:
+                self._release(name, parser)
+
+        elapsed = time.perf_counter() - start
+        self._metrics.add(f'provider:{name}', elapsed, getattr(args, 'area_code', None), args.forecast_option.value)
+        done.put((name, status, value, elapsed))
+
+    def fan_out(self, args):
+        """Queries every parser for args.area_code and args.forecast_option, returns a FanoutResult. When no
+        parser answered, its error holds an exception and forecasts is empty"""
+        result = FanoutResult(getattr(args, 'area_code', None), args.forecast_option)
+        cancelled = threading.Event()
+        parsing = threading.Lock()
+        done = queue.Queue()
+        start = time.perf_counter()
+
+        # threads of their own rather than an executor: a cancelled parser can keep fetching for a while and must
+        # not hold up the next query or the end of the program
+        for name in self._factories:
+            threading.Thread(target=self._query_one, args=(name, args, cancelled, parsing, done),
+                             name=f'fanout-{name}', daemon=True).start()
+
+        answers = {}
+        while len(answers) < len(self._factories):
+            name, status, value, elapsed = done.get()
+            answers[name] = (status, value, elapsed)
+            if status == 'ok' and self._strategy == FanoutStrategy.FASTEST:
+                cancelled.set()
+                break
+        result.elapsed = time.perf_counter() - start
+
+        ok = {name: value for name, (status, value, _) in answers.items() if status == 'ok'}
+        if self._strategy == FanoutStrategy.FASTEST:
+            used = set(ok)
+            result.forecasts = next(iter(ok.values()), [])
+        else:
+            result.forecasts, used = self._merge(ok, args.forecast_option)
+
+        for name in self._factories:
+            if name not in answers:
+                # still running when the query was over
+                result.outcomes[name] = ('cancelled', result.elapsed, None)
+                continue
+            status, value, elapsed = answers[name]
+            if status == 'ok':
+                status = 'won' if name in used else 'ok'
+            result.outcomes[name] = (status, elapsed, value if status == 'failed' else None)
+
+        if used:
+            result.provider = '+'.join(name for name in self._factories if name in used)
+            for name in used:
+                self._metrics.count(f'{name}_wins', 1, result.area, args.forecast_option.value)
+        else:
+            errors = [f'{name}: {outcome[2]}' for name, outcome in result.outcomes.items() if outcome[2] is not None]
+            result.error = Exception(f'no provider answered ({"; ".join(errors)})')
+        return result
+
+    def _merge(self, answers, forecast_type):
+        """Combines the forecasts of the parsers that answered date by date, returns the forecasts and the names
+        of the parsers that gave at least one field. A field is left empty when the parsers giving it have no row
+        for that date, the rows of different websites are not matched by position: one of them may start a day later
+        or skip a day"""
+        if forecast_type == ForecastType.TODAY:
+            # today is a single row, the parsers date it the day they run
+            by_date = {name: {None: forecasts[0]} for name, forecasts in answers.items() if forecasts}
+        else:
+            by_date = {}
+            for name, forecasts in answers.items():
+                rows = by_date[name] = {}
+                for forecast in forecasts:
+                    rows.setdefault(_date_key(forecast.forecast_date), forecast)
+        # the dates in the order of the parser preferred for forecast_date, then the ones only the others have
+        dates = list(dict.fromkeys(key for name in self._priorities['forecast_date'] for key in by_date.get(name, ())))
+
+        used = set()
+        merged = []
+        for key in dates:
+            values = {}
+            for field in MERGE_FIELDS:
+                for name in self._priorities[field]:
+                    forecast = by_date.get(name, {}).get(key)
+                    if forecast is None:
+                        continue
+                    value = getattr(forecast, field)
+                    if not _missing(value):
+                        values[field] = value
+                        used.add(name)
+                        break
+                else:
+                    values[field] = None
+
+            merged.append(Forecast(values['current_temp'], values['humidity'], values['wind'],
+                                   high_temp=values['high_temp'], low_temp=values['low_temp'],
+                                   description=values['description'] or '', forecast_date=values['forecast_date'],
+                                   forecast_type=forecast_type))
+        return merged, used
+
+    def run(self, args):
+        """The forecasts of fan_out, raises its error when no parser answered"""
+        result = self.fan_out(args)
+        if result.error is not None:
+            raise result.error
+        return result.forecasts
+
+    def iter_run(self, args):
+        yield from self.run(args)
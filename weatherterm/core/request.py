@@ -1,26 +1,113 @@
-from selenium import webdriver
-import os
+import hashlib
+
+from .fetch_backend import create_backend
+from .metrics import NullMetrics
 
 
 class Request:
 
-    def __init__(self, base_url):
+    def __init__(self, base_url, backend=None, cache=None, namespace='', metrics=None, archive=None, version=None):
         self._base_url = base_url
-        # we find the phantomjs path which is in the phantomjs directory by using os.path.join to
-        # join the current directory with the phantomjs executable
-        self._phantomjs_path = os.path.join(os.curdir, 'phantomjs/bin/phatmomjs')
-        # PhantomJS of selenium is then run using the phantomjs directory path
-        self._driver = webdriver.PhantomJS(self._phantomjs_path)
+        # the backend does the actual fetching. Parsers can hand over their own (eg. a BrowserBackend or a
+        # backend shared with other parsers), otherwise a pooled HttpBackend is created
+        self._backend = backend if backend is not None else create_backend()
+        # cache is an optional ResponseCache, namespace (the parser name) keeps the pages of different
+        # parsers apart in the cache
+        self._cache = cache
+        self._namespace = namespace
+        # fetch time and bytes received are recorded per area and forecast when metrics are enabled
+        self._metrics = metrics or NullMetrics()
+        # with --record every page that is fetched is also saved in a PageArchive, tagged with the parser
+        # (namespace) and its version
+        self._archive = archive
+        self._version = version
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def cache(self):
+        return self._cache
 
     def fetch_data(self, area, forecast):
         """Fetching the data for weather from the site using the area code"""
         url = self._base_url.format(forecast=forecast, area=area)
-        self._driver.get(url)
-
-        # if url does not exist or data not available raise custom error message
-        # this is because selenium does not produce status codes so we just have to compare strings
-        if self._driver == '404 Not Found':
-            error_message = 'Could not find the area you were searching for'
-            raise Exception(error_message)
-        # if everything runs smoothly, return the page source
-        return self._driver.page_source
+
+        with self._metrics.stage('fetch', area, forecast):
+            if self._cache is None:
+                # the backend raises a FetchError when the page is missing or the server answers with an error
+                content = self._fetch(url, area, forecast).body
+            else:
+                content, fetched = self._fetch_cached(url, area, forecast)
+                if not fetched:
+                    # a fresh cache entry, the page was archived when it was fetched
+                    return content
+
+        self._record(content, area, forecast)
+        return content
+
+    def _record(self, content, area, forecast):
+        if self._archive is not None:
+            with self._metrics.stage('record', area, forecast):
+                self._archive.add(content, area, forecast, self._namespace, self._version)
+
+    def poll(self, area, forecast, validators=None):
+        """Fetches the page again for watch mode, the cache is not used. validators is what the previous poll of
+        the same page returned (None the first time): the page is fetched with a conditional request when the
+        backend can send them, and its hash is compared with the previous one when it cannot or when the server
+        ignores them. Returns (page source, validators), the page source is None when the page did not change"""
+        url = self._base_url.format(forecast=forecast, area=area)
+
+        headers = None
+        if validators is not None and self._backend.supports_conditional:
+            headers = {name: value for name, value in (('If-None-Match', validators['etag']),
+                                                       ('If-Modified-Since', validators['last_modified']))
+                       if value} or None
+
+        with self._metrics.stage('fetch', area, forecast):
+            response = self._fetch(url, area, forecast, headers=headers)
+
+        if response.not_modified:
+            return None, validators
+
+        new_validators = {
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'digest': hashlib.sha1(response.body.encode('utf-8')).digest(),
+        }
+        if validators is not None and validators['digest'] == new_validators['digest']:
+            return None, new_validators
+        self._record(response.body, area, forecast)
+        return response.body, new_validators
+
+    def _fetch(self, url, area, forecast, headers=None):
+        response = self._backend.fetch(url, headers=headers)
+        self._metrics.count('fetched_bytes', response.size, area, forecast)
+        return response
+
+    def _fetch_cached(self, url, area, forecast):
+        """Returns (page source, False when it is a fresh cache entry and True when it came from the server)"""
+        key = self._cache.key(self._namespace, forecast, area)
+        entry = self._cache.get(key)
+
+        if entry is not None and self._cache.is_fresh(entry):
+            self._cache.record('hits')
+            self._metrics.count('cache_hits', 1, area, forecast)
+            return entry['body'], False
+
+        # a stale entry is revalidated with the server when the backend can send conditional requests,
+        # then only a 304 comes back instead of the whole page
+        headers = None
+        if entry is not None and self._backend.supports_conditional:
+            headers = self._cache.conditional_headers(entry)
+
+        response = self._fetch(url, area, forecast, headers=headers or None)
+
+        if response.not_modified:
+            self._cache.record('revalidated')
+            return self._cache.renew(key, entry)['body'], True
+
+        self._cache.record('misses')
+        # if everything runs smoothly, store and return the page source
+        return self._cache.put(key, forecast, response)['body'], True
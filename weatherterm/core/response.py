@@ -0,0 +1,18 @@
+class Response:
+    """A small value object returned by every fetch backend so that Request does not have to care
+    which backend produced the page"""
+
+    def __init__(self, url, status, body, headers=None, size=None):
+        self.url = url
+        self.status = status
+        self.body = body
+        # number of bytes received, as sent by the server (compressed). Backends that do not know it use the
+        # length of the body
+        self.size = len(body) if size is None else size
+        # header names are lower cased so lookups like headers.get('etag') work for every backend
+        self.headers = {name.lower(): value for name, value in (headers or {}).items()}
+
+    @property
+    def not_modified(self):
+        """True when the server answered a conditional request with 304 Not Modified"""
+        return self.status == 304
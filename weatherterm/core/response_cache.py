@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .forecast_type import ForecastType
+
+try:
+    import fcntl  # only used to serialise updates of the shared stats file, not available on Windows
+except ImportError:
+    fcntl = None
+
+
+class ResponseCache:
+    """A persistent on-disk cache of fetched pages shared by every weatherterm process on the machine.
+    Every entry is a small JSON file named after the hash of (parser, forecast type, area code).
+    Entries expire after a TTL that depends on the forecast type, the cache is bounded in size and the least
+    recently used entries are evicted first. Files are written to a temporary file and renamed into place,
+    so concurrent processes never read a half written entry. An instance can be shared by threads"""
+
+    # how long (in seconds) a page stays fresh. Today's forecast changes often, the long range ones rarely do
+    default_ttls = {
+        ForecastType.TODAY: 10 * 60,
+        ForecastType.FIVEDAYS: 60 * 60,
+        ForecastType.TENDAYS: 3 * 60 * 60,
+        ForecastType.WEEKEND: 3 * 60 * 60,
+    }
+
+    _stats_file = 'stats.json'
+    _counters = ('hits', 'misses', 'revalidated', 'stores', 'evictions')
+
+    def __init__(self, directory=None, ttls=None, max_bytes=50 * 1024 * 1024, refresh=False):
+        self._directory = directory or self.default_directory()
+        self._ttls = {**self.default_ttls, **(ttls or {})}
+        self._max_bytes = max_bytes
+        # when refresh is True fresh entries are ignored and replaced with newly fetched pages
+        self._refresh = refresh
+        self._stats = dict.fromkeys(self._counters, 0)
+        # guards the counters and the running total size of the entries, None until the first write scans the
+        # directory once. Other processes write to the same directory, the total is corrected whenever it goes
+        # over max_bytes and the directory is scanned to evict
+        self._lock = threading.Lock()
+        self._total = None
+        os.makedirs(self._directory, exist_ok=True)
+
+    @staticmethod
+    def default_directory():
+        """$XDG_CACHE_HOME/weatherterm, or ~/.cache/weatherterm when XDG_CACHE_HOME is not set"""
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'weatherterm')
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def refresh(self):
+        return self._refresh
+
+    def key(self, parser_name, forecast, area):
+        """forecast is the url value of a ForecastType, eg. 'today'"""
+        raw = f'{parser_name}\0{forecast}\0{area}'.encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._directory, f'{key}.json')
+
+    def get(self, key):
+        """Returns the stored entry (a dictionary) or None. The entry may be stale, use is_fresh to check it"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # a missing file or one removed by another process while we were reading it is just a miss
+            return None
+
+        # the modification time of an entry doubles as its last access time for LRU eviction
+        self._touch(key)
+        return entry
+
+    def is_fresh(self, entry):
+        if self._refresh:
+            return False
+        ttl = self._ttls.get(ForecastType(entry['forecast']), 0)
+        return time.time() - entry['stored_at'] < ttl
+
+    def conditional_headers(self, entry):
+        """The headers to revalidate entry with the server, empty if the server gave us no validators"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key, forecast, response):
+        """Stores the body of response and its validators under key"""
+        entry = {
+            'url': response.url,
+            'forecast': forecast,
+            'stored_at': time.time(),
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'body': response.body,
+        }
+        self._write(key, entry)
+        self.record('stores')
+        self._evict()
+        return entry
+
+    def renew(self, key, entry):
+        """The server told us entry did not change (304), so it becomes fresh again"""
+        entry['stored_at'] = time.time()
+        self._write(key, entry)
+        return entry
+
+    def record(self, counter, count=1):
+        with self._lock:
+            self._stats[counter] += count
+
+    def _write(self, key, entry):
+        # the entry is written to a temporary file in the same directory and then renamed.
+        # os.replace is atomic, readers either see the old entry or the new one
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix='.tmp-', suffix='.json')
+        path = self._path(key)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+                size = f.tell()
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total is None:
+                # the first write of this instance, the entry is already in the scan
+                self._total = sum(size for _, size, _ in self._entries())
+            else:
+                self._total += size - replaced
+
+    def _touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self):
+        """Returns (mtime, size, path) of every entry, oldest first"""
+        entries = []
+        with os.scandir(self._directory) as it:
+            for item in it:
+                if item.name.endswith('.json') and not item.name.startswith('.') \
+                        and item.name != self._stats_file:
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        return sorted(entries)
+
+    def _evict(self):
+        # the directory is only scanned when the running total is over the limit, not on every put
+        with self._lock:
+            if self._total is None or self._total <= self._max_bytes:
+                return
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in entries:
+                if total <= self._max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    # another process evicted it first
+                    pass
+                total -= size
+                self._stats['evictions'] += 1
+            self._total = total
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._total = None
+
+    def stats(self):
+        """Returns the counters of this process merged with the ones stored on disk, plus the cache size"""
+        totals = self._read_stats()
+        with self._lock:
+            for name in self._counters:
+                totals[name] = totals.get(name, 0) + self._stats[name]
+
+        entries = self._entries()
+        totals['entries'] = len(entries)
+        totals['bytes'] = sum(size for _, size, _ in entries)
+        return totals
+
+    def _read_stats(self):
+        try:
+            with open(os.path.join(self._directory, self._stats_file), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush_stats(self):
+        """Adds the counters of this process to the stats file on disk so they can be scraped.
+        The read-modify-write is done under an exclusive lock, processes can flush at the same time"""
+        # the counters are taken and reset at once, the fetches of other threads count towards the next flush
+        with self._lock:
+            counts, self._stats = self._stats, dict.fromkeys(self._counters, 0)
+
+        lock_path = os.path.join(self._directory, '.stats.lock')
+        with open(lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            totals = self._read_stats()
+            for name in self._counters:
+                totals[name] = totals.get(name, 0) + counts[name]
+
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix='.tmp-stats-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(totals, f)
+            os.replace(tmp_path, os.path.join(self._directory, self._stats_file))
@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Rate limit of rate operations per second with bursts of up to burst operations. The bucket holds up to
+    burst tokens, it is refilled at rate tokens per second and every operation takes one token. It is thread safe:
+    the tokens are handed out under a lock but the waiting is done outside of it"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self._rate = float(rate)
+        self._burst = float(burst or max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self._burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Takes a token if one is available right now, returns False otherwise"""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, deadline=None):
+        """Waits for a token and takes it. deadline is a time of the clock (time.monotonic by default): when the
+        token would only be available after it, nothing is taken and False is returned straight away"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            # the token is reserved now, the bucket goes below zero and the next callers wait longer
+            wait = max(0.0, (1 - self._tokens) / self._rate)
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._tokens -= 1
+
+        if wait:
+            self._sleep(wait)
+        return True
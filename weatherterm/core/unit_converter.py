@@ -1,3 +1,6 @@
+import math
+from array import array
+
 from .unit import Unit
 
 
@@ -9,6 +12,14 @@ class UnitConverter:
     """By default, the temperature unit used by most sites is Fahrenheit. But we want to give users added
     functionality in being able to choose the Temperature unit of their preference"""
 
+    # both conversions are linear, converted = (value + before) * multiply / divide + after. convert_many uses these
+    # to convert a whole sequence without a function call per value. The operations are done in the same order as
+    # _to_celsius and _to_fahrenheit so both paths give exactly the same floats
+    _linear_conversions = {
+        Unit.CELSIUS: (-32.0, 5, 9, 0.0),
+        Unit.FAHRENHEIT: (0.0, 9, 5, 32.0),
+    }
+
     def __init__(self, parser_default_unit, dest_unit=None):
         # self.dest_unit is not a protected attribute because it is the user that will set their unit of preference
         self.dest_unit = dest_unit
@@ -56,6 +67,48 @@ class UnitConverter:
             result = func(temperature)
             return self._format_results(result)
 
+    def convert_many(self, temps, use_numpy=None):
+        """Converts a whole sequence of raw temperatures (strings like '72', numbers or None) in one pass and
+        returns the numbers unformatted: a NumPy float array when NumPy is installed (or use_numpy is True),
+        otherwise an array('d'). Values that are not numbers become NaN instead of 0, use format_value to
+        display them"""
+        convert = not (self.dest_unit == self._parser_default_unit or self.dest_unit is None)
+        if convert:
+            before, multiply, divide, after = self._linear_conversions[self.dest_unit]
+
+        numpy = None
+        if use_numpy is not False:
+            try:
+                import numpy
+            except ImportError:
+                if use_numpy:
+                    raise
+
+        if numpy is not None:
+            try:
+                # numpy parses a sequence of valid number strings in C
+                values = numpy.asarray(temps, dtype=numpy.float64)
+            except (TypeError, ValueError):
+                values = numpy.fromiter((_parse_float(temp) for temp in temps), dtype=numpy.float64)
+            if convert:
+                values = (values + before) * multiply / divide + after
+            return values
+
+        values = array('d', map(_parse_float, temps))
+        if convert:
+            values = array('d', [(value + before) * multiply / divide + after for value in values])
+        return values
+
+    @staticmethod
+    def format_value(value):
+        """Formats a temperature for display: whole numbers as int, the rest with one decimal and NaN or None
+        as --. Values that are already formatted (strings, ints) are returned as they are"""
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return '--'
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else f'{value:.1f}'
+        return value
+
     def _format_results(self, value):
         # if the value is an integer we return the value as an integer however if the value of temp is not an integer
         # then we format it with one decimal value
@@ -69,6 +122,13 @@ class UnitConverter:
         result = (celsius_temp * 9 / 5) + 32
         return result
 
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
 # things i liked here
 # there was a distinct feeling of a single chain of responsibility
 # the functions only carried specific purposes
@@ -0,0 +1,50 @@
+import time
+
+
+class WatchScreen:
+    """The terminal output of watch mode. The forecasts of every task are laid out one under the other, like the
+    normal text output, and the screen remembers what every line shows: a redraw moves the cursor to the lines
+    that changed and rewrites only those (with ANSI escape sequences), so a dashboard left open for days does not
+    repaint the whole terminal every few seconds"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lines = None
+
+    def _task_lines(self, task):
+        lines = [f'== {task.area} ({task.forecast_type.value})']
+        for forecast in task.forecasts:
+            lines.extend(str(forecast).split('\n'))
+        if task.error is not None:
+            lines.append(f'!! {task.error}')
+        return lines
+
+    @staticmethod
+    def _status(tasks):
+        errors = sum(task.error is not None for task in tasks)
+        polls = sum(task.polls for task in tasks)
+        status = f'updated {time.strftime("%H:%M:%S")}, {polls} polls'
+        if errors:
+            status += f', {errors} failing'
+        return status
+
+    def render(self, tasks):
+        lines = [line for task in tasks for line in self._task_lines(task)]
+        lines.append(self._status(tasks))
+
+        if self._lines is None:
+            # first draw: clear the screen and write everything from the top left corner
+            self._stream.write('\x1b[H\x1b[2J' + '\n'.join(lines))
+        else:
+            output = []
+            for row, line in enumerate(lines):
+                if row >= len(self._lines) or self._lines[row] != line:
+                    # move to the start of the line (rows are 1 based), write it and clear what is left of it
+                    output.append(f'\x1b[{row + 1};1H{line}\x1b[K')
+            if len(lines) < len(self._lines):
+                # the screen got shorter, clear everything below the last line
+                output.append(f'\x1b[{len(lines) + 1};1H\x1b[J')
+            self._stream.write(''.join(output))
+
+        self._lines = lines
+        self._stream.flush()
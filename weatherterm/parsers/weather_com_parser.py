@@ -1,187 +1,338 @@
 import re
-from bs4 import BeautifulSoup
+import time
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 from weatherterm.core import ForecastType
 from weatherterm.core import UnitConverter
 from weatherterm.core import Unit
 from weatherterm.core import Request
 from weatherterm.core import Forecast
-from weatherterm.core import Mapper
+from weatherterm.core import BackendType
+from weatherterm.core import create_backend
+from weatherterm.core import HtmlEngine
+from weatherterm.core import parse_container
+from weatherterm.core import count_nodes
+from weatherterm.core import NullMetrics
+from weatherterm.core import Field
+from weatherterm.core import ExtractionPlan
+from weatherterm.core import ForecastSet
+
+# data for 5-day and 10-day have the same CSS class and DOM elements
+_list_fields = [
+    Field('date-time', 'span'),  # element contains string containing day of the week
+    Field('day-detail', 'span'),  # element contains string with date
+    Field('description', 'td'),  # element contains description of weather
+    Field('temp', 'td'),  # element contains low temp and high temp
+    Field('wind', 'td'),  # element contains wind information
+    Field('humidity', 'td'),  # humidity contains humidity info
+]
 
 
 class WeatherComParser:
 
-    def __init__(self):
+    # weather.com serves its forecasts as plain HTML so the pooled HTTP backend is enough
+    default_backend = BackendType.HTTP
+    # only the forecast container of the page is parsed, see weatherterm.core.page_parser
+    default_engine = HtmlEngine.STRAINED
+    # the URL template to perform requests to weather website. It is a class attribute so that a subclass can
+    # point the parser somewhere else, eg. at a local stand-in server
+    base_url = 'http://weather.com/weather/{forecast}/1/{area}'
+
+    # the DOM elements we want to find in every item of the forecast container, per forecast type.
+    # Field takes the CSS class, the type of HTML element and optionally the key the value gets in the results.
+    # They are compiled once per class into ExtractionPlans which collect all fields in one walk over an item
+    schemas = {
+        ForecastType.TODAY: [
+            Field('today_nowcard-temp', 'div'),  # CSS class containing current temperature
+            Field('today_nowcard-phrase', 'div'),  # CSS class containing weather conditions text for description
+            Field('today_nowcard-hilo', 'div'),  # CSS class containing highest and lowest temperature
+        ],
+        ForecastType.FIVEDAYS: _list_fields,
+        ForecastType.TENDAYS: _list_fields,
+        ForecastType.WEEKEND: [
+            Field('weather-cell', 'header'),
+            Field('temp', 'p'),
+            Field('weather-phrase', 'h3', name='description'),
+            Field('wind-conditions', 'p', name='wind'),
+            Field('humidity', 'p'),
+        ],
+    }
+
+    # forecast types that can be taken from another type's page instead of being fetched: the 5 day forecast is
+    # the first 5 rows of the 10 day table. Only used by run_many when both types are asked for
+    derived_forecasts = {
+        ForecastType.FIVEDAYS: (ForecastType.TENDAYS, 5),
+    }
+
+    def __init__(self, backend=None, cache=None, engine=None, metrics=None, archive=None, bounded_memory=False):
+        # every forecast type has two steps: extracting the raw rows (dictionaries of strings) from the page
+        # and preparing them, which converts the temperatures and builds the Forecast objects
         self._forecast = {
-            ForecastType.TODAY: self._today_forecast,
-            ForecastType.FIVEDAYS: self._five_and_ten_days_forecast,
-            ForecastType.TENDAYS: self._five_and_ten_days_forecast,
-            ForecastType.WEEKEND: self._weekend_forecast,
+            ForecastType.TODAY: (self._today_forecast, self._prepare_today),
+            ForecastType.FIVEDAYS: (self._five_and_ten_day_forecast, self._prepare_data),
+            ForecastType.TENDAYS: (self._five_and_ten_day_forecast, self._prepare_data),
+            ForecastType.WEEKEND: (self._weekend_forecast, self._prepare_data),
         }
-        # the URL template to perform requests to weather website
-        self._base_url = 'http://weather.com/weather/{forecast}/1/{area}'
-        self._request = Request(self._base_url)  # attribute for Request class
-        self._temp_regex = re.compile('([0-9]+)\D{,2}([0-9]+)')
+        self._base_url = self.base_url
+        # attribute for Request class, backend can be a shared backend, otherwise the parser's default is used.
+        # cache is an optional ResponseCache shared by all parsers
+        # metrics records the time of every stage (fetch, soup, extract, prepare) when --profile/--metrics is used
+        # archive is the PageArchive of --record, every fetched page is saved in it with the version of this parser
+        self._metrics = metrics or NullMetrics()
+        self._labels = (None, None)
+        version = None
+        if archive is not None:
+            # only imported with --record, it pulls in sqlite3 and gzip
+            from weatherterm.core import parser_version
+            version = parser_version(type(self))
+        self._request = Request(self._base_url, backend or create_backend(self.default_backend),
+                                cache=cache, namespace=type(self).__name__, metrics=self._metrics, archive=archive,
+                                version=version)
+        self._engine = engine or self.default_engine
+        # with bounded_memory (--max-pages) the rows of a page are all extracted first, then its tree is taken apart
+        # and the page dropped before the forecasts are prepared. A BeautifulSoup tree is full of reference cycles,
+        # left alone it is only freed when the garbage collector comes around
+        self._bounded_memory = bounded_memory
+        self._tree = None
+        self._plans = ExtractionPlan.compile_schemas(type(self))
+        self._temp_regex = re.compile(r'([0-9]+)\D{,2}([0-9]+)')
+        self._hilo_regex = re.compile(r'H\s+(\d+|\-{,2}).+'
+                                      r'L\s+(\d+|\-{,2})')
         self._only_digits_regex = re.compile('[0-9]+')
         # attribute for unit conversion
         self._unit_converter = UnitConverter(Unit.FAHRENHEIT)  # default unit is set to Fahrenheit
 
-    def _get_data(self, container, search_items):  # container is a DOM element in the HTML
-        #  search_items is a dictionary where key is the class and value is the type of HTML element
-        scraped_data = {}
+    def _container(self, content, name, class_):
+        """Builds the BeautifulSoup tree of the <name class="class_"> element of the page"""
+        with self._metrics.stage('soup', *self._labels):
+            container = parse_container(content, name, class_, self._engine)
+        if self._bounded_memory:
+            self._tree = container
 
-        for key, value in search_items.items():
+        # counting the nodes walks the whole tree, it is only done when somebody looks at the numbers
+        if self._metrics.enabled:
+            self._metrics.count('dom_nodes', count_nodes(container), *self._labels)
+        return container
 
-            result = container.find(value, class_=key)
-
-            data = None if result is None else result.get_text()  # .get_text() to extract text from DOM element
-
-            if data is not None:
-                scraped_data[key] = data  #
-
-        return scraped_data
-
-    def _parse(self, container, criteria):
-        # items are the children of the section container in the website that house a lot of the web info
-        # criteria is the dictionary received in _today_forecast method
-        results = [self._get_data(item, criteria)
-                   for item in container.children]
-
-        return [result for result in results if result]
+    def _parse(self, container, forecast_type):
+        # items are the children of the container in the website that house a lot of the web info.
+        # the extraction plan of the forecast type finds the fields of the schema in every item.
+        # it is a generator, the next item is only looked at when the row before it has been used
+        return self._metrics.timed(self._plans[forecast_type].iter_extract(container), 'extract', *self._labels)
 
     def _clear_str_number(self, str_number):
         """To return only digits"""
         result = self._only_digits_regex.match(str_number)
-        return '--' if None else result.group()
+        return '--' if result is None else result.group()
 
     def _get_humidity_and_weather(self, content):
         """The information for humidity and weather can be traced from the content tag to td tag which
         contains a list of tr tags when the weathercom website is inspected """
         data = tuple(item.td.span.get_text()
-                     for item in content.table.tbody.children)  # the tr tags are the children of tbody
+                     for item in content.table.tbody.children  # the tr tags are the children of tbody
+                     if item.name == 'tr')
 
         # the first two tr tags are the ones with info on humidity and weather so we retrieve them
         return data[:2]
 
     def _parse_list_forecast(self, content, args):
-
-        # data for 5-day and 10-day have the same CSS class and DOM elements
-        criteria = {
-            'date-time': 'span',  # element contains string containing day of the week
-            'day-detail': 'span',  # element contains string with date
-            'description': 'td',  # element contains description of weather
-            'temp': 'td',  # element contains low temp and high temp
-            'wind': 'td',  # element contains wind information
-            'humidity': 'td',  # humidity contains humidity info
-        }
-
-        bs = BeautifulSoup(content, 'html.parser')
         # CSS class and DOM element where you find data for 5 and 10 day forecasts
-        forecast_data = bs.find('table', class_='twc-table')
+        forecast_data = self._container(content, 'table', 'twc-table')
         container = forecast_data.tbody
 
-        return self._parse(container, criteria)
+        return self._parse(container, args.forecast_option)
 
     def _prepare_data(self, results, args):
-        forecast_data = []
-
-        self._unit_converter.dest_unit = args.unit
-
+        """Generator turning every row into a Forecast as soon as the row comes out of results"""
         for item in results:
+            high_temp = low_temp = None
             match = self._temp_regex.search(item['temp'])
             if match is not None:
                 high_temp, low_temp = match.groups()
 
             try:
+                # the weekend page has the day of the week and the date in one element eg. SatOCT 19
                 dateinfo = item['weather-cell']
                 date_time, day_detail = dateinfo[:3], dateinfo[3:]
+                item['date-time'] = date_time
                 item['day-detail'] = day_detail
             except KeyError:
                 pass
 
-            day_forecast = Forecast(self._unit_converter.convert(item['temp']), item['humidity'], item['wind'],
-                                    high_temp=self._unit_converter.convert(high_temp),
-                                    low_temp=self._unit_converter.convert(low_temp), description=
-                                    item['description'].strip(),
-                                    forecast_data=f'{item["date-time"]} {item["day-detail"]}',
-                                    forecast_type=self._forecast_type)
-
-            forecast_data.append(day_forecast)
-
-        return forecast_data
-
-    def _today_forecast(self, args):
-        """returns weather parses for the day"""
-        # contains the DOM elements that want to find in the HTML of the weather website for today's scraping
-        # key is the name of the CSS class and value is the type of HTML
-        criteria = {
-            'today_nowcard-temp': 'div',  # CSS class containing current temperature
-            'today_nowcard-phrase': 'div',  # CSS class containing weather conditions text for description
-            'today_nowcard-hilo': 'div',  # CSS class containing highest and lowest temperature
-        }
-
-        content = self._request.fetch_data(args.area_code, args.forecast_option.value)
-
-        bs = BeautifulSoup(content, 'html.parser')  # as bs object of the page is returned
+            # the current, high and low temperature of the row are converted together. The converted values stay
+            # numbers (NaN when the page had none), Forecast formats them when printed. The rows come out one by
+            # one, for three values a NumPy array costs more than it saves: the plain Python conversion is used.
+            # the unit is set for every row, another generator of this parser may have changed it in between
+            self._unit_converter.dest_unit = args.unit
+            current_temp, high_temp, low_temp = self._unit_converter.convert_many(
+                (item['temp'], high_temp, low_temp), use_numpy=False)
+
+            yield Forecast(current_temp, item['humidity'], item['wind'],
+                           high_temp=high_temp, low_temp=low_temp, description=
+                           item['description'].strip(),
+                           forecast_date=f'{item["date-time"]} {item["day-detail"]}',
+                           forecast_type=args.forecast_option)
+
+    def _today_forecast(self, content, args):
+        """returns the raw weather info for the day as a list of one dictionary"""
         # container is the section tag on weathercom website that holds most of the info on weather
-        container = bs.find('section', class_='today_nowcard-container')
+        container = self._container(content, 'section', 'today_nowcard-container')
 
-        # to find elements in children or subtags of container that are in criteria to retrieve/scrape them
-        weather_conditions = self._parse(container, criteria)
+        # to find elements in children or subtags of container that are in the schema to retrieve/scrape them.
+        # only the first item is needed
+        weather_info = next(iter(self._parse(container, ForecastType.TODAY)), None)
 
-        # if len of weather_conditions is less than 1, no info was obtained or scraped
-        if len(weather_conditions) < 1:
+        # if there is no item, no info was obtained or scraped
+        if weather_info is None:
             raise Exception('Could not parse weather for today')
 
-        weather_info = weather_conditions[0]
-        temp_regex = re.compile(('H\s+(\d+|\-{,2}).+'
-                                 'L\s+(\d+|\-{,2})'))
-        temp_info = temp_regex.search(weather_info['today_nowcard-hilo'])
-        high_temp, low_temp = temp_info.groups()
-
         # getting wind and humidity info
         side = container.find('div', class_='today_nowcard-sidecar')
-        humidity, wind = self._get_humidity_and_weather(side)
+        weather_info['humidity'], weather_info['wind'] = self._get_humidity_and_weather(side)
+
+        return [weather_info]
+
+    def _prepare_today(self, results, args):
+        """yields the weather parses for the day"""
+        weather_info = next(iter(results))
+        temp_info = self._hilo_regex.search(weather_info['today_nowcard-hilo'])
+        high_temp, low_temp = temp_info.groups()
 
         # getting current temp
         current_temperature = self._clear_str_number(weather_info['today_nowcard-temp'])
         # set default unit to the value of args.unit attribute
         self._unit_converter.dest_unit = args.unit
 
-        today_forecast = Forecast(self._unit_converter.convert(current_temperature), humidity, wind,
-                                  self._unit_converter.convert(high_temp), self._unit_converter.convert(low_temp),
-                                  description=weather_info['today_nowcard-phrase'])
-
-        # return today_forecast object as a list
-        return [today_forecast]
-
-    def _five_and_ten_day_forecast(self, args):
-        content = self._request.fetch_data(args.forest_option.value, args.area_code)
-        results = self._parse_list_forecast(content, args)
-        return self._prepare_data(results)
-
-    def _weekend_forecast(self, args):
-        criteria = {
-            'weather-cell': 'header',
-            'temp': 'p',
-            'weather-phrase': 'h3',
-            'wind-conditions': 'p',
-            'humidity': 'p'
-        }
+        # three values, no NumPy array (see _prepare_data)
+        current_temperature, high_temp, low_temp = self._unit_converter.convert_many(
+            (current_temperature, high_temp, low_temp), use_numpy=False)
+
+        today_forecast = Forecast(current_temperature, weather_info['humidity'], weather_info['wind'],
+                                  high_temp, low_temp, description=weather_info['today_nowcard-phrase'])
+
+        yield today_forecast
 
-        mapper = Mapper()
-        mapper.remap_key('wind-conditions', 'wind')
-        mapper.remap_key('weather-phrase', 'description')
+    def _five_and_ten_day_forecast(self, content, args):
+        return self._parse_list_forecast(content, args)
 
-        content = self._request.fetch_data(args.forecast_option.value, args.area_code)
-        bs = BeautifulSoup(content, 'html.parser')
-        forecast_data = bs.find('article', class_='ls-mod')
+    def _weekend_forecast(self, content, args):
+        forecast_data = self._container(content, 'article', 'ls-mod')
         container = forecast_data.div.div
 
-        partial_results = self._parse(container, criteria)
-        results = mapper.remap(partial_results)
-        return self._prepare_data(results, args)
+        # the schema already renames weather-phrase to description and wind-conditions to wind
+        return self._parse(container, ForecastType.WEEKEND)
+
+    def _free_tree(self):
+        """Takes the tree of the last page apart, its memory is given back right away"""
+        tree, self._tree = self._tree, None
+        if tree is None:
+            return
+        while tree.parent is not None:
+            tree = tree.parent
+        with self._metrics.stage('free', *self._labels):
+            tree.decompose()
+
+    def _extract_all(self, content, args):
+        try:
+            return self.extract(content, args)
+        finally:
+            self._free_tree()
+
+    def iter_extract(self, content, args):
+        """Returns an iterator over the raw rows (dictionaries of scraped strings) of a fetched page for
+        args.forecast_option. The page is parsed right away, the rows are extracted one at a time"""
+        extract_function, _ = self._forecast[args.forecast_option]
+        self._labels = (getattr(args, 'area_code', None), args.forecast_option.value)
+        return extract_function(content, args)
+
+    def extract(self, content, args):
+        """iter_extract as a list"""
+        return list(self.iter_extract(content, args))
+
+    def iter_prepare(self, results, args):
+        """Returns an iterator turning the rows of results (a list or the iterator of iter_extract) into Forecast
+        objects in the unit args.unit, one row at a time"""
+        _, prepare_function = self._forecast[args.forecast_option]
+        return self._metrics.timed(prepare_function(results, args), 'prepare',
+                                   getattr(args, 'area_code', None), args.forecast_option.value)
+
+    def prepare(self, results, args):
+        """iter_prepare as a list"""
+        return list(self.iter_prepare(results, args))
+
+    def iter_parse(self, content, args):
+        """Returns an iterator over the forecasts of a page that was already fetched (content is the page source)
+        for args.forecast_option. Every forecast comes out as soon as its row is extracted, with bounded_memory they
+        come out once every row of the page is extracted and the page is freed"""
+        if self._bounded_memory:
+            return self.iter_prepare(self._extract_all(content, args), args)
+        return self.iter_prepare(self.iter_extract(content, args), args)
+
+    def parse(self, content, args):
+        """iter_parse as a list"""
+        return list(self.iter_parse(content, args))
+
+    def fetch(self, args):
+        """Fetches the page of args.forecast_option for args.area_code and returns its source without parsing it,
+        eg. to parse it in another process (see ParsePool)"""
+        return self._request.fetch_data(args.area_code, args.forecast_option.value)
+
+    def iter_run(self, args):
+        """Generator fetching the page of args.forecast_option for args.area_code and yielding its forecasts
+        one by one, the first one is printed while the rest of the page is still being extracted"""
+        # the page is not kept in a variable of the generator, it is freed once its tree is built
+        yield from self.iter_parse(self.fetch(args), args)
 
     def run(self, args):
-        self._forecast_type = args.forecast_option
-        forecast_function = self._forecast[args.forecast_option]
-        return forecast_function(args)
+        """iter_run as a list"""
+        return list(self.iter_run(args))
+
+    def poll(self, args, validators=None):
+        """For watch mode: fetches the page of args.forecast_option again, see Request.poll. Returns
+        (forecasts, validators), forecasts is None when the page did not change and was not parsed again"""
+        content, validators = self._request.poll(args.area_code, args.forecast_option.value, validators)
+        if content is None:
+            return None, validators
+        return self.parse(content, args), validators
+
+    def run_many(self, args, forecast_types=None):
+        """Returns a ForecastSet with the forecasts of every type in forecast_types (default: all of them) for
+        args.area_code. The distinct pages are fetched concurrently, types that can be derived from a page that is
+        fetched anyway (see derived_forecasts) are not fetched at all"""
+        forecast_types = list(forecast_types or ForecastType)
+        forecast_set = ForecastSet(args.area_code)
+        start = time.perf_counter()
+
+        derived = {forecast_type: self.derived_forecasts[forecast_type] for forecast_type in forecast_types
+                   if self.derived_forecasts.get(forecast_type, (None,))[0] in forecast_types}
+        to_fetch = [forecast_type for forecast_type in forecast_types if forecast_type not in derived]
+
+        # fetching is I/O so the pages are fetched in threads, the backend and the cache are thread safe.
+        # parsing stays in this thread because the parser keeps per run state
+        with ThreadPoolExecutor(max_workers=len(to_fetch)) as executor:
+            pages = {forecast_type: executor.submit(self._request.fetch_data, args.area_code, forecast_type.value)
+                     for forecast_type in to_fetch}
+            pages = {forecast_type: future.result() for forecast_type, future in pages.items()}
+
+        forecast_set.fetch_time = time.perf_counter() - start
+        forecast_set.fetched = to_fetch
+
+        for forecast_type in list(pages):
+            type_args = Namespace(**vars(args))
+            type_args.forecast_option = forecast_type
+            # a page is dropped as soon as it is parsed
+            forecast_set.forecasts[forecast_type] = self.parse(pages.pop(forecast_type), type_args)
+
+        for forecast_type, (source_type, rows) in derived.items():
+            # the source forecasts are copied with the derived forecast type, the page is not parsed again
+            forecast_set.forecasts[forecast_type] = [
+                Forecast.from_dict(dict(forecast.to_dict(), forecast_type=forecast_type.value))
+                for forecast in forecast_set.forecasts[source_type][:rows]]
+            forecast_set.derived.append(forecast_type)
+
+        # keep the order the forecast types were asked for
+        forecast_set.forecasts = {forecast_type: forecast_set.forecasts[forecast_type]
+                                  for forecast_type in forecast_types}
+        forecast_set.elapsed = time.perf_counter() - start
+        forecast_set.parse_time = forecast_set.elapsed - forecast_set.fetch_time
+        return forecast_set